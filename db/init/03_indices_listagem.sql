@@ -0,0 +1,13 @@
+-- ============================================================================
+-- ÍNDICES DAS LISTAGENS DE ÁRVORES
+-- ============================================================================
+-- As listagens /arvores e /consulta são paginadas por cursor em "id"
+-- ("linhas depois do id X, no máximo N"). Sem filtro, a chave primária já
+-- atende a consulta. Com filtro de status, o índice composto (status, id)
+-- permite ler apenas a página pedida, sem varrer a tabela inteira.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/03_indices_listagem.sql
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_arvore_status_id ON arvore (status, id);
@@ -0,0 +1,20 @@
+-- ============================================================================
+-- ÍNDICE ESPACIAL DAS ÁRVORES
+-- ============================================================================
+-- As buscas por área (viewport do mapa) e por raio (árvores próximas) usam a
+-- coluna gerada "localizacao" (tipo POINT nativo do PostgreSQL, sem depender
+-- do PostGIS), indexada com GiST. O ponto é (longitude, latitude), ou seja,
+-- x = longitude e y = latitude.
+--
+-- A coluna é calculada pelo próprio banco a partir de latitude/longitude,
+-- então os INSERTs existentes não precisam ser alterados.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/04_indice_espacial.sql
+-- ============================================================================
+
+ALTER TABLE arvore
+    ADD COLUMN IF NOT EXISTS localizacao POINT
+    GENERATED ALWAYS AS (POINT(longitude::DOUBLE PRECISION, latitude::DOUBLE PRECISION)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_arvore_localizacao ON arvore USING GIST (localizacao);
@@ -0,0 +1,107 @@
+-- ============================================================================
+-- RESUMO DO INVENTÁRIO DE ÁRVORES
+-- ============================================================================
+-- Contagem de árvores por status, tipo e espécie, mantida pelo próprio banco.
+-- Os triggers são por comando (FOR EACH STATEMENT) e usam as tabelas de
+-- transição: um INSERT de uma árvore (inclui_clientes) ou de milhares
+-- (carga de censo) faz um único UPSERT agrupado, na mesma transação.
+--
+-- Assim /api/arvores/resumo lê apenas algumas linhas, sem contar a tabela
+-- arvore inteira. As linhas são atualizadas em ordem de chave para que
+-- transações concorrentes não entrem em deadlock.
+--
+-- Pode ser aplicado em bancos já existentes (recalcula o resumo):
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/05_resumo_arvores.sql
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS arvore_resumo (
+    status TEXT,
+    tipo VARCHAR(10),
+    nome_cientifico TEXT,
+    quantidade BIGINT NOT NULL DEFAULT 0,
+    -- Árvores sem espécie, status ou tipo também são contadas (NULL = NULL aqui)
+    CONSTRAINT uq_arvore_resumo UNIQUE NULLS NOT DISTINCT (status, tipo, nome_cientifico)
+);
+
+CREATE OR REPLACE FUNCTION atualiza_resumo_arvore() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM arvore_resumo;
+
+    -- Cada evento tem as suas tabelas de transição (no INSERT não existe
+    -- "antigas", no DELETE não existe "novas"), por isso um comando por evento
+    ELSIF TG_OP = 'INSERT' THEN
+        INSERT INTO arvore_resumo AS r (status, tipo, nome_cientifico, quantidade)
+        SELECT status, tipo, nome_cientifico, COUNT(*)
+        FROM novas
+        GROUP BY status, tipo, nome_cientifico
+        ORDER BY status, tipo, nome_cientifico
+        ON CONFLICT ON CONSTRAINT uq_arvore_resumo
+        DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE arvore_resumo AS r
+        SET quantidade = r.quantidade - a.quantidade
+        FROM (
+            SELECT status, tipo, nome_cientifico, COUNT(*) AS quantidade
+            FROM antigas
+            GROUP BY status, tipo, nome_cientifico
+        ) AS a
+        WHERE r.status IS NOT DISTINCT FROM a.status
+          AND r.tipo IS NOT DISTINCT FROM a.tipo
+          AND r.nome_cientifico IS NOT DISTINCT FROM a.nome_cientifico;
+
+    ELSE
+        -- UPDATE: só as linhas que mudaram de status, tipo ou espécie alteram
+        -- o resumo (atualizar altura ou ultima_vistoria não escreve nada aqui)
+        INSERT INTO arvore_resumo AS r (status, tipo, nome_cientifico, quantidade)
+        SELECT status, tipo, nome_cientifico, SUM(variacao)
+        FROM (
+            SELECT status, tipo, nome_cientifico, 1 AS variacao FROM novas
+            UNION ALL
+            SELECT status, tipo, nome_cientifico, -1 FROM antigas
+        ) AS alteracoes
+        GROUP BY status, tipo, nome_cientifico
+        HAVING SUM(variacao) <> 0
+        ORDER BY status, tipo, nome_cientifico
+        ON CONFLICT ON CONSTRAINT uq_arvore_resumo
+        DO UPDATE SET quantidade = r.quantidade + EXCLUDED.quantidade;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tg_arvore_resumo_insercao ON arvore;
+CREATE TRIGGER tg_arvore_resumo_insercao
+    AFTER INSERT ON arvore
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_resumo_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_resumo_alteracao ON arvore;
+CREATE TRIGGER tg_arvore_resumo_alteracao
+    AFTER UPDATE ON arvore
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_resumo_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_resumo_remocao ON arvore;
+CREATE TRIGGER tg_arvore_resumo_remocao
+    AFTER DELETE ON arvore
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_resumo_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_resumo_limpeza ON arvore;
+CREATE TRIGGER tg_arvore_resumo_limpeza
+    AFTER TRUNCATE ON arvore
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_resumo_arvore();
+
+-- Carga inicial (ou recálculo): a tabela arvore fica bloqueada para escrita
+-- enquanto o resumo é refeito, para nenhuma inserção escapar da contagem
+BEGIN;
+LOCK TABLE arvore IN SHARE MODE;
+DELETE FROM arvore_resumo;
+INSERT INTO arvore_resumo (status, tipo, nome_cientifico, quantidade)
+SELECT status, tipo, nome_cientifico, COUNT(*)
+FROM arvore
+GROUP BY status, tipo, nome_cientifico;
+COMMIT;
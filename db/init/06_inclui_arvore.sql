@@ -0,0 +1,77 @@
+-- ============================================================================
+-- CADASTRO DE ÁRVORE EM UM ÚNICO COMANDO
+-- ============================================================================
+-- A função inclui_arvore faz, dentro do banco, o que o cadastro fazia em três
+-- idas e voltas: consulta as árvores da mesma localização, define o contador,
+-- cadastra a TAG (se houver) e insere a árvore. Retorna o id e o contador.
+--
+-- Regra do contador (a mesma do formulário e da carga de censo):
+--   - nenhuma árvore no ponto               -> contador 1
+--   - todas as árvores do ponto cortadas    -> maior contador + 1
+--   - existe árvore ativa com contador 1    -> erro (árvore já cadastrada)
+--   - existe árvore ativa, sem contador 1   -> contador 1
+--
+-- Dois cadastros simultâneos no mesmo ponto são serializados por um advisory
+-- lock da localização (liberado no fim da transação), então o segundo já vê
+-- o primeiro e calcula o contador certo em vez de falhar na chave única.
+-- Pontos diferentes não se bloqueiam.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/06_inclui_arvore.sql
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION inclui_arvore(
+    p_latitude NUMERIC,
+    p_longitude NUMERIC,
+    p_codigo_nfc TEXT,
+    p_nome_cientifico TEXT,
+    p_status TEXT,
+    p_tipo TEXT,
+    p_altura NUMERIC,
+    p_dap NUMERIC,
+    OUT id INTEGER,
+    OUT contador INTEGER
+) AS $$
+DECLARE
+    v_maior_contador INTEGER;
+    v_ativas INTEGER;
+    v_ativa_com_1 BOOLEAN;
+BEGIN
+    -- trim_scale: -23.5 e -23.50 são o mesmo ponto, então precisam da mesma trava
+    PERFORM pg_advisory_xact_lock(
+        hashtextextended(trim_scale(p_latitude)::TEXT || ',' || trim_scale(p_longitude)::TEXT, 0)
+    );
+
+    SELECT MAX(a.contador),
+           COUNT(*) FILTER (WHERE a.status IS DISTINCT FROM 'cortada'),
+           COALESCE(BOOL_OR(a.contador = 1 AND a.status IS DISTINCT FROM 'cortada'), FALSE)
+      INTO v_maior_contador, v_ativas, v_ativa_com_1
+      FROM arvore a
+     WHERE a.latitude = p_latitude
+       AND a.longitude = p_longitude;
+
+    IF v_maior_contador IS NULL THEN
+        contador := 1;
+    ELSIF v_ativas = 0 THEN
+        contador := v_maior_contador + 1;
+    ELSIF v_ativa_com_1 THEN
+        RAISE EXCEPTION 'arvore_ativa_na_localizacao: latitude %, longitude %', p_latitude, p_longitude
+            USING ERRCODE = 'unique_violation';
+    ELSE
+        contador := 1;
+    END IF;
+
+    IF p_codigo_nfc IS NOT NULL THEN
+        INSERT INTO tag (codigo_nfc)
+        VALUES (p_codigo_nfc)
+        ON CONFLICT (codigo_nfc) DO NOTHING;
+    END IF;
+
+    -- ultima_vistoria é definida pelo sistema (vistorias), não no cadastro
+    INSERT INTO arvore
+        (codigo_nfc, latitude, longitude, contador, nome_cientifico, ultima_vistoria, status, tipo, altura, dap)
+    VALUES
+        (p_codigo_nfc, p_latitude, p_longitude, contador, p_nome_cientifico, NULL, p_status, p_tipo, p_altura, p_dap)
+    RETURNING arvore.id INTO id;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,23 @@
+-- ============================================================================
+-- TOKENS REVOGADOS (LOGOUT)
+-- ============================================================================
+-- O /logout grava aqui o hash (SHA-256) do token de autenticação, que deixa
+-- de valer na hora em todos os processos da aplicação: cada worker mantém
+-- os hashes em memória e busca os novos a cada poucos segundos.
+-- A linha só é necessária até o token expirar por conta própria (expira_em);
+-- as vencidas são apagadas a cada novo logout.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/07_tokens_revogados.sql
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS token_revogado (
+    token_hash  CHAR(64)    PRIMARY KEY,
+    expira_em   TIMESTAMPTZ NOT NULL,
+    revogado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Sincronização dos workers (revogados desde a última leitura)
+CREATE INDEX IF NOT EXISTS idx_token_revogado_revogado_em ON token_revogado (revogado_em);
+-- Limpeza dos vencidos
+CREATE INDEX IF NOT EXISTS idx_token_revogado_expira_em ON token_revogado (expira_em);
@@ -0,0 +1,15 @@
+-- ============================================================================
+-- ÍNDICE DO HISTÓRICO DE VISTORIAS POR ÁRVORE
+-- ============================================================================
+-- O relatório de escalada de risco (/api/relatorios/escalada-risco) compara
+-- cada vistoria com a anterior da mesma árvore usando LAG() sobre
+-- (latitude, longitude, contador) ordenado por data e hora. Este índice
+-- entrega as vistorias já nessa ordem: a janela é calculada em uma única
+-- passada, sem ordenar a tabela e sem uma subconsulta por vistoria.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/08_indice_vistorias.sql
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_vistoria_arvore_data
+    ON vistoria_inicial (latitude, longitude, contador, data, hora);
@@ -0,0 +1,210 @@
+-- ============================================================================
+-- RISCO ATUAL POR ÁRVORE E EVENTOS DE MUDANÇA DE RISCO
+-- ============================================================================
+-- risco_atual guarda o risco da vistoria mais recente de cada árvore e
+-- risco_evento registra cada mudança de risco entre vistorias seguidas. As
+-- duas tabelas são mantidas por um trigger por comando em vistoria_inicial,
+-- na mesma transação do INSERT (uma vistoria pelo Vistorias_dao ou milhares
+-- de uma vez). O mesmo trigger mantém arvore.ultima_vistoria.
+--
+-- Assim "árvores cujo risco piorou desde X" é uma leitura por faixa do
+-- índice parcial idx_risco_evento_escalada, sem percorrer o histórico.
+--
+-- Regras:
+--   - só vistorias com data e risco contam para o risco atual
+--   - vistorias mais antigas que o risco atual da árvore (registradas com
+--     atraso) atualizam ultima_vistoria, mas não mudam o risco nem geram evento
+--   - vistorias simultâneas da mesma árvore são serializadas por um advisory
+--     lock do id da árvore (liberado no fim da transação); inserções de mais
+--     de 100 árvores de uma vez usam uma única trava de todas
+--   - vistorias não são alteradas nem removidas pela aplicação; se isso for
+--     feito direto no banco, SELECT recalcula_risco_atual() refaz as tabelas
+--
+-- Pode ser aplicado em bancos já existentes (calcula a partir do histórico):
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/09_risco_atual.sql
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS risco_atual (
+    arvore_id INTEGER PRIMARY KEY REFERENCES arvore(id),
+    risco TEXT NOT NULL,
+    data DATE NOT NULL,
+    hora TIME,
+    cod_solicitacao INTEGER NOT NULL REFERENCES vistoria_inicial(cod_solicitacao)
+);
+
+CREATE TABLE IF NOT EXISTS risco_evento (
+    id BIGSERIAL PRIMARY KEY,
+    arvore_id INTEGER NOT NULL REFERENCES arvore(id),
+    risco_anterior TEXT NOT NULL,
+    risco_novo TEXT NOT NULL,
+    -- Data e hora da vistoria que mudou o risco
+    data DATE NOT NULL,
+    hora TIME,
+    cod_solicitacao INTEGER NOT NULL REFERENCES vistoria_inicial(cod_solicitacao),
+    registrado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+    -- Ordem de gravidade do CHECK ck_vistoria_risco: baixo < medio < alto < critico
+    escalada BOOLEAN GENERATED ALWAYS AS (
+        array_position(ARRAY['baixo', 'medio', 'alto', 'critico'], risco_novo)
+        > array_position(ARRAY['baixo', 'medio', 'alto', 'critico'], risco_anterior)
+    ) STORED
+);
+
+-- "Pioraram desde X": só as escaladas, em ordem de data
+CREATE INDEX IF NOT EXISTS idx_risco_evento_escalada
+    ON risco_evento (data, hora) WHERE escalada;
+
+CREATE INDEX IF NOT EXISTS idx_risco_evento_arvore
+    ON risco_evento (arvore_id, data);
+
+CREATE OR REPLACE FUNCTION atualiza_risco_atual() RETURNS TRIGGER AS $$
+DECLARE
+    v_arvores INTEGER[];
+BEGIN
+    SELECT array_agg(DISTINCT a.id ORDER BY a.id)
+      INTO v_arvores
+      FROM novas n
+      JOIN arvore a
+        ON a.latitude = n.latitude
+       AND a.longitude = n.longitude
+       AND a.contador = n.contador;
+
+    IF cardinality(v_arvores) > 100 THEN
+        -- Carga em lote: uma trava exclusiva de tudo em vez de uma por árvore
+        -- (milhares de advisory locks esgotariam max_locks_per_transaction)
+        PERFORM pg_advisory_xact_lock(hashtextextended('risco_atual', 0));
+    ELSE
+        -- Uma trava por árvore, sempre na mesma ordem, para não haver deadlock
+        PERFORM pg_advisory_xact_lock_shared(hashtextextended('risco_atual', 0));
+        PERFORM pg_advisory_xact_lock(hashtextextended('risco_atual:' || arvore_id, 0))
+        FROM unnest(v_arvores) AS arvore_id;
+    END IF;
+
+    WITH vistorias AS (
+        SELECT a.id AS arvore_id, n.risco, n.data, n.hora, n.cod_solicitacao
+        FROM novas n
+        JOIN arvore a
+            ON a.latitude = n.latitude
+            AND a.longitude = n.longitude
+            AND a.contador = n.contador
+        WHERE n.risco IS NOT NULL
+          AND n.data IS NOT NULL
+    ),
+    posteriores AS (
+        -- Só as vistorias mais novas que o risco atual, comparadas em ordem:
+        -- a primeira com o risco atual, as seguintes com a anterior do comando
+        SELECT
+            v.*,
+            COALESCE(LAG(v.risco) OVER historico, r.risco) AS risco_anterior,
+            ROW_NUMBER() OVER historico AS ordem,
+            COUNT(*) OVER (PARTITION BY v.arvore_id) AS total
+        FROM vistorias v
+        LEFT JOIN risco_atual r ON r.arvore_id = v.arvore_id
+        WHERE r.arvore_id IS NULL
+           OR (v.data, COALESCE(v.hora, TIME '00:00')) > (r.data, COALESCE(r.hora, TIME '00:00'))
+        WINDOW historico AS (PARTITION BY v.arvore_id ORDER BY v.data, v.hora NULLS FIRST, v.cod_solicitacao)
+    ),
+    eventos AS (
+        INSERT INTO risco_evento (arvore_id, risco_anterior, risco_novo, data, hora, cod_solicitacao)
+        SELECT arvore_id, risco_anterior, risco, data, hora, cod_solicitacao
+        FROM posteriores
+        WHERE risco_anterior <> risco
+        ORDER BY data, hora, cod_solicitacao
+    )
+    INSERT INTO risco_atual AS r (arvore_id, risco, data, hora, cod_solicitacao)
+    SELECT arvore_id, risco, data, hora, cod_solicitacao
+    FROM posteriores
+    WHERE ordem = total
+    ORDER BY arvore_id
+    ON CONFLICT (arvore_id) DO UPDATE SET
+        risco = EXCLUDED.risco,
+        data = EXCLUDED.data,
+        hora = EXCLUDED.hora,
+        cod_solicitacao = EXCLUDED.cod_solicitacao;
+
+    UPDATE arvore a
+    SET ultima_vistoria = u.data
+    FROM (
+        SELECT a2.id, MAX(n.data) AS data
+        FROM novas n
+        JOIN arvore a2
+            ON a2.latitude = n.latitude
+            AND a2.longitude = n.longitude
+            AND a2.contador = n.contador
+        GROUP BY a2.id
+    ) AS u
+    WHERE a.id = u.id
+      AND (a.ultima_vistoria IS NULL OR a.ultima_vistoria < u.data);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tg_vistoria_risco_atual ON vistoria_inicial;
+CREATE TRIGGER tg_vistoria_risco_atual
+    AFTER INSERT ON vistoria_inicial
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualiza_risco_atual();
+
+-- Refaz risco_atual, risco_evento e ultima_vistoria a partir do histórico
+CREATE OR REPLACE FUNCTION recalcula_risco_atual() RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE vistoria_inicial IN SHARE MODE;
+    DELETE FROM risco_evento;
+    DELETE FROM risco_atual;
+
+    INSERT INTO risco_evento (arvore_id, risco_anterior, risco_novo, data, hora, cod_solicitacao)
+    SELECT arvore_id, risco_anterior, risco, data, hora, cod_solicitacao
+    FROM (
+        SELECT
+            a.id AS arvore_id,
+            v.risco,
+            v.data,
+            v.hora,
+            v.cod_solicitacao,
+            LAG(v.risco) OVER (PARTITION BY a.id ORDER BY v.data, v.hora NULLS FIRST, v.cod_solicitacao) AS risco_anterior
+        FROM vistoria_inicial v
+        JOIN arvore a
+            ON a.latitude = v.latitude
+            AND a.longitude = v.longitude
+            AND a.contador = v.contador
+        WHERE v.risco IS NOT NULL
+          AND v.data IS NOT NULL
+    ) AS t
+    WHERE risco_anterior <> risco
+    ORDER BY data, hora, cod_solicitacao;
+
+    INSERT INTO risco_atual (arvore_id, risco, data, hora, cod_solicitacao)
+    SELECT DISTINCT ON (a.id) a.id, v.risco, v.data, v.hora, v.cod_solicitacao
+    FROM vistoria_inicial v
+    JOIN arvore a
+        ON a.latitude = v.latitude
+        AND a.longitude = v.longitude
+        AND a.contador = v.contador
+    WHERE v.risco IS NOT NULL
+      AND v.data IS NOT NULL
+    ORDER BY a.id, v.data DESC, v.hora DESC NULLS LAST, v.cod_solicitacao DESC;
+
+    UPDATE arvore a
+    SET ultima_vistoria = u.data
+    FROM (
+        SELECT a2.id, MAX(v.data) AS data
+        FROM vistoria_inicial v
+        JOIN arvore a2
+            ON a2.latitude = v.latitude
+            AND a2.longitude = v.longitude
+            AND a2.contador = v.contador
+        GROUP BY a2.id
+    ) AS u
+    WHERE a.id = u.id
+      AND (a.ultima_vistoria IS NULL OR a.ultima_vistoria < u.data);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Primeira aplicação: calcula a partir das vistorias já existentes
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM risco_atual) THEN
+        PERFORM recalcula_risco_atual();
+    END IF;
+END;
+$$;
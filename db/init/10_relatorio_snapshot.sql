@@ -0,0 +1,25 @@
+-- ============================================================================
+-- RESULTADOS PRÉ-CALCULADOS DOS RELATÓRIOS
+-- ============================================================================
+-- As consultas analíticas de db/scripts/consultas.sql são recalculadas em
+-- segundo plano pela aplicação (src/app/utils/agendador_relatorios.py), de
+-- tempos em tempos, e o resultado fica guardado aqui em JSON. As rotas
+-- /api/relatorios/<nome> leem só esta tabela, com a data do cálculo, em vez
+-- de rodar a consulta a cada requisição.
+--
+-- marca guarda até onde o cálculo incremental já leu (ex.: o último
+-- risco_evento.id); relatórios sem cálculo incremental deixam NULL.
+--
+-- Pode ser aplicado em bancos já existentes:
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/10_relatorio_snapshot.sql
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS relatorio_snapshot (
+    nome TEXT PRIMARY KEY,
+    atualizado_em TIMESTAMPTZ NOT NULL,
+    -- Tempo do último cálculo e linhas do resultado
+    duracao_ms INTEGER NOT NULL,
+    linhas INTEGER NOT NULL,
+    marca BIGINT,
+    dados JSONB NOT NULL
+);
@@ -0,0 +1,188 @@
+-- ============================================================================
+-- CHAVE INTEIRA DA ÁRVORE NA VISTORIA E ÍNDICES DOS RELATÓRIOS
+-- ============================================================================
+-- vistoria_inicial referencia arvore pela chave composta (latitude,
+-- longitude, contador), então toda junção vistoria -> árvore e vistoria ->
+-- vistoria da mesma árvore compara três colunas NUMERIC. Esta migração
+-- acrescenta vistoria_inicial.arvore_id (chave estrangeira para arvore.id),
+-- preenchida a partir da chave composta nas vistorias já existentes e por um
+-- trigger nas novas, e passa os relatórios a juntar por ela.
+--
+-- A chave composta continua valendo (e continua sendo a que a aplicação
+-- grava); arvore_id é sempre derivada dela. Como a chave estrangeira composta
+-- não tem ON UPDATE CASCADE, uma árvore com vistoria não muda de
+-- coordenadas, e as duas chaves não ficam divergentes.
+--
+-- Índices:
+--   - vistoria_inicial (arvore_id, data, hora): histórico de cada árvore em
+--     ordem (Consultas 1 e 5, risco_atual) e junção com arvore (Consulta 3)
+--   - manutencao (cnpj): manutenções de uma empresa (Consultas 3 e 5)
+--   - solicitacao (status, bairro): Consulta 2 (solicitações válidas por bairro)
+--   - arvore (status): já atendido por idx_arvore_status_id (status, id), de
+--     db/init/03_indices_listagem.sql, que tem status na frente; um índice
+--     só de status seria redundante e não é criado
+--   - idx_vistoria_arvore_data (db/init/08_indice_vistorias.sql) continua:
+--     atende a chave estrangeira composta e consultas antigas pela chave
+--
+-- Antes e depois com EXPLAIN ANALYZE em um histórico sintético:
+--   python src/app/utils/benchmark_relatorios.py --explain
+--
+-- Pode ser aplicado em bancos já existentes (preenche arvore_id das vistorias):
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/11_chave_arvore_vistoria.sql
+-- ============================================================================
+
+ALTER TABLE vistoria_inicial
+    ADD COLUMN IF NOT EXISTS arvore_id INTEGER REFERENCES arvore(id);
+
+-- arvore_id das vistorias novas (ou com a chave composta alterada)
+CREATE OR REPLACE FUNCTION preenche_arvore_id_vistoria() RETURNS TRIGGER AS $$
+BEGIN
+    SELECT a.id INTO NEW.arvore_id
+    FROM arvore a
+    WHERE a.latitude = NEW.latitude
+      AND a.longitude = NEW.longitude
+      AND a.contador = NEW.contador;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tg_vistoria_arvore_id ON vistoria_inicial;
+CREATE TRIGGER tg_vistoria_arvore_id
+    BEFORE INSERT OR UPDATE OF latitude, longitude, contador ON vistoria_inicial
+    FOR EACH ROW EXECUTE FUNCTION preenche_arvore_id_vistoria();
+
+-- Vistorias já existentes
+UPDATE vistoria_inicial v
+SET arvore_id = a.id
+FROM arvore a
+WHERE v.arvore_id IS NULL
+  AND a.latitude = v.latitude
+  AND a.longitude = v.longitude
+  AND a.contador = v.contador;
+
+-- Toda vistoria tem árvore (a chave composta é NOT NULL e referencia arvore)
+ALTER TABLE vistoria_inicial ALTER COLUMN arvore_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_vistoria_arvore_id_data
+    ON vistoria_inicial (arvore_id, data, hora);
+
+CREATE INDEX IF NOT EXISTS idx_manutencao_cnpj
+    ON manutencao (cnpj);
+
+CREATE INDEX IF NOT EXISTS idx_solicitacao_status_bairro
+    ON solicitacao (status, bairro);
+
+-- Trigger de risco_atual (db/init/09_risco_atual.sql) usando arvore_id, já
+-- preenchida pelo trigger BEFORE nas linhas de "novas"
+CREATE OR REPLACE FUNCTION atualiza_risco_atual() RETURNS TRIGGER AS $$
+DECLARE
+    v_arvores INTEGER[];
+BEGIN
+    SELECT array_agg(DISTINCT n.arvore_id ORDER BY n.arvore_id)
+      INTO v_arvores
+      FROM novas n;
+
+    IF cardinality(v_arvores) > 100 THEN
+        -- Carga em lote: uma trava exclusiva de tudo em vez de uma por árvore
+        -- (milhares de advisory locks esgotariam max_locks_per_transaction)
+        PERFORM pg_advisory_xact_lock(hashtextextended('risco_atual', 0));
+    ELSE
+        -- Uma trava por árvore, sempre na mesma ordem, para não haver deadlock
+        PERFORM pg_advisory_xact_lock_shared(hashtextextended('risco_atual', 0));
+        PERFORM pg_advisory_xact_lock(hashtextextended('risco_atual:' || arvore_id, 0))
+        FROM unnest(v_arvores) AS arvore_id;
+    END IF;
+
+    WITH vistorias AS (
+        SELECT n.arvore_id, n.risco, n.data, n.hora, n.cod_solicitacao
+        FROM novas n
+        WHERE n.risco IS NOT NULL
+          AND n.data IS NOT NULL
+    ),
+    posteriores AS (
+        -- Só as vistorias mais novas que o risco atual, comparadas em ordem:
+        -- a primeira com o risco atual, as seguintes com a anterior do comando
+        SELECT
+            v.*,
+            COALESCE(LAG(v.risco) OVER historico, r.risco) AS risco_anterior,
+            ROW_NUMBER() OVER historico AS ordem,
+            COUNT(*) OVER (PARTITION BY v.arvore_id) AS total
+        FROM vistorias v
+        LEFT JOIN risco_atual r ON r.arvore_id = v.arvore_id
+        WHERE r.arvore_id IS NULL
+           OR (v.data, COALESCE(v.hora, TIME '00:00')) > (r.data, COALESCE(r.hora, TIME '00:00'))
+        WINDOW historico AS (PARTITION BY v.arvore_id ORDER BY v.data, v.hora NULLS FIRST, v.cod_solicitacao)
+    ),
+    eventos AS (
+        INSERT INTO risco_evento (arvore_id, risco_anterior, risco_novo, data, hora, cod_solicitacao)
+        SELECT arvore_id, risco_anterior, risco, data, hora, cod_solicitacao
+        FROM posteriores
+        WHERE risco_anterior <> risco
+        ORDER BY data, hora, cod_solicitacao
+    )
+    INSERT INTO risco_atual AS r (arvore_id, risco, data, hora, cod_solicitacao)
+    SELECT arvore_id, risco, data, hora, cod_solicitacao
+    FROM posteriores
+    WHERE ordem = total
+    ORDER BY arvore_id
+    ON CONFLICT (arvore_id) DO UPDATE SET
+        risco = EXCLUDED.risco,
+        data = EXCLUDED.data,
+        hora = EXCLUDED.hora,
+        cod_solicitacao = EXCLUDED.cod_solicitacao;
+
+    UPDATE arvore a
+    SET ultima_vistoria = u.data
+    FROM (
+        SELECT n.arvore_id, MAX(n.data) AS data
+        FROM novas n
+        GROUP BY n.arvore_id
+    ) AS u
+    WHERE a.id = u.arvore_id
+      AND (a.ultima_vistoria IS NULL OR a.ultima_vistoria < u.data);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION recalcula_risco_atual() RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE vistoria_inicial IN SHARE MODE;
+    DELETE FROM risco_evento;
+    DELETE FROM risco_atual;
+
+    INSERT INTO risco_evento (arvore_id, risco_anterior, risco_novo, data, hora, cod_solicitacao)
+    SELECT arvore_id, risco_anterior, risco, data, hora, cod_solicitacao
+    FROM (
+        SELECT
+            v.arvore_id,
+            v.risco,
+            v.data,
+            v.hora,
+            v.cod_solicitacao,
+            LAG(v.risco) OVER (PARTITION BY v.arvore_id ORDER BY v.data, v.hora NULLS FIRST, v.cod_solicitacao) AS risco_anterior
+        FROM vistoria_inicial v
+        WHERE v.risco IS NOT NULL
+          AND v.data IS NOT NULL
+    ) AS t
+    WHERE risco_anterior <> risco
+    ORDER BY data, hora, cod_solicitacao;
+
+    INSERT INTO risco_atual (arvore_id, risco, data, hora, cod_solicitacao)
+    SELECT DISTINCT ON (v.arvore_id) v.arvore_id, v.risco, v.data, v.hora, v.cod_solicitacao
+    FROM vistoria_inicial v
+    WHERE v.risco IS NOT NULL
+      AND v.data IS NOT NULL
+    ORDER BY v.arvore_id, v.data DESC, v.hora DESC NULLS LAST, v.cod_solicitacao DESC;
+
+    UPDATE arvore a
+    SET ultima_vistoria = u.data
+    FROM (
+        SELECT v.arvore_id, MAX(v.data) AS data
+        FROM vistoria_inicial v
+        GROUP BY v.arvore_id
+    ) AS u
+    WHERE a.id = u.arvore_id
+      AND (a.ultima_vistoria IS NULL OR a.ultima_vistoria < u.data);
+END;
+$$ LANGUAGE plpgsql;
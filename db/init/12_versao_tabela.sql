@@ -0,0 +1,140 @@
+-- ============================================================================
+-- AVISO DE ALTERAÇÃO DAS TABELAS (CACHE HTTP, CACHE DE RESULTADOS, TILES E
+-- ÍNDICE DE ESPÉCIES)
+-- ============================================================================
+-- Cada comando que altera arvore ou especie, e alterou pelo menos uma linha,
+-- avisa os processos da aplicação com NOTIFY no canal versao_tabela. O
+-- PostgreSQL só entrega o aviso no COMMIT (e descarta no ROLLBACK), então
+-- ninguém enxerga uma versão que ainda não foi confirmada. Vale para todos os
+-- workers, a API assíncrona e escritas feitas fora dos DAOs: carga de censo,
+-- trigger de vistoria (arvore.ultima_vistoria) e SQL manual.
+--
+-- Conteúdo do aviso: "tabela:versao" e, em arvore, ":min_lat,min_lng,max_lat,max_lng"
+-- com a área das linhas alteradas (antes e depois), para os tiles do mapa.
+-- A versão vem de uma sequência: nextval não trava nem espera outras
+-- transações, então escritas concorrentes em arvore não ficam em fila
+-- (ao contrário de uma linha de versão atualizada por todas elas).
+--
+-- Cada processo mantém as versões em memória com LISTEN em uma conexão
+-- própria (src/app/utils/versoes.py); conferir a versão não consulta o banco.
+--
+-- Comandos que não alteram linha nenhuma (ex.: o UPDATE de
+-- arvore.ultima_vistoria quando a vistoria é mais antiga) não avisam: as
+-- tabelas de transição ficam vazias.
+--
+-- Pode ser aplicado em bancos já existentes (remove a tabela versao_tabela
+-- da versão anterior desta migração):
+--   psql -h localhost -p 5555 -U arvore_user -d arvore_urbana -f db/init/12_versao_tabela.sql
+-- ============================================================================
+
+DROP TRIGGER IF EXISTS tg_arvore_versao ON arvore;
+DROP TRIGGER IF EXISTS tg_especie_versao ON especie;
+DROP FUNCTION IF EXISTS incrementa_versao_tabela();
+DROP TABLE IF EXISTS versao_tabela;
+
+CREATE SEQUENCE IF NOT EXISTS versao_tabela_seq;
+
+-- Transições de arvore: avisa com a área das linhas alteradas
+CREATE OR REPLACE FUNCTION avisa_versao_arvore() RETURNS TRIGGER AS $$
+DECLARE
+    v_area RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT MIN(latitude) AS min_lat, MIN(longitude) AS min_lng,
+               MAX(latitude) AS max_lat, MAX(longitude) AS max_lng
+          INTO v_area
+          FROM novas;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT MIN(latitude) AS min_lat, MIN(longitude) AS min_lng,
+               MAX(latitude) AS max_lat, MAX(longitude) AS max_lng
+          INTO v_area
+          FROM (
+              SELECT latitude, longitude FROM novas
+              UNION ALL
+              SELECT latitude, longitude FROM antigas
+          ) AS t;
+    ELSE
+        SELECT MIN(latitude) AS min_lat, MIN(longitude) AS min_lng,
+               MAX(latitude) AS max_lat, MAX(longitude) AS max_lng
+          INTO v_area
+          FROM antigas;
+    END IF;
+
+    -- latitude é NOT NULL: sem mínimo, o comando não alterou nenhuma linha
+    IF v_area.min_lat IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify(
+        'versao_tabela',
+        'arvore:' || nextval('versao_tabela_seq') || ':'
+            || concat_ws(',', v_area.min_lat, v_area.min_lng, v_area.max_lat, v_area.max_lng)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transições de especie (e TRUNCATE de qualquer uma das duas): só a versão
+CREATE OR REPLACE FUNCTION avisa_versao_tabela() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR TG_OP = 'UPDATE' THEN
+        IF NOT EXISTS (SELECT 1 FROM novas) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM antigas) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    PERFORM pg_notify('versao_tabela', TG_TABLE_NAME || ':' || nextval('versao_tabela_seq'));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tabelas de transição exigem um trigger por evento
+DROP TRIGGER IF EXISTS tg_arvore_versao_insert ON arvore;
+CREATE TRIGGER tg_arvore_versao_insert
+    AFTER INSERT ON arvore
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_versao_update ON arvore;
+CREATE TRIGGER tg_arvore_versao_update
+    AFTER UPDATE ON arvore
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_versao_delete ON arvore;
+CREATE TRIGGER tg_arvore_versao_delete
+    AFTER DELETE ON arvore
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_arvore();
+
+DROP TRIGGER IF EXISTS tg_arvore_versao_truncate ON arvore;
+CREATE TRIGGER tg_arvore_versao_truncate
+    AFTER TRUNCATE ON arvore
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_tabela();
+
+DROP TRIGGER IF EXISTS tg_especie_versao_insert ON especie;
+CREATE TRIGGER tg_especie_versao_insert
+    AFTER INSERT ON especie
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_tabela();
+
+DROP TRIGGER IF EXISTS tg_especie_versao_update ON especie;
+CREATE TRIGGER tg_especie_versao_update
+    AFTER UPDATE ON especie
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_tabela();
+
+DROP TRIGGER IF EXISTS tg_especie_versao_delete ON especie;
+CREATE TRIGGER tg_especie_versao_delete
+    AFTER DELETE ON especie
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_tabela();
+
+DROP TRIGGER IF EXISTS tg_especie_versao_truncate ON especie;
+CREATE TRIGGER tg_especie_versao_truncate
+    AFTER TRUNCATE ON especie
+    FOR EACH STATEMENT EXECUTE FUNCTION avisa_versao_tabela();
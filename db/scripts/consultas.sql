@@ -38,6 +38,7 @@
 -- Campos utilizados:
 -- - cod_solicitacao: Identificador único da vistoria
 -- - latitude, longitude, contador: Chave composta para identificar a árvore
+-- - arvore_id: Mesma árvore, pela chave inteira (db/init/11_chave_arvore_vistoria.sql)
 -- - data, hora: Para ordenação temporal e comparação
 -- - risco: Valor do risco (validado por constraint CHECK)
 -- ============================================================================
@@ -53,9 +54,7 @@ FROM (
         (
             SELECT v_prev.risco
             FROM vistoria_inicial v_prev
-            WHERE v_prev.latitude = v_atual.latitude
-              AND v_prev.longitude = v_atual.longitude
-              AND v_prev.contador = v_atual.contador
+            WHERE v_prev.arvore_id = v_atual.arvore_id
               AND (v_prev.data < v_atual.data
                    OR (v_prev.data = v_atual.data AND v_prev.hora < v_atual.hora))
             ORDER BY v_prev.data DESC, v_prev.hora DESC
@@ -166,7 +165,7 @@ ORDER BY solicitacoes_abertas_sem_manutencao DESC;
 -- - manutencao.cod_solicitacao: Relaciona manutenção com vistoria
 -- - vistoria_inicial.cod_solicitacao: Relaciona vistoria com solicitação
 -- - vistoria_inicial.risco: Nível de risco (deve ser 'alto')
--- - vistoria_inicial.latitude, longitude, contador: Identificam a árvore
+-- - vistoria_inicial.arvore_id: Identifica a árvore (arvore.id)
 -- - arvore.nome_cientifico: Nome científico da espécie
 -- - especie.nativa: Indica se a espécie é nativa (TRUE) ou exótica (FALSE)
 --
@@ -190,10 +189,7 @@ SELECT
 FROM empresa_terceirizada e
 JOIN manutencao m ON m.cnpj = e.cnpj
 JOIN vistoria_inicial v ON v.cod_solicitacao = m.cod_solicitacao
-JOIN arvore a 
-    ON v.latitude = a.latitude 
-    AND v.longitude = a.longitude 
-    AND v.contador = a.contador
+JOIN arvore a ON a.id = v.arvore_id
 JOIN especie esp ON esp.nome_cientifico = a.nome_cientifico
 WHERE m.tipo = 'remocao'  -- A empresa tem que ter feito remoção (equivalente a corte)
   AND esp.nativa = TRUE    -- Apenas espécies nativas
@@ -204,10 +200,7 @@ HAVING COUNT(DISTINCT a.nome_cientifico) = (
     SELECT COUNT(DISTINCT a_alvo.nome_cientifico)
     FROM arvore a_alvo
     JOIN especie esp_alvo ON esp_alvo.nome_cientifico = a_alvo.nome_cientifico
-    JOIN vistoria_inicial v_alvo 
-        ON v_alvo.latitude = a_alvo.latitude 
-        AND v_alvo.longitude = a_alvo.longitude 
-        AND v_alvo.contador = a_alvo.contador
+    JOIN vistoria_inicial v_alvo ON v_alvo.arvore_id = a_alvo.id
     WHERE esp_alvo.nativa = TRUE   -- Condição 1: Espécie nativa
       AND v_alvo.risco = 'alto'     -- Condição 2: Histórico de risco alto
 );
@@ -324,7 +317,7 @@ ORDER BY v.risco, quantidade DESC;
 -- - manutencao.cnpj: Identifica a empresa responsável
 -- - vistoria_inicial.data: Data da vistoria (original e nova)
 -- - vistoria_inicial.risco: Nível de risco da nova vistoria
--- - vistoria_inicial.latitude, longitude, contador: Identificam a árvore
+-- - vistoria_inicial.arvore_id: Identifica a árvore (arvore.id)
 -- - arvore.nome_cientifico: Nome científico da espécie
 -- - empresa_terceirizada.cnpj: CNPJ da empresa
 --
@@ -355,14 +348,8 @@ SELECT
 FROM manutencao m
 JOIN vistoria_inicial v_origem ON m.cod_solicitacao = v_origem.cod_solicitacao
 JOIN empresa_terceirizada e ON m.cnpj = e.cnpj
-JOIN arvore a 
-    ON v_origem.latitude = a.latitude 
-    AND v_origem.longitude = a.longitude 
-    AND v_origem.contador = a.contador
-JOIN vistoria_inicial v_nova 
-    ON v_nova.latitude = a.latitude 
-    AND v_nova.longitude = a.longitude 
-    AND v_nova.contador = a.contador
+JOIN arvore a ON a.id = v_origem.arvore_id
+JOIN vistoria_inicial v_nova ON v_nova.arvore_id = a.id
 WHERE 
     v_nova.data > v_origem.data 
     AND v_nova.data <= (v_origem.data + 60)
@@ -1,9 +1,26 @@
 import os
 from src.config.app import aplicacao
+from src.app.rotas.rotas import arvore_cont
+from src.config.database import aquece_em_segundo_plano
+from src.app.utils.security import pool_hash
+from src.app.utils.versoes import versoes_tabelas
+from src.config.seguranca import security
+from src.app.utils.agendador_relatorios import agendador_relatorios
 
 # INICIALIZAR O SERVIDOR
 if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    # Conecta ao banco e pré-carrega o índice do autocomplete de espécies em
+    # segundo plano: o servidor já atende (ex.: página de login) enquanto isso
+    aquece_em_segundo_plano(apos_conectar=arvore_cont.carrega_indice_especies)
+    # Acompanha as alterações de arvore e especie (LISTEN) para os caches
+    versoes_tabelas.inicia()
+    # Sobe os processos do bcrypt antes dos primeiros logins
+    pool_hash.aquece()
+    # Busca em segundo plano os tokens revogados por outros workers
+    security.revogacao.inicia()
+    # Recalcula os relatórios de consultas.sql em segundo plano (RELATORIOS_INTERVALO)
+    agendador_relatorios.inicia()
     print('******** SERVIDOR DA APLICACAO NO AR!! ********')
     aplicacao.run(host='0.0.0.0', port=3000, debug=debug_mode)
 
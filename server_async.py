@@ -0,0 +1,10 @@
+import os
+from aiohttp import web
+from src.config.app_async import aplicacao_async
+
+# INICIALIZAR O SERVIDOR ASSÍNCRONO DA API JSON
+# As telas (HTML) continuam no server.py; este processo atende só as rotas
+# /api de leitura, com muitas consultas em andamento sem uma thread por requisição
+if __name__ == '__main__':
+    print('******** SERVIDOR ASSINCRONO DA API NO AR!! ********')
+    web.run_app(aplicacao_async, host='0.0.0.0', port=int(os.getenv('PORTA_API_ASYNC', '3001')))
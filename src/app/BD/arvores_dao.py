@@ -1,10 +1,77 @@
-class Arvores_dao:
-    def __init__(self, db_pool):
-        self._db_pool = db_pool
-
-    # LISTAR TODAS AS ÁRVORES (para /arvores)
-    def select_na_tabela_clientes(self):
-        sql = """
+import math
+import queue
+import threading
+
+from src.app.utils.tiles import cache_tiles
+from src.app.utils.indice_especies import indice_especies
+from src.app.utils.cache_resultados import cache_resultados, cacheado
+from src.app.utils.versoes import versoes_tabelas
+from src.app.BD.consultas_preparadas import consultas_preparadas
+
+# Metros por grau de latitude (aproximação esférica usada nas buscas por raio)
+METROS_POR_GRAU = 111320.0
+
+# Distância em metros entre a árvore e o ponto (%(lat)s, %(lng)s), pela fórmula de haversine
+SQL_DISTANCIA_METROS = """
+    6371000 * 2 * ASIN(SQRT(
+        POWER(SIN(RADIANS("latitude" - %(lat)s) / 2), 2)
+        + COS(RADIANS(%(lat)s)) * COS(RADIANS("latitude"))
+        * POWER(SIN(RADIANS("longitude" - %(lng)s) / 2), 2)
+    ))
+"""
+
+
+def monta_paginacao(condicoes, params, apos_id=None, antes_id=None, limite=None, coluna_id='"id"'):
+    """
+    Monta o trecho WHERE/ORDER BY/LIMIT da paginação por cursor (keyset) em "id"
+
+    Em vez de OFFSET, a página é definida pelo último id visto ("linhas depois
+    do id X, no máximo N"), o que mantém o custo de cada página constante
+    independentemente do tamanho da tabela (usa o índice da chave primária).
+
+    Args:
+        condicoes: Lista de condições SQL já existentes (é copiada)
+        params: Lista de parâmetros das condições (é copiada)
+        apos_id: Retorna as linhas com id maior que este valor (próxima página)
+        antes_id: Retorna as linhas com id menor que este valor (página anterior)
+        limite: Quantidade máxima de linhas (None = sem limite)
+        coluna_id: Coluna usada como cursor (com alias da tabela, se houver JOIN)
+
+    Returns:
+        Tupla (trecho_sql, params, invertido). Quando invertido é True as linhas
+        vêm em ordem decrescente de id e devem ser revertidas pelo chamador.
+    """
+    condicoes = list(condicoes)
+    params = list(params)
+    invertido = False
+
+    if apos_id is not None:
+        condicoes.append(coluna_id + ' > %s')
+        params.append(apos_id)
+    elif antes_id is not None:
+        condicoes.append(coluna_id + ' < %s')
+        params.append(antes_id)
+        invertido = True
+
+    sql = ""
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+
+    sql += " ORDER BY " + coluna_id + (" DESC" if invertido else "")
+
+    if limite is not None:
+        sql += " LIMIT %s"
+        params.append(limite)
+
+    return sql, params, invertido
+
+
+# ----------------------------------------------------------------------------
+# SQL das leituras, compartilhado com o DAO assíncrono (arvores_dao_async.py).
+# Os marcadores %s / %(nome)s valem tanto no psycopg2 quanto no psycopg 3.
+# ----------------------------------------------------------------------------
+
+SQL_LISTAGEM_ARVORES = """
             SELECT
                 "id",
                 "latitude",
@@ -16,21 +83,151 @@ class Arvores_dao:
                 "ultima_vistoria",
                 "nome_cientifico"
             FROM arvore
+        """
+
+SQL_RESUMO = """
+            SELECT
+                "status",
+                "tipo",
+                "nome_cientifico",
+                "quantidade"
+            FROM arvore_resumo
+            WHERE "quantidade" > 0
+            ORDER BY "nome_cientifico", "status", "tipo"
+        """
+
+
+def monta_listagem(status=None, apos_id=None, antes_id=None, limite=None):
+    """
+    SQL da listagem de árvores, com filtro de status opcional ("todos" = sem filtro)
+
+    Returns:
+        Tupla (sql, params, invertido), como em monta_paginacao
+    """
+    condicoes = []
+    params = []
+
+    # Se vier um status específico (e não "todos"), filtra
+    if status and status != "todos":
+        condicoes.append('"status" = %s')
+        params.append(status)
+
+    trecho, params, invertido = monta_paginacao(condicoes, params, apos_id, antes_id, limite)
+    return SQL_LISTAGEM_ARVORES + trecho, params, invertido
+
+
+def monta_busca_especies(termo_busca=None):
+    """SQL da lista de espécies, filtrada por trecho do nome científico ou popular"""
+    sql = """
+            SELECT
+                nome_cientifico,
+                nome_popular,
+                nativa
+            FROM especie
+        """
+
+    params = []
+
+    # Se houver termo de busca, filtrar por nome científico ou nome popular
+    if termo_busca:
+        sql += " WHERE nome_cientifico ILIKE %s OR nome_popular ILIKE %s"
+        termo_like = f"%{termo_busca}%"
+        params = [termo_like, termo_like]
+
+    sql += " ORDER BY nome_cientifico"
+    return sql, params
+
+
+def monta_busca_area(min_lat, min_lng, max_lat, max_lng, limite=500):
+    """SQL das árvores dentro de um retângulo"""
+    # O operador <@ (ponto contido na caixa) usa o índice GiST de "localizacao"
+    sql = """
+            SELECT
+                "id",
+                "latitude"::DOUBLE PRECISION AS latitude,
+                "longitude"::DOUBLE PRECISION AS longitude,
+                "status",
+                "tipo",
+                "altura"::DOUBLE PRECISION AS altura,
+                "dap"::DOUBLE PRECISION AS dap,
+                "ultima_vistoria"::TEXT AS ultima_vistoria,
+                "nome_cientifico"
+            FROM arvore
+            WHERE "localizacao" <@ BOX(POINT(%s, %s), POINT(%s, %s))
             ORDER BY "id"
+            LIMIT %s
         """
+    params = (min_lng, min_lat, max_lng, max_lat, limite)
+    return sql, params
+
+
+def monta_busca_proximas(lat, lng, raio_m=50, limite=100):
+    """SQL das árvores a até raio_m metros do ponto, da mais próxima para a mais distante"""
+    # Primeiro filtra pela caixa que envolve o círculo (usa o índice GiST),
+    # depois calcula a distância exata só para as árvores dessa caixa
+    delta_lat = raio_m / METROS_POR_GRAU
+    delta_lng = raio_m / (METROS_POR_GRAU * max(math.cos(math.radians(lat)), 1e-6))
+
+    sql = """
+        SELECT * FROM (
+            SELECT
+                "id",
+                "latitude"::DOUBLE PRECISION AS latitude,
+                "longitude"::DOUBLE PRECISION AS longitude,
+                "status",
+                "tipo",
+                "altura"::DOUBLE PRECISION AS altura,
+                "dap"::DOUBLE PRECISION AS dap,
+                "ultima_vistoria"::TEXT AS ultima_vistoria,
+                "nome_cientifico",
+                {distancia} AS distancia_m
+            FROM arvore
+            WHERE "localizacao" <@ BOX(POINT(%(min_lng)s, %(min_lat)s), POINT(%(max_lng)s, %(max_lat)s))
+        ) t
+        WHERE distancia_m <= %(raio)s
+        ORDER BY distancia_m
+        LIMIT %(limite)s
+    """.format(distancia=SQL_DISTANCIA_METROS)
+    params = {
+        'lat': lat,
+        'lng': lng,
+        'min_lat': lat - delta_lat,
+        'max_lat': lat + delta_lat,
+        'min_lng': lng - delta_lng,
+        'max_lng': lng + delta_lng,
+        'raio': raio_m,
+        'limite': limite,
+    }
+    return sql, params
+
+
+class Arvores_dao:
+    def __init__(self, db_pool, cache=cache_resultados, db_pool_leitura=None):
+        self._db_pool = db_pool
+        # Listagens e espécies podem ser lidas de uma réplica; escritas sempre no primário
+        self._db_pool_leitura = db_pool_leitura or db_pool
+        # Cache das leituras mais repetidas (None desliga para esta instância)
+        self._cache = cache
+
+    # LISTAR ÁRVORES (para /arvores), paginado por id
+    @cacheado("arvore")
+    def select_na_tabela_clientes(self, apos_id=None, antes_id=None, limite=None):
+        sql, params, invertido = monta_listagem(None, apos_id, antes_id, limite)
 
-        print("SELECT ARVORE =", sql)
+        print("SELECT ARVORE =", sql, params)
 
         conn = None
         try:
-            conn = self._db_pool.getconn()
+            conn = self._db_pool_leitura.getconn()
             cursor = conn.cursor()
-            cursor.execute(sql)
+            consultas_preparadas.executa(cursor, sql, params)
             resultados = cursor.fetchall()
 
             # Converter para lista de dicionários
             colunas = [desc[0] for desc in cursor.description]
             arvore = [dict(zip(colunas, row)) for row in resultados]
+            if invertido:
+                arvore.reverse()
 
             cursor.close()
             return None, arvore
@@ -40,10 +237,16 @@ class Arvores_dao:
             return "Não foi possível carregar a listagem de árvores. Por favor, tente novamente mais tarde. Se o problema persistir, entre em contato com o suporte.", []
         finally:
             if conn:
-                self._db_pool.putconn(conn)
+                self._db_pool_leitura.putconn(conn)
 
     # INSERIR NOVA ÁRVORE
     def inclui_clientes(self, dados):
+        """
+        Cadastra uma árvore
+
+        Returns:
+            Tupla (erro, arvore), com o id e o contador atribuídos em arvore
+        """
         conn = None
         try:
             conn = self._db_pool.getconn()
@@ -57,171 +260,138 @@ class Arvores_dao:
             try:
                 lat_valor = float(latitude) if latitude else None
                 if lat_valor is None:
-                    return "Por favor, informe a latitude da árvore. A latitude é obrigatória para o cadastro."
+                    return "Por favor, informe a latitude da árvore. A latitude é obrigatória para o cadastro.", None
                 if lat_valor < -90 or lat_valor > 90:
-                    return f"A latitude informada ({latitude}) está fora do intervalo permitido. Por favor, informe uma latitude entre -90 e 90 graus."
+                    return f"A latitude informada ({latitude}) está fora do intervalo permitido. Por favor, informe uma latitude entre -90 e 90 graus.", None
                 
                 # Validar que latitude tem no máximo 8 dígitos (contando todos os dígitos, não o ponto decimal nem o sinal negativo)
                 # Remover ponto decimal, sinal negativo e espaços, mas manter todos os dígitos incluindo zeros
                 lat_str = ''.join(c for c in str(latitude) if c.isdigit())
                 if len(lat_str) > 8:
-                    return f"A latitude informada ({latitude}) possui mais de 8 dígitos. Por favor, informe uma latitude com no máximo 8 dígitos (exemplo: -23.5505 ou 45.6789)."
+                    return f"A latitude informada ({latitude}) possui mais de 8 dígitos. Por favor, informe uma latitude com no máximo 8 dígitos (exemplo: -23.5505 ou 45.6789).", None
                     
             except (ValueError, TypeError):
-                return f"A latitude informada ('{latitude}') não é um número válido. Por favor, informe apenas números (exemplo: -23.5505 ou 45.6789)."
+                return f"A latitude informada ('{latitude}') não é um número válido. Por favor, informe apenas números (exemplo: -23.5505 ou 45.6789).", None
 
             # Validar longitude
             try:
                 lng_valor = float(longitude) if longitude else None
                 if lng_valor is None:
-                    return "Por favor, informe a longitude da árvore. A longitude é obrigatória para o cadastro."
+                    return "Por favor, informe a longitude da árvore. A longitude é obrigatória para o cadastro.", None
                 if lng_valor < -180 or lng_valor > 180:
-                    return f"A longitude informada ({longitude}) está fora do intervalo permitido. Por favor, informe uma longitude entre -180 e 180 graus."
+                    return f"A longitude informada ({longitude}) está fora do intervalo permitido. Por favor, informe uma longitude entre -180 e 180 graus.", None
                 
                 # Validar que longitude tem no máximo 8 dígitos (contando todos os dígitos, não o ponto decimal nem o sinal negativo)
                 # Remover ponto decimal, sinal negativo e espaços, mas manter todos os dígitos incluindo zeros
                 lng_str = ''.join(c for c in str(longitude) if c.isdigit())
                 if len(lng_str) > 8:
-                    return f"A longitude informada ({longitude}) possui mais de 8 dígitos. Por favor, informe uma longitude com no máximo 8 dígitos (exemplo: -46.6333 ou 120.4567)."
+                    return f"A longitude informada ({longitude}) possui mais de 8 dígitos. Por favor, informe uma longitude com no máximo 8 dígitos (exemplo: -46.6333 ou 120.4567).", None
                     
             except (ValueError, TypeError):
-                return f"A longitude informada ('{longitude}') não é um número válido. Por favor, informe apenas números (exemplo: -46.6333 ou 120.4567)."
-
-            # 1) BUSCAR REGISTROS EXISTENTES na mesma localização
-            cursor.execute(
+                return f"A longitude informada ('{longitude}') não é um número válido. Por favor, informe apenas números (exemplo: -46.6333 ou 120.4567).", None
+
+            # Contador, TAG e árvore em um único comando (função inclui_arvore, em
+            # db/init/06_inclui_arvore.sql), serializado por localização no banco.
+            # Em autocommit, a chamada já é a transação inteira: uma ida ao banco.
+            conn.autocommit = True
+            consultas_preparadas.executa(
+                cursor,
                 """
-                SELECT contador, status 
-                FROM arvore
-                WHERE latitude = %s AND longitude = %s
-                ORDER BY contador ASC
+                SELECT id, contador
+                FROM inclui_arvore(%s, %s, %s, %s, %s, %s, %s, %s)
             """,
-                (latitude, longitude),
-            )
-
-            registros = cursor.fetchall()
-
-            # 2) DEFINIÇÃO DO CONTADOR E VALIDAÇÃO
-
-            # Caso não exista nenhuma árvore neste ponto
-            if not registros:
-                contador = 1
-
-            else:
-                # Separar árvores removidas (cortadas) das ativas
-                # Status "cortada" é considerado removida, outros status são ativos
-                arvores_removidas = [r for r in registros if r[1] == "cortada"]
-                arvores_ativas = [r for r in registros if r[1] != "cortada"]
-
-                # Se todas estão removidas (cortadas), pode inserir nova com contador incrementado
-                if not arvores_ativas:
-                    maior_contador = max([r[0] for r in registros]) if registros else 0
-                    contador = maior_contador + 1
-                else:
-                    # Existe pelo menos uma árvore ativa na mesma localização
-                    # O contador será 1, mas precisa verificar se já existe uma árvore com contador = 1
-                    contador = 1
-                    existe_contador_1 = any(r[0] == 1 for r in arvores_ativas)
-                    
-                    if existe_contador_1:
-                        # Já existe uma árvore ativa com contador = 1 na mesma localização
-                        # Tentar inserir causará erro de chave duplicada
-                        # Retornar mensagem amigável ANTES de tentar inserir
-                        return f"Já existe uma árvore cadastrada na localização informada (Latitude: {latitude}, Longitude: {longitude}). Por favor, verifique se as coordenadas estão corretas. Se você deseja cadastrar uma nova árvore, utilize coordenadas diferentes ou aguarde até que a árvore existente seja removida."
-
-            # 3) INSERIR TAG (SE TIVER) - Deve ser inserida ANTES da árvore
-            if dados.get("tem_tag") and codigo_tag:
-                sql_tag = """
-                    INSERT INTO tag (codigo_nfc)
-                    VALUES (%s)
-                    ON CONFLICT (codigo_nfc) DO NOTHING
-                """
-                cursor.execute(sql_tag, (codigo_tag,))
-
-            # 4) INSERIR ÁRVORE
-            sql_arvore = """
-                INSERT INTO arvore
-                    (codigo_nfc, latitude, longitude, contador, nome_cientifico, ultima_vistoria, status, tipo, altura, dap)
-                VALUES
-                    (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-
-            cursor.execute(
-                sql_arvore,
                 (
-                    codigo_tag if dados.get("tem_tag") and codigo_tag else None,
                     latitude,
                     longitude,
-                    contador,
+                    codigo_tag if dados.get("tem_tag") and codigo_tag else None,
                     dados.get("nome_cientifico"),
-                    None,  # ultima_vistoria é definida automaticamente pelo sistema, não pelo usuário
                     dados.get("status"),
                     dados.get("tipo"),
                     dados.get("altura_m") or None,
                     dados.get("dap_cm") or None,
                 ),
             )
-
-            # FINALIZA
-            conn.commit()
+            arvore_id, contador = cursor.fetchone()
             cursor.close()
-            return None
+
+            # Só os tiles do mapa que contêm a nova árvore precisam ser recalculados
+            cache_tiles.invalida_ponto(lat_valor, lng_valor)
+            versoes_tabelas.marca_alteracao("arvore")
+            if self._cache:
+                self._cache.invalida("arvore")
+            return None, {'id': arvore_id, 'contador': contador}
 
         except Exception as erro:
-            if conn:
+            if conn and not conn.closed and not conn.autocommit:
                 conn.rollback()
             print(f"Erro ao inserir árvore: {erro}")
             
-            # Tratar erros específicos e retornar mensagens amigáveis
-            erro_str = str(erro).lower()
+            # Tratar erros específicos e retornar mensagens amigáveis. Só a mensagem
+            # principal é analisada: o contexto traz o código de inclui_arvore, que
+            # cita latitude, contador etc. e confundiria as comparações abaixo
+            diag = getattr(erro, 'diag', None)
+            erro_str = (diag.message_primary if diag is not None and diag.message_primary else str(erro)).lower()
             
             # Erro de constraint de latitude
             if "ck_arvore_latitude" in erro_str or ("latitude" in erro_str and "check" in erro_str and "constraint" in erro_str):
                 # Verificar se é erro de dígitos ou de range
                 if "length" in erro_str or "8" in erro_str:
-                    return f"A latitude informada ({latitude}) possui mais de 8 dígitos. Por favor, informe uma latitude com no máximo 8 dígitos (exemplo: -23.5505 ou 45.6789)."
-                return "A latitude informada está fora do intervalo permitido. Por favor, informe uma latitude entre -90 e 90 graus."
+                    return f"A latitude informada ({latitude}) possui mais de 8 dígitos. Por favor, informe uma latitude com no máximo 8 dígitos (exemplo: -23.5505 ou 45.6789).", None
+                return "A latitude informada está fora do intervalo permitido. Por favor, informe uma latitude entre -90 e 90 graus.", None
             
             # Erro de constraint de longitude
             if "ck_arvore_longitude" in erro_str or ("longitude" in erro_str and "check" in erro_str and "constraint" in erro_str):
                 # Verificar se é erro de dígitos ou de range
                 if "length" in erro_str or "8" in erro_str:
-                    return f"A longitude informada ({longitude}) possui mais de 8 dígitos. Por favor, informe uma longitude com no máximo 8 dígitos (exemplo: -46.6333 ou 120.4567)."
-                return "A longitude informada está fora do intervalo permitido. Por favor, informe uma longitude entre -180 e 180 graus."
+                    return f"A longitude informada ({longitude}) possui mais de 8 dígitos. Por favor, informe uma longitude com no máximo 8 dígitos (exemplo: -46.6333 ou 120.4567).", None
+                return "A longitude informada está fora do intervalo permitido. Por favor, informe uma longitude entre -180 e 180 graus.", None
             
             # Erro de constraint de contador
             if "ck_arvore_contador" in erro_str or "contador" in erro_str and ("check" in erro_str or "constraint" in erro_str):
-                return "Ocorreu um erro ao processar o contador da árvore. Por favor, tente novamente."
+                return "Ocorreu um erro ao processar o contador da árvore. Por favor, tente novamente.", None
             
+            # Já existe árvore ativa com contador 1 no ponto (detectado em inclui_arvore)
+            if "arvore_ativa_na_localizacao" in erro_str:
+                return f"Já existe uma árvore cadastrada na localização informada (Latitude: {latitude}, Longitude: {longitude}). Por favor, verifique se as coordenadas estão corretas. Se você deseja cadastrar uma nova árvore, utilize coordenadas diferentes ou aguarde até que a árvore existente seja removida.", None
+
             # Erro de chave duplicada (árvore já existe na mesma localização)
             if "duplicate key" in erro_str and ("latitude" in erro_str or "longitude" in erro_str or "contador" in erro_str or "arvore_latitude_longitude_contador_key" in erro_str):
                 # Tentar extrair as coordenadas do erro ou usar as que foram validadas
                 try:
-                    return f"Já existe uma árvore cadastrada na localização informada (Latitude: {latitude}, Longitude: {longitude}). Por favor, verifique se as coordenadas estão corretas. Se você deseja cadastrar uma nova árvore, utilize coordenadas diferentes ou aguarde até que a árvore existente seja removida."
+                    return f"Já existe uma árvore cadastrada na localização informada (Latitude: {latitude}, Longitude: {longitude}). Por favor, verifique se as coordenadas estão corretas. Se você deseja cadastrar uma nova árvore, utilize coordenadas diferentes ou aguarde até que a árvore existente seja removida.", None
                 except:
-                    return "Já existe uma árvore cadastrada nesta localização exata. Por favor, verifique se as coordenadas (latitude e longitude) estão corretas ou se você deseja cadastrar uma nova árvore em uma localização diferente."
+                    return "Já existe uma árvore cadastrada nesta localização exata. Por favor, verifique se as coordenadas (latitude e longitude) estão corretas ou se você deseja cadastrar uma nova árvore em uma localização diferente.", None
             
             # Erro de foreign key (espécie não existe)
             if "violates foreign key constraint" in erro_str and ("especie" in erro_str or "nome_cientifico" in erro_str):
-                return "A espécie informada não está cadastrada no sistema. Por favor, cadastre a espécie primeiro na página 'Cadastro de Espécie' ou verifique se o nome científico está correto."
+                return "A espécie informada não está cadastrada no sistema. Por favor, cadastre a espécie primeiro na página 'Cadastro de Espécie' ou verifique se o nome científico está correto.", None
             
             # Erro de foreign key (tag não existe)
             if "violates foreign key constraint" in erro_str and "tag" in erro_str:
-                return "O código da TAG informado não está cadastrado no sistema. Verifique o código da TAG ou cadastre uma nova TAG antes de associá-la à árvore."
+                return "O código da TAG informado não está cadastrado no sistema. Verifique o código da TAG ou cadastre uma nova TAG antes de associá-la à árvore.", None
             
             # Erro de constraint de status
             if "ck_arvore_status" in erro_str or ("status" in erro_str and "check" in erro_str):
-                return "O status informado não é válido. Por favor, selecione um dos status disponíveis: Saudável, Doente, Em Risco, Corte Programado ou Cortada."
+                return "O status informado não é válido. Por favor, selecione um dos status disponíveis: Saudável, Doente, Em Risco, Corte Programado ou Cortada.", None
             
             # Erro de constraint de tipo
             if "tipo" in erro_str and "check" in erro_str:
-                return "O tipo informado não é válido. Por favor, selecione 'Pública' ou 'Privada'."
+                return "O tipo informado não é válido. Por favor, selecione 'Pública' ou 'Privada'.", None
             
             # Erro genérico com mensagem amigável
-            return "Não foi possível cadastrar a árvore. Verifique se todos os campos obrigatórios foram preenchidos corretamente e tente novamente. Se o problema persistir, entre em contato com o suporte."
+            return "Não foi possível cadastrar a árvore. Verifique se todos os campos obrigatórios foram preenchidos corretamente e tente novamente. Se o problema persistir, entre em contato com o suporte.", None
 
         finally:
             if conn:
-                self._db_pool.putconn(conn)
+                # Conexão que caiu no meio da chamada não aceita mudar o autocommit:
+                # volta ao pool para ser descartada, sem perder a vaga
+                descartar = bool(conn.closed)
+                if not descartar:
+                    try:
+                        conn.autocommit = False
+                    except Exception:
+                        descartar = True
+                self._db_pool.putconn(conn, close=descartar)
 
     # EXCLUIR ÁRVORE - DESABILITADO
     # A remoção de árvores foi desabilitada devido a conflitos de foreign key.
@@ -260,37 +430,279 @@ class Arvores_dao:
     #         if conn:
     #             self._db_pool.putconn(conn)
 
-    def select_arvores_por_status(self, status):
-        sql = """
-            SELECT
-                "id",
-                "latitude",
-                "longitude",
-                "status",
-                "tipo",
-                "altura",
-                "dap",
-                "ultima_vistoria",
-                "nome_cientifico"
-            FROM arvore
+    @cacheado("arvore")
+    def select_arvores_por_status(self, status, apos_id=None, antes_id=None, limite=None):
+        sql, params, invertido = monta_listagem(status, apos_id, antes_id, limite)
+
+        print("SELECT ARVORES POR STATUS =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            consultas_preparadas.executa(cursor, sql, params)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            arvores = [dict(zip(colunas, row)) for row in resultados]
+            if invertido:
+                arvores.reverse()
+
+            cursor.close()
+            return None, arvores
+        except Exception as erro:
+            print(f"Erro em consulta_cliente_por_status (arvores): {erro}")
+            # Retornar erro amigável para o usuário
+            return "Não foi possível realizar a consulta de árvores. Por favor, tente novamente mais tarde. Se o problema persistir, entre em contato com o suporte.", []
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn)
+
+    # PERCORRER TODAS AS ÁRVORES EM LOTES (para a listagem completa em streaming)
+    def itera_arvores(self, status=None, tamanho_lote=2000):
         """
+        Gera as árvores uma a uma a partir de um cursor do lado do servidor
+
+        O cursor nomeado do psycopg2 busca as linhas do PostgreSQL em lotes de
+        tamanho_lote, então a memória usada fica limitada a um lote, não à
+        tabela inteira, e as primeiras linhas chegam enquanto a consulta segue.
+
+        Args:
+            status: Filtro opcional de status (None ou "todos" = sem filtro)
+            tamanho_lote: Quantidade de linhas buscadas por ida ao banco
 
+        Yields:
+            Dicionário com os dados de cada árvore, em ordem de id
+        """
+        condicoes = []
         params = []
+        if status and status != "todos":
+            condicoes.append('"status" = %s')
+            params.append(status)
+
+        trecho, params, _ = monta_paginacao(condicoes, params)
+        sql = SQL_LISTAGEM_ARVORES + trecho
 
-        # Se vier um status específico (e não "todos"), filtra
+        print("SELECT ARVORES (STREAMING) =", sql, params)
+
+        conn = None
+        cursor = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor(name="itera_arvores")
+            cursor.itersize = tamanho_lote
+            cursor.execute(sql, tuple(params) if params else None)
+
+            colunas = None
+            for row in cursor:
+                if colunas is None:
+                    colunas = [desc[0] for desc in cursor.description]
+                yield dict(zip(colunas, row))
+        except Exception as erro:
+            # A resposta já começou a ser enviada, então só é possível registrar o erro
+            print(f"Erro no itera_arvores: {erro}")
+        finally:
+            if cursor is not None and not cursor.closed and not conn.closed:
+                cursor.close()
+            if conn:
+                # putconn encerra a transação aberta pelo cursor nomeado; uma
+                # conexão que caiu no meio do streaming é descartada
+                self._db_pool.putconn(conn, close=bool(conn.closed))
+
+    # MONTAR CONSULTA DE EXPORTAÇÃO (usada por exporta_csv e exporta_json)
+    def _sql_exportacao(self, status=None, com_especie=False):
+        colunas = [
+            'a."id"',
+            'a."latitude"',
+            'a."longitude"',
+            'a."contador"',
+            'a."codigo_nfc"',
+            'a."status"',
+            'a."tipo"',
+            'a."altura"',
+            'a."dap"',
+            'a."ultima_vistoria"',
+            'a."nome_cientifico"',
+        ]
+        sql = "SELECT {colunas} FROM arvore a"
+        if com_especie:
+            colunas += ['e."nome_popular"', 'e."nativa"']
+            sql += " LEFT JOIN especie e ON e.nome_cientifico = a.nome_cientifico"
+        sql = sql.format(colunas=", ".join(colunas))
+
+        condicoes = []
+        params = []
         if status and status != "todos":
-            sql += ' WHERE "status" = %s'
+            condicoes.append('a."status" = %s')
             params.append(status)
 
-        sql += ' ORDER BY "id"'
+        trecho, params, _ = monta_paginacao(condicoes, params, coluna_id='a."id"')
+        return sql + trecho, params
 
-        print("SELECT ARVORES POR STATUS =", sql, params)
+    # EXPORTAR ÁRVORES EM CSV (COPY ... TO STDOUT)
+    def exporta_csv(self, status=None, com_especie=False, tamanho_fila=64):
+        """
+        Gera o CSV das árvores direto do PostgreSQL com COPY ... TO STDOUT
+
+        O COPY roda em uma thread auxiliar e escreve os blocos recebidos em
+        uma fila limitada; o gerador entrega esses blocos para a resposta
+        HTTP. A memória fica limitada a tamanho_fila blocos, sem montar
+        dicionários por linha em Python.
+
+        Args:
+            status: Filtro opcional de status (None ou "todos" = sem filtro)
+            com_especie: Inclui nome_popular e nativa da tabela especie
+            tamanho_fila: Quantidade máxima de blocos aguardando envio
+
+        Yields:
+            Blocos de texto CSV (o primeiro contém o cabeçalho)
+        """
+        select, params = self._sql_exportacao(status, com_especie)
+
+        fila = queue.Queue(maxsize=tamanho_fila)
+        cancelado = threading.Event()
+        # Só é marcado quando o COPY chegou ao fim pelo protocolo
+        copy_concluido = threading.Event()
+        fim = object()
+
+        class _EscritorFila:
+            # Objeto "arquivo" que o copy_expert usa para entregar os dados
+            def write(self, dados):
+                while True:
+                    if cancelado.is_set():
+                        raise IOError("Exportação cancelada pelo cliente")
+                    try:
+                        fila.put(dados, timeout=1)
+                        return len(dados)
+                    except queue.Full:
+                        continue
+
+        def executa_copy(conn):
+            try:
+                cursor = conn.cursor()
+                sql = "COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)".format(
+                    cursor.mogrify(select, tuple(params) if params else None).decode("utf-8")
+                )
+                print("EXPORTA ARVORES CSV =", sql)
+                cursor.copy_expert(sql, _EscritorFila())
+                cursor.close()
+                copy_concluido.set()
+            except Exception as erro:
+                if not cancelado.is_set():
+                    print(f"Erro no exporta_csv: {erro}")
+            finally:
+                while not cancelado.is_set():
+                    try:
+                        fila.put(fim, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
 
         conn = None
+        thread = None
         try:
             conn = self._db_pool.getconn()
-            cursor = conn.cursor()
+            thread = threading.Thread(target=executa_copy, args=(conn,), daemon=True)
+            thread.start()
+            while True:
+                bloco = fila.get()
+                if bloco is fim:
+                    break
+                yield bloco if isinstance(bloco, str) else bloco.decode("utf-8")
+        except Exception as erro:
+            print(f"Erro no exporta_csv: {erro}")
+        finally:
+            # Cliente desconectou ou o envio terminou: encerra o COPY e espera a thread
+            cancelado.set()
+            if thread is not None:
+                thread.join()
+            if conn:
+                if copy_concluido.is_set():
+                    self._db_pool.putconn(conn)
+                else:
+                    # COPY interrompido no meio: a conexão pode ter ficado fora de
+                    # sincronia com o servidor, então é fechada em vez de reaproveitada
+                    self._db_pool.putconn(conn, close=True)
+
+    # EXPORTAR ÁRVORES EM NDJSON OU GEOJSON (cursor do lado do servidor)
+    def exporta_json(self, status=None, com_especie=False, geojson=False, tamanho_lote=5000):
+        """
+        Gera as árvores em NDJSON (um objeto por linha) ou GeoJSON
+
+        Cada linha já sai do PostgreSQL como texto JSON (row_to_json), lida
+        em lotes por um cursor nomeado, então o Python apenas concatena
+        strings, sem converter linha a linha para dicionário.
+
+        Args:
+            status: Filtro opcional de status (None ou "todos" = sem filtro)
+            com_especie: Inclui nome_popular e nativa da tabela especie
+            geojson: True para FeatureCollection, False para NDJSON
+            tamanho_lote: Quantidade de linhas buscadas por ida ao banco
+
+        Yields:
+            Blocos de texto JSON
+        """
+        select, params = self._sql_exportacao(status, com_especie)
+
+        if geojson:
+            sql = """
+                SELECT json_build_object(
+                    'type', 'Feature',
+                    'id', t."id",
+                    'geometry', json_build_object(
+                        'type', 'Point',
+                        'coordinates', json_build_array(t."longitude", t."latitude")
+                    ),
+                    'properties', row_to_json(t)
+                )::text
+                FROM ({}) t
+            """.format(select)
+        else:
+            sql = "SELECT row_to_json(t)::text FROM ({}) t".format(select)
+
+        print("EXPORTA ARVORES JSON =", sql, params)
+
+        conn = None
+        cursor = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor(name="exporta_arvores")
             cursor.execute(sql, tuple(params) if params else None)
+
+            if geojson:
+                yield '{"type": "FeatureCollection", "features": [\n'
+            separador = ""
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                if geojson:
+                    yield separador + ",\n".join(linha[0] for linha in linhas)
+                    separador = ",\n"
+                else:
+                    yield "\n".join(linha[0] for linha in linhas) + "\n"
+            if geojson:
+                yield "\n]}\n"
+        except Exception as erro:
+            print(f"Erro no exporta_json: {erro}")
+        finally:
+            if cursor is not None and not cursor.closed and not conn.closed:
+                cursor.close()
+            if conn:
+                # putconn encerra a transação do cursor nomeado; conexão caída é descartada
+                self._db_pool.putconn(conn, close=bool(conn.closed))
+
+    # BUSCAR ÁRVORES DENTRO DE UM RETÂNGULO (viewport do mapa)
+    def select_arvores_por_area(self, min_lat, min_lng, max_lat, max_lng, limite=500):
+        sql, params = monta_busca_area(min_lat, min_lng, max_lat, max_lng, limite)
+
+        print("SELECT ARVORES POR AREA =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
             resultados = cursor.fetchall()
 
             colunas = [desc[0] for desc in cursor.description]
@@ -299,9 +711,117 @@ class Arvores_dao:
             cursor.close()
             return None, arvores
         except Exception as erro:
-            print(f"Erro em consulta_cliente_por_status (arvores): {erro}")
-            # Retornar erro amigável para o usuário
-            return "Não foi possível realizar a consulta de árvores. Por favor, tente novamente mais tarde. Se o problema persistir, entre em contato com o suporte.", []
+            print(f"Erro no select_arvores_por_area: {erro}")
+            return "Não foi possível buscar as árvores da área informada. Por favor, tente novamente mais tarde.", []
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
+
+    # BUSCAR ÁRVORES A ATÉ raio_m METROS DE UM PONTO
+    def select_arvores_proximas(self, lat, lng, raio_m=50, limite=100):
+        sql, params = monta_busca_proximas(lat, lng, raio_m, limite)
+
+        print("SELECT ARVORES PROXIMAS =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            arvores = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, arvores
+        except Exception as erro:
+            print(f"Erro no select_arvores_proximas: {erro}")
+            return "Não foi possível buscar as árvores próximas. Por favor, tente novamente mais tarde.", []
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
+
+    # AGREGAR ÁRVORES POR CÉLULA DE UM TILE DO MAPA
+    def select_agregado_tile(self, min_lat, min_lng, max_lat, max_lng, divisoes):
+        """
+        Conta as árvores de cada célula de uma grade divisoes x divisoes sobre o tile
+
+        Returns:
+            Tupla (erro, linhas), uma linha por (célula, status, tipo) com a
+            quantidade e a soma das coordenadas (para o centro do agrupamento)
+        """
+        sql = """
+            SELECT
+                LEAST(FLOOR(("longitude" - %(min_lng)s) / %(passo_lng)s), %(ultima)s)::INTEGER AS celula_x,
+                LEAST(FLOOR((%(max_lat)s - "latitude") / %(passo_lat)s), %(ultima)s)::INTEGER AS celula_y,
+                "status",
+                "tipo",
+                COUNT(*) AS quantidade,
+                SUM("latitude")::DOUBLE PRECISION AS soma_lat,
+                SUM("longitude")::DOUBLE PRECISION AS soma_lng
+            FROM arvore
+            WHERE "localizacao" <@ BOX(POINT(%(min_lng)s, %(min_lat)s), POINT(%(max_lng)s, %(max_lat)s))
+            GROUP BY 1, 2, 3, 4
+        """
+        params = {
+            'min_lat': min_lat,
+            'min_lng': min_lng,
+            'max_lat': max_lat,
+            'max_lng': max_lng,
+            'passo_lat': (max_lat - min_lat) / divisoes,
+            'passo_lng': (max_lng - min_lng) / divisoes,
+            'ultima': divisoes - 1,
+        }
+
+        print("SELECT AGREGADO TILE =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            linhas = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, linhas
+        except Exception as erro:
+            print(f"Erro no select_agregado_tile: {erro}")
+            return "Não foi possível carregar o mapa de árvores. Por favor, tente novamente mais tarde.", []
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
+
+    # RESUMO DO INVENTÁRIO (contagens mantidas por trigger em arvore_resumo)
+    def select_resumo(self):
+        """
+        Lê as contagens de árvores por status, tipo e espécie
+
+        Returns:
+            Tupla (erro, linhas), uma linha por (status, tipo, espécie) com a quantidade
+        """
+        sql = SQL_RESUMO
+
+        print("SELECT RESUMO =", sql)
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            linhas = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, linhas
+        except Exception as erro:
+            print(f"Erro no select_resumo: {erro}")
+            return "Não foi possível carregar o resumo das árvores. Por favor, tente novamente mais tarde.", []
         finally:
             if conn:
                 self._db_pool.putconn(conn)
@@ -342,6 +862,18 @@ class Arvores_dao:
             # Finalizar
             conn.commit()
             cursor.close()
+
+            versoes_tabelas.marca_alteracao("especie")
+            if self._cache:
+                self._cache.invalida("especie")
+
+            # Mantém o índice do autocomplete em dia sem recarregar o catálogo
+            if indice_especies.carregado:
+                indice_especies.adiciona({
+                    'nome_cientifico': nome_cientifico,
+                    'nome_popular': nome_popular,
+                    'nativa': nativa,
+                })
             return None
 
         except Exception as erro:
@@ -364,32 +896,17 @@ class Arvores_dao:
                 self._db_pool.putconn(conn)
 
     # BUSCAR ESPÉCIES (para autocomplete)
+    @cacheado("especie")
     def select_especies(self, termo_busca=None):
-        sql = """
-            SELECT
-                nome_cientifico,
-                nome_popular,
-                nativa
-            FROM especie
-        """
-        
-        params = []
-        
-        # Se houver termo de busca, filtrar por nome científico ou nome popular
-        if termo_busca:
-            sql += " WHERE nome_cientifico ILIKE %s OR nome_popular ILIKE %s"
-            termo_like = f"%{termo_busca}%"
-            params = [termo_like, termo_like]
-        
-        sql += " ORDER BY nome_cientifico"
+        sql, params = monta_busca_especies(termo_busca)
 
         print("SELECT ESPECIES =", sql, params)
 
         conn = None
         try:
-            conn = self._db_pool.getconn()
+            conn = self._db_pool_leitura.getconn()
             cursor = conn.cursor()
-            cursor.execute(sql, tuple(params) if params else None)
+            consultas_preparadas.executa(cursor, sql, params)
             resultados = cursor.fetchall()
 
             # Converter para lista de dicionários
@@ -404,4 +921,4 @@ class Arvores_dao:
             return "Não foi possível buscar as espécies. Por favor, tente novamente mais tarde. Se o problema persistir, entre em contato com o suporte.", []
         finally:
             if conn:
-                self._db_pool.putconn(conn)
+                self._db_pool_leitura.putconn(conn)
@@ -0,0 +1,69 @@
+from src.app.BD.arvores_dao import (
+    monta_listagem, monta_busca_area, monta_busca_proximas, SQL_RESUMO
+)
+
+
+class Arvores_dao_async:
+    """
+    Leituras da API JSON no servidor assíncrono (server_async.py)
+
+    Usa o mesmo SQL do Arvores_dao (monta_listagem, monta_busca_*), executado
+    pelo psycopg 3 com await: enquanto o banco responde, o event loop segue
+    atendendo outras requisições. Os métodos retornam (erro, lista), como no DAO síncrono.
+    """
+
+    def __init__(self, db_pool):
+        self._db_pool = db_pool
+
+    async def _consulta(self, nome_metodo, erro_amigavel, sql, params=None):
+        try:
+            # A conexão volta para o pool ao sair do bloco (commit, ou rollback se houver erro)
+            async with self._db_pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, params)
+                    return None, await cursor.fetchall()
+        except Exception as erro:
+            print(f"Erro no {nome_metodo}: {erro}")
+            return erro_amigavel, []
+
+    # LISTAR ÁRVORES (paginação por cursor, com filtro de status opcional)
+    async def select_arvores_por_status(self, status=None, apos_id=None, antes_id=None, limite=None):
+        sql, params, invertido = monta_listagem(status, apos_id, antes_id, limite)
+
+        print("SELECT ARVORES (async) =", sql, params)
+
+        erro, arvores = await self._consulta(
+            "select_arvores_por_status (async)",
+            "Não foi possível realizar a consulta de árvores. Por favor, tente novamente mais tarde. Se o problema persistir, entre em contato com o suporte.",
+            sql, params
+        )
+        if invertido:
+            # Buscado em ordem decrescente para navegar para trás; volta à ordem normal
+            arvores.reverse()
+        return erro, arvores
+
+    # BUSCA POR RETÂNGULO
+    async def select_arvores_por_area(self, min_lat, min_lng, max_lat, max_lng, limite=500):
+        sql, params = monta_busca_area(min_lat, min_lng, max_lat, max_lng, limite)
+        return await self._consulta(
+            "select_arvores_por_area (async)",
+            "Não foi possível buscar as árvores da área informada. Por favor, tente novamente mais tarde.",
+            sql, params
+        )
+
+    # BUSCA POR RAIO
+    async def select_arvores_proximas(self, lat, lng, raio_m=50, limite=100):
+        sql, params = monta_busca_proximas(lat, lng, raio_m, limite)
+        return await self._consulta(
+            "select_arvores_proximas (async)",
+            "Não foi possível buscar as árvores próximas. Por favor, tente novamente mais tarde.",
+            sql, params
+        )
+
+    # RESUMO DO INVENTÁRIO
+    async def select_resumo(self):
+        return await self._consulta(
+            "select_resumo (async)",
+            "Não foi possível carregar o resumo das árvores. Por favor, tente novamente mais tarde.",
+            SQL_RESUMO
+        )
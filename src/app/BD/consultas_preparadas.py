@@ -0,0 +1,109 @@
+"""
+Registro de consultas preparadas (PREPARE / EXECUTE) dos DAOs
+
+As consultas mais frequentes são preparadas uma única vez em cada conexão
+do pool e, dali em diante, executadas com EXECUTE: o PostgreSQL não precisa
+analisar o texto de novo e, depois de algumas execuções, reaproveita o plano.
+
+- O nome da consulta preparada é derivado do próprio SQL, então cada formato
+  de consulta (ex.: listagem com ou sem filtro de status) tem a sua
+- O registro de quais consultas já foram preparadas é por conexão: uma
+  conexão nova (reconexão, reciclagem do pool) prepara tudo de novo
+- PREPARE não é desfeito por ROLLBACK, então a consulta continua preparada
+  mesmo quando a transação que a preparou falha depois
+"""
+import hashlib
+import os
+import re
+import threading
+import weakref
+
+import psycopg2
+
+# Marcadores de parâmetro do psycopg2 que precisam virar $1, $2... no PREPARE
+_MARCADORES = re.compile(r'%%|%s')
+
+
+class RegistroPreparadas:
+    """Consultas preparadas conhecidas e em quais conexões já foram preparadas"""
+
+    def __init__(self, habilitado=True):
+        self.habilitado = habilitado
+        self._lock = threading.Lock()
+        self._consultas = {}                              # sql -> (nome, sql com $n, quantidade de parâmetros)
+        self._preparadas = weakref.WeakKeyDictionary()    # conexão -> nomes já preparados
+        self._preparos = 0
+        self._execucoes = 0
+
+    def _registra(self, sql):
+        with self._lock:
+            registro = self._consultas.get(sql)
+            if registro is None:
+                contador = [0]
+
+                def substitui(marcador):
+                    if marcador.group(0) == '%%':
+                        return '%'
+                    contador[0] += 1
+                    return f'${contador[0]}'
+
+                sql_preparado = _MARCADORES.sub(substitui, sql)
+                nome = 'gc_' + hashlib.md5(sql.encode('utf-8')).hexdigest()[:16]
+                registro = self._consultas[sql] = (nome, sql_preparado, contador[0])
+            return registro
+
+    def executa(self, cursor, sql, params=None):
+        """
+        Executa o SQL (com marcadores %s) como consulta preparada
+
+        Args:
+            cursor: Cursor da conexão onde a consulta será executada
+            sql: Mesmo texto que seria passado para cursor.execute
+            params: Sequência de parâmetros na ordem dos %s
+        """
+        if not self.habilitado:
+            cursor.execute(sql, tuple(params) if params else None)
+            return
+
+        nome, sql_preparado, quantidade = self._registra(sql)
+        conn = cursor.connection
+        with self._lock:
+            nomes = self._preparadas.setdefault(conn, set())
+            preparada = nome in nomes
+
+        if not preparada:
+            cursor.execute(f"PREPARE {nome} AS {sql_preparado}")
+            with self._lock:
+                nomes.add(nome)
+                self._preparos += 1
+
+        try:
+            if quantidade:
+                marcadores = ', '.join(['%s'] * quantidade)
+                cursor.execute(f"EXECUTE {nome} ({marcadores})", tuple(params))
+            else:
+                cursor.execute(f"EXECUTE {nome}")
+        except psycopg2.errors.InvalidSqlStatementName:
+            # A sessão perdeu as consultas preparadas (ex.: DISCARD ALL):
+            # esquece o que foi preparado nesta conexão para preparar de novo no próximo uso
+            with self._lock:
+                self._preparadas.pop(conn, None)
+            raise
+        with self._lock:
+            self._execucoes += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'habilitado': self.habilitado,
+                'consultas': len(self._consultas),
+                'conexoes': len(self._preparadas),
+                'preparos': self._preparos,
+                'execucoes': self._execucoes,
+            }
+
+
+# Instância global usada por todos os DAOs (DB_CONSULTAS_PREPARADAS=0 desliga)
+consultas_preparadas = RegistroPreparadas(
+    habilitado=os.getenv('DB_CONSULTAS_PREPARADAS', '1').lower() not in ('0', 'false', 'nao')
+)
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from psycopg2.extras import Json
+
+# Arquivo com as consultas analíticas (Consulta 1 a 5)
+CAMINHO_CONSULTAS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    'db', 'scripts', 'consultas.sql'
+)
+
+# Cabeçalho de cada consulta: "-- CONSULTA 2: Título"
+_CABECALHO_CONSULTA = re.compile(r'^-- CONSULTA (\d+): (.+)$', re.MULTILINE)
+
+
+def carrega_consultas(caminho=CAMINHO_CONSULTAS):
+    """
+    Lê as consultas de db/scripts/consultas.sql
+
+    Cada consulta vai do cabeçalho "-- CONSULTA N: título" até o ";" do comando.
+    Linhas só de comentário são descartadas; comentários no fim de uma linha
+    de SQL são mantidos (continuam válidos).
+
+    Returns:
+        Dicionário número -> (título, sql)
+    """
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        texto = arquivo.read()
+
+    consultas = {}
+    cabecalhos = list(_CABECALHO_CONSULTA.finditer(texto))
+    for posicao, cabecalho in enumerate(cabecalhos):
+        fim = cabecalhos[posicao + 1].start() if posicao + 1 < len(cabecalhos) else len(texto)
+        linhas = [
+            linha for linha in texto[cabecalho.end():fim].splitlines()
+            if linha.strip() and not linha.strip().startswith('--')
+        ]
+        sql = '\n'.join(linhas).split(';')[0].strip()
+        if sql:
+            consultas[int(cabecalho.group(1))] = (cabecalho.group(2).strip(), sql)
+    return consultas
+
+
+def _json_padrao(valor):
+    """Converte os tipos do banco que o json não conhece (NUMERIC, DATE, TIME)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo {type(valor).__name__} não serializável em JSON")
+
+
+def _json(dados):
+    return Json(dados, dumps=lambda valor: json.dumps(valor, default=_json_padrao))
+
+
+# Mudanças de risco registradas depois de um id (cálculo incremental da Consulta 1)
+SQL_TRANSICOES_RISCO = """
+    SELECT risco_anterior, risco_novo, escalada, COUNT(*) AS quantidade, MAX(id) AS ultimo_id
+    FROM risco_evento
+    WHERE id > %s
+    GROUP BY risco_anterior, risco_novo, escalada
+"""
+
+SQL_EVENTOS_RECENTES = """
+    SELECT
+        id,
+        arvore_id,
+        cod_solicitacao,
+        data::TEXT AS data_vistoria,
+        hora::TEXT AS hora_vistoria,
+        risco_anterior,
+        risco_novo,
+        escalada
+    FROM risco_evento
+    WHERE id > %s
+    ORDER BY data DESC, hora DESC NULLS LAST, id DESC
+    LIMIT %s
+"""
+
+
+class Relatorios_dao:
+    def __init__(self, db_pool, db_pool_leitura=None):
+        self._db_pool = db_pool
+        # Os cálculos só leem: podem usar uma réplica; os resultados são gravados no primário
+        self._db_pool_leitura = db_pool_leitura or db_pool
+
+    # EXECUTAR UMA CONSULTA ANALÍTICA (com tempo máximo)
+    def executa_consulta(self, sql, tempo_maximo=None):
+        print("SELECT RELATORIO =", sql)
+
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            if tempo_maximo:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(tempo_maximo * 1000),))
+            cursor.execute(sql)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            linhas = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, linhas
+        except Exception as erro:
+            print(f"Erro no executa_consulta: {erro}")
+            return str(erro), []
+        finally:
+            if conn:
+                # putconn encerra a transação (e o SET LOCAL); conexão caída é descartada
+                self._db_pool_leitura.putconn(conn, close=bool(conn.closed))
+
+    # MUDANÇAS DE RISCO DEPOIS DE UM ID (risco_evento)
+    def select_eventos_risco(self, apos_id=0, recentes=500):
+        """
+        Returns:
+            Tupla (erro, transicoes, recentes): transicoes agrupadas por risco
+            anterior e novo (com o maior id de cada grupo) e as mudanças mais recentes
+        """
+        print("SELECT EVENTOS DE RISCO =", apos_id, recentes)
+
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute(SQL_TRANSICOES_RISCO, (apos_id,))
+            colunas = [desc[0] for desc in cursor.description]
+            transicoes = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+            cursor.execute(SQL_EVENTOS_RECENTES, (apos_id, recentes))
+            colunas = [desc[0] for desc in cursor.description]
+            eventos = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+            cursor.close()
+            return None, transicoes, eventos
+        except Exception as erro:
+            print(f"Erro no select_eventos_risco: {erro}")
+            return str(erro), [], []
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn, close=bool(conn.closed))
+
+    # QUANTIDADE DE MUDANÇAS DE RISCO ATÉ UM ID (conferência do incremental)
+    def conta_eventos_risco(self, ate_id):
+        """
+        Returns:
+            Tupla (erro, quantidade de eventos com id menor ou igual a ate_id)
+        """
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM risco_evento WHERE id <= %s", (ate_id,))
+            quantidade = cursor.fetchone()[0]
+            cursor.close()
+            return None, quantidade
+        except Exception as erro:
+            print(f"Erro no conta_eventos_risco: {erro}")
+            return str(erro), None
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn, close=bool(conn.closed))
+
+    # RESULTADOS GUARDADOS
+    def select_snapshot(self, nome, com_dados=True):
+        """
+        Returns:
+            Tupla (erro, snapshot), snapshot None se o relatório ainda não foi calculado
+        """
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute(
+                f"""
+                SELECT atualizado_em, duracao_ms, linhas, marca{', dados' if com_dados else ''}
+                FROM relatorio_snapshot
+                WHERE nome = %s
+                """,
+                (nome,),
+            )
+            linha = cursor.fetchone()
+            cursor.close()
+            conn.commit()
+            if linha is None:
+                return None, None
+            snapshot = {
+                'atualizado_em': linha[0].isoformat(),
+                'duracao_ms': linha[1],
+                'linhas': linha[2],
+                'marca': linha[3],
+            }
+            if com_dados:
+                snapshot['dados'] = linha[4]
+            return None, snapshot
+        except Exception as erro:
+            print(f"Erro no select_snapshot: {erro}")
+            if conn:
+                conn.rollback()
+            return "Não foi possível carregar o relatório. Por favor, tente novamente mais tarde.", None
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn)
+
+    def select_snapshots(self):
+        """Data e tamanho de cada resultado guardado (sem os dados)"""
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute("SELECT nome, atualizado_em, duracao_ms, linhas FROM relatorio_snapshot")
+            snapshots = {
+                nome: {'atualizado_em': atualizado_em.isoformat(), 'duracao_ms': duracao_ms, 'linhas': linhas}
+                for nome, atualizado_em, duracao_ms, linhas in cursor.fetchall()
+            }
+            cursor.close()
+            conn.commit()
+            return None, snapshots
+        except Exception as erro:
+            print(f"Erro no select_snapshots: {erro}")
+            if conn:
+                conn.rollback()
+            return "Não foi possível listar os relatórios. Por favor, tente novamente mais tarde.", {}
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn)
+
+    def grava_snapshot(self, nome, dados, duracao_ms, linhas, marca=None):
+        """Grava (ou substitui) o resultado de um relatório no primário"""
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO relatorio_snapshot (nome, atualizado_em, duracao_ms, linhas, marca, dados)
+                VALUES (%s, now(), %s, %s, %s, %s)
+                ON CONFLICT (nome) DO UPDATE SET
+                    atualizado_em = EXCLUDED.atualizado_em,
+                    duracao_ms = EXCLUDED.duracao_ms,
+                    linhas = EXCLUDED.linhas,
+                    marca = EXCLUDED.marca,
+                    dados = EXCLUDED.dados
+                """,
+                (nome, duracao_ms, linhas, marca, _json(dados)),
+            )
+            conn.commit()
+            cursor.close()
+            return None
+        except Exception as erro:
+            if conn:
+                conn.rollback()
+            print(f"Erro no grava_snapshot: {erro}")
+            return str(erro)
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
@@ -0,0 +1,80 @@
+class Tokens_dao:
+    """Tokens de autenticação revogados no logout (tabela token_revogado)"""
+
+    def __init__(self, db_pool):
+        self._db_pool = db_pool
+
+    def insere_revogado(self, token_hash, expira_em):
+        """
+        Registra um token revogado e apaga os que já expiraram
+
+        Args:
+            token_hash: SHA-256 (hex) do token
+            expira_em: Momento (epoch, em segundos) em que o token expiraria sozinho
+
+        Returns:
+            None se gravou, ou a mensagem de erro
+        """
+        sql_insere = """
+            INSERT INTO token_revogado (token_hash, expira_em)
+            VALUES (%s, to_timestamp(%s))
+            ON CONFLICT (token_hash) DO NOTHING
+        """
+        sql_limpa = "DELETE FROM token_revogado WHERE expira_em < now()"
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql_insere, (token_hash, expira_em))
+            cursor.execute(sql_limpa)
+            conn.commit()
+            cursor.close()
+            return None
+        except Exception as erro:
+            if conn:
+                conn.rollback()
+            print(f"Erro ao revogar token: {erro}")
+            return "Não foi possível encerrar a sessão nos outros servidores."
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
+
+    def select_revogados(self, desde=None):
+        """
+        Lê os tokens revogados que ainda não expiraram
+
+        Args:
+            desde: Momento (epoch) a partir do qual buscar; None = todos
+
+        Returns:
+            Tupla (erro, linhas), cada linha com token_hash e expira_em (epoch),
+            e o momento da leitura segundo o relógio do banco
+        """
+        sql = """
+            SELECT token_hash, EXTRACT(EPOCH FROM expira_em)::DOUBLE PRECISION AS expira_em
+            FROM token_revogado
+            WHERE expira_em > now()
+        """
+        params = []
+        if desde is not None:
+            sql += " AND revogado_em >= to_timestamp(%s)"
+            params.append(desde)
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute("SELECT EXTRACT(EPOCH FROM now())::DOUBLE PRECISION")
+            lido_em = cursor.fetchone()[0]
+            cursor.execute(sql, params)
+            linhas = [{'token_hash': token_hash, 'expira_em': expira_em} for token_hash, expira_em in cursor.fetchall()]
+            conn.commit()
+            cursor.close()
+            return None, linhas, lido_em
+        except Exception as erro:
+            print(f"Erro ao ler tokens revogados: {erro}")
+            return "Não foi possível ler os tokens revogados.", [], None
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
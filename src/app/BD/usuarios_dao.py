@@ -1,11 +1,14 @@
-from src.app.utils.security import SecurityManager
-from src.config.app import aplicacao
+from src.app.utils.security import HashSobrecarregado
+from src.config.seguranca import security
+from src.app.BD.consultas_preparadas import consultas_preparadas
 
 class Usuarios_dao:
-    def __init__(self, db_pool):
+    def __init__(self, db_pool, db_pool_leitura=None):
         self._db_pool = db_pool
-        # Inicializa o gerenciador de segurança
-        self.security = SecurityManager(aplicacao.config['SECRET_KEY'])
+        # O login só lê: pode usar uma réplica. Atualização de senha vai ao primário
+        self._db_pool_leitura = db_pool_leitura or db_pool
+        # Gerenciador de segurança compartilhado
+        self.security = security
 
     def select_na_tabela_usuarios(self, login, senha):
         """
@@ -29,33 +32,43 @@ class Usuarios_dao:
 
         conn = None
         try:
-            conn = self._db_pool.getconn()
+            conn = self._db_pool_leitura.getconn()
             cursor = conn.cursor()
-            cursor.execute(sql_cons_usuarios, values)
+            consultas_preparadas.executa(cursor, sql_cons_usuarios, values)
             resultado = cursor.fetchone()
             cursor.close()
-
-            if resultado:
-                # Converte resultado para dicionário
-                colunas = ['cpf', 'nome', 'email', 'senha', 'papel']
-                usuario = dict(zip(colunas, resultado))
-                
-                # Verifica se a senha corresponde ao hash
-                senha_hash = usuario['senha']
-                if self.security.verify_password(senha, senha_hash):
-                    # Remove a senha do retorno por segurança
-                    usuario.pop('senha', None)
-                    return usuario
-                else:
-                    raise Exception("SENHA INCORRETA")
-            else:
-                raise Exception("USUÁRIO NÃO EXISTE NO BD")
         except Exception as erro:
             print(f"Erro ao consultar usuários: {erro}")
             raise erro
         finally:
+            # Devolve a conexão antes do bcrypt, que leva centenas de milissegundos
             if conn:
-                self._db_pool.putconn(conn)
+                self._db_pool_leitura.putconn(conn)
+
+        if not resultado:
+            print("Erro ao consultar usuários: USUÁRIO NÃO EXISTE NO BD")
+            raise Exception("USUÁRIO NÃO EXISTE NO BD")
+
+        # Converte resultado para dicionário
+        colunas = ['cpf', 'nome', 'email', 'senha', 'papel']
+        usuario = dict(zip(colunas, resultado))
+
+        # Verifica se a senha corresponde ao hash
+        senha_hash = usuario.pop('senha', None)
+        if not self.security.verify_password(senha, senha_hash):
+            print("Erro ao consultar usuários: SENHA INCORRETA")
+            raise Exception("SENHA INCORRETA")
+
+        # Hash gerado com um custo antigo: aproveita a senha conferida para refazê-lo
+        if self.security.precisa_rehash(senha_hash):
+            try:
+                if self.atualiza_senha_hash(usuario['email'], senha, senha):
+                    print(f"Hash da senha de {usuario['email']} atualizado para o custo {self.security.custo_bcrypt}")
+            except HashSobrecarregado:
+                # Fica para o próximo login; o acesso já foi validado
+                pass
+
+        return usuario
     
     def atualiza_senha_hash(self, email, senha_antiga, senha_nova):
         """
@@ -0,0 +1,353 @@
+from datetime import date, time
+from src.app.utils.cache_resultados import cache_resultados
+from src.app.utils.versoes import versoes_tabelas
+from src.app.utils.reincidencia import calcula_reincidencia
+
+# Ordem de gravidade dos riscos (a mesma do CHECK ck_vistoria_risco)
+RISCOS = ('baixo', 'medio', 'alto', 'critico')
+STATUS_VISTORIA = ('ok', 'inválida')
+
+SQL_GRAVIDADE = "array_position(ARRAY['baixo', 'medio', 'alto', 'critico'], {coluna})"
+
+# Cada vistoria comparada com a anterior da mesma árvore em uma única passada
+# ordenada (índice idx_vistoria_arvore_id_data), no lugar da subconsulta
+# correlacionada da Consulta 1 de db/scripts/consultas.sql
+SQL_ESCALADA_RISCO = """
+    SELECT
+        t.cod_solicitacao,
+        t.arvore_id,
+        t.latitude::DOUBLE PRECISION AS latitude,
+        t.longitude::DOUBLE PRECISION AS longitude,
+        t.contador,
+        t.data::TEXT AS data_vistoria,
+        t.hora::TEXT AS hora_vistoria,
+        t.risco AS risco_atual,
+        t.risco_previo,
+        t.data_previa::TEXT AS data_previa
+    FROM (
+        SELECT
+            v.cod_solicitacao,
+            v.arvore_id,
+            v.latitude,
+            v.longitude,
+            v.contador,
+            v.data,
+            v.hora,
+            v.risco,
+            LAG(v.risco) OVER historico AS risco_previo,
+            LAG(v.data) OVER historico AS data_previa
+        FROM vistoria_inicial v
+        WINDOW historico AS (PARTITION BY v.arvore_id ORDER BY v.data, v.hora)
+    ) t
+    WHERE t.risco_previo IS NOT NULL
+      AND t.risco IS NOT NULL
+      AND t.risco_previo <> t.risco
+"""
+
+
+def monta_escalada_risco(direcao='piora', risco_minimo=None, desde=None, limite=None):
+    """
+    SQL das mudanças de risco entre vistorias seguidas da mesma árvore
+
+    Args:
+        direcao: 'piora' (risco subiu), 'melhora' (risco desceu) ou 'todas'
+        risco_minimo: Só mudanças cujo risco atual é pelo menos este (baixo -> critico)
+        desde: Só vistorias a partir desta data (a anterior pode ser mais antiga)
+        limite: Quantidade máxima de linhas
+
+    Returns:
+        Tupla (sql, params)
+    """
+    sql = SQL_ESCALADA_RISCO
+    params = []
+
+    atual = SQL_GRAVIDADE.format(coluna='t.risco')
+    previo = SQL_GRAVIDADE.format(coluna='t.risco_previo')
+    if direcao == 'piora':
+        sql += f" AND {atual} > {previo}"
+    elif direcao == 'melhora':
+        sql += f" AND {atual} < {previo}"
+
+    if risco_minimo:
+        sql += f" AND {atual} >= " + SQL_GRAVIDADE.format(coluna='%s')
+        params.append(risco_minimo)
+
+    if desde:
+        sql += " AND t.data >= %s"
+        params.append(desde)
+
+    sql += " ORDER BY t.data DESC, t.hora DESC, t.cod_solicitacao"
+
+    if limite is not None:
+        sql += " LIMIT %s"
+        params.append(limite)
+    return sql, params
+
+
+# Escaladas registradas pelo trigger de db/init/09_risco_atual.sql: leitura por
+# faixa do índice parcial idx_risco_evento_escalada (data, hora) WHERE escalada
+SQL_ESCALADAS = """
+    SELECT
+        e.id,
+        e.arvore_id,
+        a.latitude::DOUBLE PRECISION AS latitude,
+        a.longitude::DOUBLE PRECISION AS longitude,
+        a.contador,
+        a.nome_cientifico,
+        e.cod_solicitacao,
+        e.data::TEXT AS data_vistoria,
+        e.hora::TEXT AS hora_vistoria,
+        e.risco_anterior,
+        e.risco_novo,
+        r.risco AS risco_atual
+    FROM risco_evento e
+    JOIN arvore a ON a.id = e.arvore_id
+    JOIN risco_atual r ON r.arvore_id = e.arvore_id
+    WHERE e.escalada
+"""
+
+
+def monta_escaladas(desde=None, risco_minimo=None, limite=None):
+    """
+    SQL das escaladas de risco registradas em risco_evento
+
+    Returns:
+        Tupla (sql, params)
+    """
+    sql = SQL_ESCALADAS
+    params = []
+    if desde:
+        sql += " AND e.data >= %s"
+        params.append(desde)
+    if risco_minimo:
+        sql += f" AND {SQL_GRAVIDADE.format(coluna='e.risco_novo')} >= " + SQL_GRAVIDADE.format(coluna='%s')
+        params.append(risco_minimo)
+    sql += " ORDER BY e.data DESC, e.hora DESC, e.id DESC"
+    if limite is not None:
+        sql += " LIMIT %s"
+        params.append(limite)
+    return sql, params
+
+
+# Vistorias em ordem de árvore e data (índice idx_vistoria_arvore_id_data), cada uma
+# com as empresas das manutenções que originou: entrada da varredura de
+# calcula_reincidencia, no lugar do auto-join da Consulta 5
+SQL_VISTORIAS_COM_MANUTENCAO = """
+    SELECT
+        v.arvore_id,
+        v.data,
+        v.risco,
+        m.empresas
+    FROM vistoria_inicial v
+    LEFT JOIN (
+        SELECT cod_solicitacao, array_agg(cnpj) AS empresas
+        FROM manutencao
+        WHERE cnpj IS NOT NULL
+        GROUP BY cod_solicitacao
+    ) m ON m.cod_solicitacao = v.cod_solicitacao
+    WHERE v.data IS NOT NULL
+    ORDER BY v.arvore_id, v.data
+"""
+
+
+class Vistorias_dao:
+    def __init__(self, db_pool, db_pool_leitura=None):
+        self._db_pool = db_pool
+        # Relatórios só leem: podem usar uma réplica
+        self._db_pool_leitura = db_pool_leitura or db_pool
+
+    def inclui_vistoria(self, dados):
+        """
+        Registra a vistoria inicial de uma solicitação
+
+        O trigger tg_vistoria_risco_atual (db/init/09_risco_atual.sql) atualiza,
+        na mesma transação, o risco atual da árvore, o evento de mudança de
+        risco (se houver) e arvore.ultima_vistoria.
+
+        Args:
+            dados: cod_solicitacao, arvore_id, data (AAAA-MM-DD), hora (HH:MM, opcional),
+                   risco e status ('ok' ou 'inválida', padrão 'ok')
+
+        Returns:
+            Tupla (erro, vistoria), com o risco anterior e se o risco piorou em vistoria
+        """
+        try:
+            cod_solicitacao = int(dados.get("cod_solicitacao"))
+        except (TypeError, ValueError):
+            return "Por favor, informe o código da solicitação (número inteiro).", None
+        try:
+            arvore_id = int(dados.get("arvore_id"))
+        except (TypeError, ValueError):
+            return "Por favor, informe o id da árvore vistoriada (número inteiro).", None
+        try:
+            data_vistoria = date.fromisoformat(str(dados.get("data") or ""))
+        except ValueError:
+            return "Por favor, informe a data da vistoria no formato AAAA-MM-DD.", None
+        hora_vistoria = dados.get("hora") or None
+        if hora_vistoria is not None:
+            try:
+                hora_vistoria = time.fromisoformat(str(hora_vistoria))
+            except ValueError:
+                return "A hora da vistoria deve estar no formato HH:MM.", None
+        risco = dados.get("risco")
+        if risco not in RISCOS:
+            return f"Por favor, informe o risco da vistoria: {', '.join(RISCOS)}.", None
+        status = dados.get("status") or 'ok'
+        if status not in STATUS_VISTORIA:
+            return f"O status da vistoria deve ser {' ou '.join(STATUS_VISTORIA)}.", None
+
+        conn = None
+        try:
+            conn = self._db_pool.getconn()
+            cursor = conn.cursor()
+
+            # A árvore é identificada pelo id; a chave composta vem da própria tabela
+            cursor.execute(
+                """
+                INSERT INTO vistoria_inicial
+                    (data, hora, risco, status, cod_solicitacao, latitude, longitude, contador)
+                SELECT %s, %s, %s, %s, %s, a.latitude, a.longitude, a.contador
+                FROM arvore a
+                WHERE a.id = %s
+                """,
+                (data_vistoria, hora_vistoria, risco, status, cod_solicitacao, arvore_id),
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return f"Árvore {arvore_id} não encontrada.", None
+
+            cursor.execute(
+                "SELECT risco_anterior, escalada FROM risco_evento WHERE cod_solicitacao = %s",
+                (cod_solicitacao,),
+            )
+            evento = cursor.fetchone()
+            conn.commit()
+            cursor.close()
+
+            # A listagem de árvores mostra ultima_vistoria: se o trigger a
+            # alterou, o aviso de arvore chega pelo LISTEN; até lá, sem cache
+            versoes_tabelas.marca_alteracao("arvore")
+            cache_resultados.invalida("arvore")
+            return None, {
+                'cod_solicitacao': cod_solicitacao,
+                'arvore_id': arvore_id,
+                'risco': risco,
+                'risco_anterior': evento[0] if evento else None,
+                'escalada': bool(evento and evento[1]),
+            }
+        except Exception as erro:
+            if conn:
+                conn.rollback()
+            print(f"Erro ao inserir vistoria: {erro}")
+            erro_str = str(erro).lower()
+            if "vistoria_inicial_pkey" in erro_str:
+                return f"A solicitação {cod_solicitacao} já possui vistoria inicial.", None
+            if "vistoria_inicial_cod_solicitacao_fkey" in erro_str:
+                return f"Solicitação {cod_solicitacao} não encontrada.", None
+            return "Não foi possível registrar a vistoria. Por favor, tente novamente mais tarde.", None
+        finally:
+            if conn:
+                self._db_pool.putconn(conn)
+
+    # ESCALADA DE RISCO (mudanças de risco entre vistorias da mesma árvore)
+    def select_escalada_risco(self, direcao='piora', risco_minimo=None, desde=None, limite=500):
+        sql, params = monta_escalada_risco(direcao, risco_minimo, desde, limite)
+
+        print("SELECT ESCALADA DE RISCO =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            mudancas = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, mudancas
+        except Exception as erro:
+            print(f"Erro no select_escalada_risco: {erro}")
+            return "Não foi possível gerar o relatório de escalada de risco. Por favor, tente novamente mais tarde.", []
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn)
+
+    # ESCALADAS DESDE UMA DATA (eventos mantidos pelo trigger, sem ler o histórico)
+    def select_escaladas_desde(self, desde=None, risco_minimo=None, limite=500):
+        sql, params = monta_escaladas(desde, risco_minimo, limite)
+
+        print("SELECT ESCALADAS =", sql, params)
+
+        conn = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            resultados = cursor.fetchall()
+
+            colunas = [desc[0] for desc in cursor.description]
+            escaladas = [dict(zip(colunas, row)) for row in resultados]
+
+            cursor.close()
+            return None, escaladas
+        except Exception as erro:
+            print(f"Erro no select_escaladas_desde: {erro}")
+            return "Não foi possível consultar as escaladas de risco. Por favor, tente novamente mais tarde.", []
+        finally:
+            if conn:
+                self._db_pool_leitura.putconn(conn)
+
+    # MANUTENÇÕES INEFICAZES (reincidência de risco por empresa, Consulta 5)
+    def select_reincidencia_empresas(self, janela=60, riscos=('alto', 'medio'), tamanho_lote=5000):
+        """
+        Taxa de reincidência por empresa terceirizada
+
+        As vistorias são lidas em lotes por um cursor no servidor e percorridas
+        uma única vez (calcula_reincidencia), então a memória não cresce com o
+        histórico.
+
+        Returns:
+            Tupla (erro, lista de empresas ordenada pela taxa de reincidência)
+        """
+        print("SELECT REINCIDENCIA =", SQL_VISTORIAS_COM_MANUTENCAO, janela, riscos)
+
+        conn = None
+        cursor = None
+        try:
+            conn = self._db_pool_leitura.getconn()
+            cursor = conn.cursor(name="reincidencia_manutencoes")
+            cursor.itersize = tamanho_lote
+            cursor.execute(SQL_VISTORIAS_COM_MANUTENCAO)
+            totais = calcula_reincidencia(cursor, janela, riscos)
+            cursor.close()
+
+            cursor = conn.cursor()
+            cursor.execute("SELECT cnpj, nome FROM empresa_terceirizada")
+            nomes = dict(cursor.fetchall())
+            cursor.close()
+        except Exception as erro:
+            print(f"Erro no select_reincidencia_empresas: {erro}")
+            return "Não foi possível gerar o relatório de manutenções ineficazes. Por favor, tente novamente mais tarde.", []
+        finally:
+            if cursor is not None and not cursor.closed and not conn.closed:
+                cursor.close()
+            if conn:
+                # putconn encerra a transação do cursor nomeado; conexão caída é descartada
+                self._db_pool_leitura.putconn(conn, close=bool(conn.closed))
+
+        empresas = []
+        for cnpj, total in totais.items():
+            reincidentes = total['reincidentes']
+            empresas.append({
+                'cnpj': cnpj,
+                'nome': nomes.get(cnpj),
+                'manutencoes': total['manutencoes'],
+                'manutencoes_com_reincidencia': reincidentes,
+                'taxa_reincidencia': round(reincidentes / total['manutencoes'], 4),
+                'dias_medios_ate_reincidencia':
+                    round(total['dias_ate_reincidencia'] / reincidentes, 1) if reincidentes else None,
+            })
+        empresas.sort(key=lambda e: (-e['taxa_reincidencia'], -e['manutencoes'], e['cnpj']))
+        return None, empresas
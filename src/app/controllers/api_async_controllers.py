@@ -0,0 +1,195 @@
+import asyncio
+from functools import wraps
+from aiohttp import web
+from src.app.BD.arvores_dao_async import Arvores_dao_async
+from src.config.seguranca import security
+from src.app.controllers.arvores_controllers import (
+    _monta_pagina, _monta_resumo, carrega_indice_especies,
+    LIMITE_PADRAO_ESPECIES, LIMITE_MAXIMO_ESPECIES,
+    LIMITE_PADRAO_AREA, LIMITE_MAXIMO_AREA,
+    RAIO_PADRAO_METROS, RAIO_MAXIMO_METROS,
+)
+from src.app.utils.indice_especies import indice_especies
+from src.app.utils.versoes import versoes_tabelas
+from src.config.app import aplicacao
+from src.config.database_async import async_pool
+
+
+def resposta_json(dados, status=200):
+    # Mesmo conversor do jsonify do Flask: NUMERIC vira texto ("12.50") e
+    # datas viram data HTTP, então as duas APIs devolvem o mesmo JSON
+    return web.json_response(dados, status=status, dumps=aplicacao.json.dumps)
+
+
+def login_required_async(handler):
+    """
+    Versão do login_required para o servidor assíncrono
+
+    Não há sessão do Flask aqui: vale o token do cookie auth_token, o mesmo
+    gerado no login da aplicação. Sem token válido responde 401 em JSON.
+    verify_token só consulta memória (assinatura, cache de tokens e lista de
+    revogados, sincronizada pela thread de inicia_revogacao), então pode
+    rodar direto no event loop.
+    """
+    @wraps(handler)
+    async def wrapper(request):
+        token = request.cookies.get('auth_token')
+        if not token or not security.verify_token(token):
+            return resposta_json({'erro': 'Autenticação necessária.'}, 401)
+        return await handler(request)
+    return wrapper
+
+
+async def inicia_revogacao(_aplicacao=None):
+    """Sobe a thread que busca os tokens revogados pelos outros workers (fora do event loop)"""
+    security.revogacao.inicia()
+
+
+async def inicia_versoes(_aplicacao=None):
+    """
+    Sobe a thread do LISTEN das versões das tabelas
+
+    Ao conectar, ela monta o índice de espécies (e o recarrega a cada
+    alteração de especie), em uma thread, fora do event loop.
+    """
+    versoes_tabelas.inicia()
+
+
+def _inteiro(request, nome, padrao=None):
+    """Lê um inteiro da query string, ignorando valores inválidos (como request.args.get(type=int))"""
+    try:
+        return int(request.query[nome])
+    except (KeyError, ValueError):
+        return padrao
+
+
+def _decimal(request, nome, padrao=None):
+    try:
+        return float(request.query[nome])
+    except (KeyError, ValueError):
+        return padrao
+
+
+def _coordenada(request, nome, minimo, maximo):
+    """Lê uma coordenada obrigatória da query string; levanta ValueError se inválida"""
+    valor = _decimal(request, nome)
+    if valor is None or not (minimo <= valor <= maximo):
+        raise ValueError(f"Informe o parâmetro '{nome}' com um número entre {minimo} e {maximo}.")
+    return valor
+
+
+def _limite(request, padrao, maximo):
+    return max(1, min(_inteiro(request, 'limite', padrao), maximo))
+
+
+class ApiAsyncControllers:
+    """Rotas JSON de leitura atendidas pelo servidor assíncrono (server_async.py)"""
+
+    def __init__(self):
+        self.arvore_dao = Arvores_dao_async(async_pool)
+
+    def busca_especies(self):
+        async def view(request):
+            # Mesmo índice em memória do Flask (busca sem acentos, por prefixo e trecho)
+            if not indice_especies.carregado:
+                # Ainda não montado: consulta síncrona, em uma thread fora do event loop
+                erro = await asyncio.get_running_loop().run_in_executor(None, carrega_indice_especies)
+                if erro:
+                    return resposta_json({'erro': str(erro)}, 500)
+            termo_busca = request.query.get('q', '').strip()
+            limite = _limite(request, LIMITE_PADRAO_ESPECIES, LIMITE_MAXIMO_ESPECIES)
+            return resposta_json(indice_especies.busca(termo_busca, limite))
+        return view
+
+    def lista_arvores(self):
+        async def view(request):
+            status = request.query.get('status', 'todos')
+            apos_id = _inteiro(request, 'apos')
+            antes_id = _inteiro(request, 'antes') if apos_id is None else None
+            limite = _limite(request, aplicacao.config['TAMANHO_PAGINA'], aplicacao.config['TAMANHO_PAGINA_MAXIMO'])
+
+            # Busca uma linha a mais para saber se existe próxima página
+            erro, resultados = await self.arvore_dao.select_arvores_por_status(
+                status, apos_id, antes_id, limite + 1
+            )
+            if erro:
+                return resposta_json({'erro': str(erro)}, 500)
+            arvores, paginacao = _monta_pagina(resultados, apos_id, antes_id, limite)
+            return resposta_json({'arvores': arvores, 'paginacao': paginacao})
+        return view
+
+    def busca_por_area(self):
+        async def view(request):
+            try:
+                min_lat = _coordenada(request, 'min_lat', -90, 90)
+                min_lng = _coordenada(request, 'min_lng', -180, 180)
+                max_lat = _coordenada(request, 'max_lat', -90, 90)
+                max_lng = _coordenada(request, 'max_lng', -180, 180)
+            except ValueError as erro:
+                return resposta_json({'erro': str(erro)}, 400)
+
+            erro, arvores = await self.arvore_dao.select_arvores_por_area(
+                min(min_lat, max_lat), min(min_lng, max_lng),
+                max(min_lat, max_lat), max(min_lng, max_lng),
+                _limite(request, LIMITE_PADRAO_AREA, LIMITE_MAXIMO_AREA)
+            )
+            if erro:
+                return resposta_json({'erro': str(erro)}, 500)
+            return resposta_json(arvores)
+        return view
+
+    def busca_proximas(self):
+        async def view(request):
+            try:
+                lat = _coordenada(request, 'lat', -90, 90)
+                lng = _coordenada(request, 'lng', -180, 180)
+            except ValueError as erro:
+                return resposta_json({'erro': str(erro)}, 400)
+
+            raio = _decimal(request, 'raio', RAIO_PADRAO_METROS)
+            if not (0 < raio <= RAIO_MAXIMO_METROS):
+                return resposta_json({'erro': f"Informe o parâmetro 'raio' em metros, entre 0 e {RAIO_MAXIMO_METROS}."}, 400)
+
+            erro, arvores = await self.arvore_dao.select_arvores_proximas(
+                lat, lng, raio, _limite(request, LIMITE_PADRAO_AREA, LIMITE_MAXIMO_AREA)
+            )
+            if erro:
+                return resposta_json({'erro': str(erro)}, 500)
+            return resposta_json(arvores)
+        return view
+
+    def resumo_arvores(self):
+        async def view(request):
+            erro, linhas = await self.arvore_dao.select_resumo()
+            if erro:
+                return resposta_json({'erro': str(erro)}, 500)
+            return resposta_json(_monta_resumo(linhas))
+        return view
+
+    def vivo(self):
+        async def view(request):
+            return resposta_json({'status': 'vivo'})
+        return view
+
+    def pronto(self):
+        async def view(request):
+            # Pronto = o pool assíncrono consegue falar com o banco agora
+            try:
+                async with async_pool.connection(timeout=1) as conn:
+                    await conn.execute("SELECT 1")
+                conectado, erro = True, None
+            except Exception as e:
+                conectado, erro = False, str(e)
+            estatisticas = async_pool.get_stats()
+            resposta = {
+                'status': 'pronto' if conectado else 'indisponivel',
+                'banco': {
+                    'conectado': conectado,
+                    'erro': erro,
+                    'conexoes': estatisticas.get('pool_size', 0),
+                    'conexoes_ociosas': estatisticas.get('pool_available', 0),
+                    'aguardando': estatisticas.get('requests_waiting', 0),
+                },
+            }
+            return resposta_json(resposta, 200 if conectado else 503)
+        return view
@@ -1,16 +1,196 @@
 # chamando a classe ArvoresDAO
 from src.app.BD.arvores_dao import Arvores_dao
-from src.config.database import connection_pool
-from flask import render_template, redirect, request, flash, jsonify
+from src.config.database import connection_pool, read_pool
+from src.app.controllers.leitura import pool_de_leitura, registra_escrita
+from src.app.utils import tiles
+from src.app.utils.indice_especies import indice_especies
+from src.app.utils.cache_resultados import cache_resultados
+from src.app.utils.versoes import versoes_tabelas
+from flask import render_template, redirect, request, flash, jsonify, current_app, stream_template, Response
+
+
+def _parametros_paginacao():
+    """Lê apos/antes/limite da query string, ignorando valores inválidos"""
+    apos_id = request.args.get('apos', type=int)
+    antes_id = request.args.get('antes', type=int) if apos_id is None else None
+    limite = request.args.get('limite', type=int) or current_app.config['TAMANHO_PAGINA']
+    limite = max(1, min(limite, current_app.config['TAMANHO_PAGINA_MAXIMO']))
+    return apos_id, antes_id, limite
+
+
+def _monta_pagina(resultados, apos_id, antes_id, limite):
+    """
+    Recorta a página a partir de limite + 1 linhas buscadas no banco
+    e calcula os ids usados nos links de próxima/anterior
+    """
+    sobrou = len(resultados) > limite
+    if antes_id is not None:
+        # Navegando para trás: a linha extra fica no início
+        arvores = resultados[-limite:] if sobrou else resultados
+        tem_anterior, tem_proxima = sobrou, True
+    else:
+        arvores = resultados[:limite]
+        tem_anterior, tem_proxima = apos_id is not None, sobrou
+
+    paginacao = {
+        'limite': limite,
+        'anterior': arvores[0]['id'] if tem_anterior and arvores else None,
+        'proxima': arvores[-1]['id'] if tem_proxima and arvores else None,
+    }
+    return arvores, paginacao
+
+
+def _agrupa_em_blocos(partes, tamanho_bloco=16384):
+    """Junta os pedaços gerados pelo Jinja em blocos maiores antes de enviar"""
+    bloco = []
+    tamanho = 0
+    for parte in partes:
+        bloco.append(parte)
+        tamanho += len(parte)
+        if tamanho >= tamanho_bloco:
+            yield "".join(bloco)
+            bloco = []
+            tamanho = 0
+    if bloco:
+        yield "".join(bloco)
+
+
+# Formatos aceitos por /api/arvores/export: (mimetype, extensão do arquivo)
+FORMATOS_EXPORTACAO = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'geojson': ('application/geo+json', 'geojson'),
+}
+
+
+# Quantidade padrão e máxima de espécies devolvidas pelo autocomplete
+LIMITE_PADRAO_ESPECIES = 50
+LIMITE_MAXIMO_ESPECIES = 500
+
+# Limites das buscas espaciais (/api/arvores/bbox e /api/arvores/near)
+LIMITE_PADRAO_AREA = 500
+LIMITE_MAXIMO_AREA = 5000
+RAIO_PADRAO_METROS = 50
+RAIO_MAXIMO_METROS = 5000
+
+
+def _coordenada(nome, minimo, maximo):
+    """Lê uma coordenada obrigatória da query string; levanta ValueError se inválida"""
+    valor = request.args.get(nome, type=float)
+    if valor is None or not (minimo <= valor <= maximo):
+        raise ValueError(f"Informe o parâmetro '{nome}' com um número entre {minimo} e {maximo}.")
+    return valor
+
+
+def _limite(padrao, maximo):
+    return max(1, min(request.args.get('limite', padrao, type=int), maximo))
+
+
+STATUS_ARVORE = ('saudavel', 'doente', 'em risco', 'corte programado', 'cortada')
+TIPOS_ARVORE = ('publico', 'privado')
+
+
+def _monta_resumo(linhas):
+    """Junta as linhas (status, tipo, espécie) do resumo em totais por status, tipo e espécie"""
+    resumo = {
+        'total': 0,
+        'por_status': {status: 0 for status in STATUS_ARVORE},
+        'por_tipo': {tipo: 0 for tipo in TIPOS_ARVORE},
+        'por_status_tipo': {status: {tipo: 0 for tipo in TIPOS_ARVORE} for status in STATUS_ARVORE},
+        'por_especie': [],
+    }
+    especies = {}
+    for linha in linhas:
+        quantidade = linha['quantidade']
+        status = linha['status'] or 'sem status'
+        tipo = linha['tipo'] or 'sem tipo'
+        nome = linha['nome_cientifico']
+        resumo['total'] += quantidade
+        resumo['por_status'][status] = resumo['por_status'].get(status, 0) + quantidade
+        resumo['por_tipo'][tipo] = resumo['por_tipo'].get(tipo, 0) + quantidade
+        por_tipo = resumo['por_status_tipo'].setdefault(status, {})
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + quantidade
+
+        especie = especies.get(nome)
+        if especie is None:
+            especie = especies[nome] = {'nome_cientifico': nome, 'total': 0, 'por_status': {}, 'por_tipo': {}}
+            resumo['por_especie'].append(especie)
+        especie['total'] += quantidade
+        especie['por_status'][status] = especie['por_status'].get(status, 0) + quantidade
+        especie['por_tipo'][tipo] = especie['por_tipo'].get(tipo, 0) + quantidade
+    return resumo
+
+
+def _agrupa_celulas(linhas):
+    """Junta as linhas (célula, status, tipo) do banco em um agrupamento por célula"""
+    celulas = {}
+    for linha in linhas:
+        chave = (linha['celula_x'], linha['celula_y'])
+        celula = celulas.setdefault(chave, {
+            'celula_x': linha['celula_x'],
+            'celula_y': linha['celula_y'],
+            'total': 0,
+            'por_status': {},
+            'por_tipo': {},
+            '_soma_lat': 0.0,
+            '_soma_lng': 0.0,
+        })
+        quantidade = linha['quantidade']
+        celula['total'] += quantidade
+        celula['_soma_lat'] += linha['soma_lat']
+        celula['_soma_lng'] += linha['soma_lng']
+        status = linha['status'] or 'sem status'
+        tipo = linha['tipo'] or 'sem tipo'
+        celula['por_status'][status] = celula['por_status'].get(status, 0) + quantidade
+        celula['por_tipo'][tipo] = celula['por_tipo'].get(tipo, 0) + quantidade
+
+    resultado = []
+    for celula in celulas.values():
+        # Centro do agrupamento = média das posições das árvores da célula
+        celula['latitude'] = celula.pop('_soma_lat') / celula['total']
+        celula['longitude'] = celula.pop('_soma_lng') / celula['total']
+        resultado.append(celula)
+    return resultado
+
+
+def carrega_indice_especies():
+    """Monta o índice de espécies do autocomplete a partir do banco"""
+    # Versão lida antes da consulta: uma alteração no meio gera outra recarga
+    estado = versoes_tabelas.le('especie')
+    # Do primário: logo depois do aviso, uma réplica pode ainda não ter a alteração
+    arvore_dao = Arvores_dao(connection_pool)
+    erro, especies = arvore_dao.select_especies()
+    if not erro:
+        indice_especies.carrega(especies, versao=estado['especie'][0] if estado else None)
+    return erro
+
+
+# Alterações de especie feitas por qualquer processo recarregam o índice deste
+indice_especies.acompanha(versoes_tabelas, carrega_indice_especies)
+
 
 class ArvoresControllers:
     def lista_arvore(self):
         def view():
-            arvore_dao = Arvores_dao(connection_pool)
-            erro, resultados = arvore_dao.select_na_tabela_clientes()
+            arvore_dao = Arvores_dao(connection_pool, db_pool_leitura=pool_de_leitura())
+            apos_id, antes_id, limite = _parametros_paginacao()
+            # Busca uma linha a mais para saber se existe próxima página
+            erro, resultados = arvore_dao.select_na_tabela_clientes(apos_id, antes_id, limite + 1)
             if erro:
                 flash(str(erro), 'danger')
-            return render_template('listagemArvores.html', arvores=resultados if not erro else [])
+                resultados = []
+            arvores, paginacao = _monta_pagina(resultados, apos_id, antes_id, limite)
+            return render_template('listagemArvores.html', arvores=arvores, paginacao=paginacao)
+        return view
+
+    def lista_arvore_completa(self):
+        def view():
+            # Lista completa (para impressão/busca no navegador) enviada em streaming:
+            # as linhas saem do cursor do servidor direto para o template
+            arvore_dao = Arvores_dao(connection_pool)
+            arvores = arvore_dao.itera_arvores()
+            partes = stream_template('listagemArvores.html', arvores=arvores, paginacao=None)
+            return Response(_agrupa_em_blocos(partes), mimetype='text/html')
         return view
 
     def exibe_form_inclusao_arvore(self):
@@ -21,7 +201,9 @@ class ArvoresControllers:
     def insere_nova_arvore(self):
         def view():
             arvore_dao = Arvores_dao(connection_pool)
-            erro = arvore_dao.inclui_clientes(request.form)
+            erro, arvore = arvore_dao.inclui_clientes(request.form)
+            if not erro:
+                registra_escrita()
             if erro:
                 # Exibe mensagem de erro amigável sem redirecionar
                 flash(erro, 'danger')
@@ -39,18 +221,21 @@ class ArvoresControllers:
                 }
                 return render_template('inclusaoArvores.html', dados_form=dados_form)
             # Sucesso: redireciona para listagem com mensagem de sucesso
-            flash('Árvore cadastrada com sucesso!', 'success')
+            flash(f"Árvore cadastrada com sucesso! (ID {arvore['id']}, contador {arvore['contador']})", 'success')
             return redirect('/arvores')
         return view
 
     def select_arvores_por_status(self):
         def view():
-            arvore_dao = Arvores_dao(connection_pool)
+            arvore_dao = Arvores_dao(connection_pool, db_pool_leitura=pool_de_leitura())
             status = request.args.get('status', 'todos')
-            erro, resultados = arvore_dao.select_arvores_por_status(status)
+            apos_id, antes_id, limite = _parametros_paginacao()
+            erro, resultados = arvore_dao.select_arvores_por_status(status, apos_id, antes_id, limite + 1)
             if erro:
                 flash(str(erro), 'danger')
-            return render_template('consulta.html', arvores=resultados if not erro else [], status_selecionado=status)
+                resultados = []
+            arvores, paginacao = _monta_pagina(resultados, apos_id, antes_id, limite)
+            return render_template('consulta.html', arvores=arvores, status_selecionado=status, paginacao=paginacao)
         return view
 
     def exibe_form_inclusao_especie(self):
@@ -62,6 +247,8 @@ class ArvoresControllers:
         def view():
             arvore_dao = Arvores_dao(connection_pool)
             erro = arvore_dao.inclui_especie(request.form)
+            if not erro:
+                registra_escrita()
             if erro:
                 # Exibe mensagem de erro amigável sem redirecionar
                 flash(erro, 'danger')
@@ -77,13 +264,133 @@ class ArvoresControllers:
             return redirect('/inclusaoEspecies')
         return view
 
+    def carrega_indice_especies(self):
+        """Monta o índice de espécies do autocomplete a partir do banco"""
+        return carrega_indice_especies()
+
     def busca_especies(self):
         def view():
-            arvore_dao = Arvores_dao(connection_pool)
+            # O índice é montado na inicialização; se falhou, tenta de novo aqui
+            if not indice_especies.carregado:
+                erro = self.carrega_indice_especies()
+                if erro:
+                    # Retornar erro amigável em JSON
+                    return jsonify({'erro': str(erro)}), 500
             termo_busca = request.args.get('q', '').strip()
-            erro, especies = arvore_dao.select_especies(termo_busca if termo_busca else None)
+            limite = max(1, min(request.args.get('limite', LIMITE_PADRAO_ESPECIES, type=int), LIMITE_MAXIMO_ESPECIES))
+            return jsonify(indice_especies.busca(termo_busca, limite))
+        return view
+
+    def exporta_arvores(self):
+        def view():
+            formato = request.args.get('formato', 'csv').lower()
+            if formato not in FORMATOS_EXPORTACAO:
+                return jsonify({'erro': f"Formato '{formato}' não suportado. Use csv, ndjson ou geojson."}), 400
+
+            status = request.args.get('status', 'todos')
+            com_especie = request.args.get('especie', '').lower() in ('1', 'true', 'sim')
+
+            arvore_dao = Arvores_dao(connection_pool)
+            if formato == 'csv':
+                # O COPY entrega praticamente uma linha por escrita, então agrupa antes de enviar
+                blocos = _agrupa_em_blocos(arvore_dao.exporta_csv(status, com_especie), 65536)
+            else:
+                blocos = arvore_dao.exporta_json(status, com_especie, geojson=(formato == 'geojson'))
+
+            mimetype, extensao = FORMATOS_EXPORTACAO[formato]
+            response = Response(blocos, mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename=arvores.{extensao}'
+            return response
+        return view
+
+    def busca_por_area(self):
+        def view():
+            try:
+                min_lat = _coordenada('min_lat', -90, 90)
+                min_lng = _coordenada('min_lng', -180, 180)
+                max_lat = _coordenada('max_lat', -90, 90)
+                max_lng = _coordenada('max_lng', -180, 180)
+            except ValueError as erro:
+                return jsonify({'erro': str(erro)}), 400
+
+            arvore_dao = Arvores_dao(connection_pool)
+            erro, arvores = arvore_dao.select_arvores_por_area(
+                min(min_lat, max_lat), min(min_lng, max_lng),
+                max(min_lat, max_lat), max(min_lng, max_lng),
+                _limite(LIMITE_PADRAO_AREA, LIMITE_MAXIMO_AREA)
+            )
             if erro:
-                # Retornar erro amigável em JSON
                 return jsonify({'erro': str(erro)}), 500
-            return jsonify(especies)
-        return view
\ No newline at end of file
+            return jsonify(arvores)
+        return view
+
+    def busca_proximas(self):
+        def view():
+            try:
+                lat = _coordenada('lat', -90, 90)
+                lng = _coordenada('lng', -180, 180)
+            except ValueError as erro:
+                return jsonify({'erro': str(erro)}), 400
+
+            raio = request.args.get('raio', RAIO_PADRAO_METROS, type=float)
+            if raio is None or not (0 < raio <= RAIO_MAXIMO_METROS):
+                return jsonify({'erro': f"Informe o parâmetro 'raio' em metros, entre 0 e {RAIO_MAXIMO_METROS}."}), 400
+
+            arvore_dao = Arvores_dao(connection_pool)
+            erro, arvores = arvore_dao.select_arvores_proximas(
+                lat, lng, raio, _limite(LIMITE_PADRAO_AREA, LIMITE_MAXIMO_AREA)
+            )
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify(arvores)
+        return view
+
+    def tile_arvores(self):
+        def view(z, x, y):
+            if not tiles.tile_valido(z, x, y):
+                return jsonify({'erro': f'Tile {z}/{x}/{y} inexistente.'}), 404
+
+            dados = tiles.cache_tiles.obtem(z, x, y)
+            if dados is None:
+                geracao = tiles.cache_tiles.geracao
+                arvore_dao = Arvores_dao(connection_pool)
+                min_lat, min_lng, max_lat, max_lng = tiles.limites_tile(z, x, y)
+                if z >= tiles.ZOOM_ARVORES_INDIVIDUAIS:
+                    erro, arvores = arvore_dao.select_arvores_por_area(
+                        min_lat, min_lng, max_lat, max_lng, LIMITE_MAXIMO_AREA
+                    )
+                    dados = {'z': z, 'x': x, 'y': y, 'tipo': 'arvores', 'arvores': arvores}
+                else:
+                    erro, linhas = arvore_dao.select_agregado_tile(
+                        min_lat, min_lng, max_lat, max_lng, tiles.DIVISOES
+                    )
+                    dados = {'z': z, 'x': x, 'y': y, 'tipo': 'agrupamentos', 'divisoes': tiles.DIVISOES,
+                             'agrupamentos': _agrupa_celulas(linhas)}
+                if erro:
+                    return jsonify({'erro': str(erro)}), 500
+                tiles.cache_tiles.guarda(z, x, y, dados, geracao)
+
+            return jsonify(dados)
+        return view
+
+    def estatisticas_cache(self):
+        def view():
+            return jsonify(cache_resultados.estatisticas())
+        return view
+
+    def estatisticas_pool(self):
+        def view():
+            estatisticas = connection_pool.estatisticas()
+            if read_pool is not connection_pool:
+                estatisticas['leitura'] = read_pool.estatisticas()
+            return jsonify(estatisticas)
+        return view
+
+    def resumo_arvores(self):
+        def view():
+            arvore_dao = Arvores_dao(connection_pool)
+            erro, linhas = arvore_dao.select_resumo()
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify(_monta_resumo(linhas))
+        return view
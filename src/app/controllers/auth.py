@@ -1,10 +1,6 @@
 from functools import wraps
 from flask import session, redirect, request
-from src.app.utils.security import SecurityManager
-from src.config.app import aplicacao
-
-# Instância global do gerenciador de segurança
-security = SecurityManager(aplicacao.config['SECRET_KEY'])
+from src.config.seguranca import security
 
 def login_required(func):
     """
@@ -0,0 +1,57 @@
+from functools import wraps
+from flask import request, session, make_response
+from src.app.utils.versoes import versoes_tabelas
+
+
+def _aplica_validadores(response, etag, estado):
+    response.set_etag(etag)
+    modificado_em = versoes_tabelas.modificado_em(estado)
+    if modificado_em is not None:
+        response.last_modified = modificado_em
+    # O navegador guarda a página, mas sempre confirma com o servidor antes de usar
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def condicional(*tabelas, versao_extra=None):
+    """
+    Decorator de GET condicional (ETag / If-None-Match) para rotas de leitura
+
+    A ETag é calculada só com as versões das tabelas informadas (mantidas
+    em memória pelo LISTEN de versoes.py, iguais em todos os workers) e a
+    URL (filtros e página), então uma requisição com If-None-Match igual
+    recebe 304 sem ir ao banco nem renderizar o template.
+    versao_extra: função que retorna a versão de um conteúdo montado em
+    memória a partir das tabelas (ex.: índice de espécies), que também entra
+    na ETag: enquanto ele não é recarregado, a ETag não fica igual à de depois.
+    Deve ficar depois do login_required.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Mensagens flash pendentes mudam a página: nesse caso não há cache
+            if session.get('_flashes'):
+                return func(*args, **kwargs)
+
+            # Versão lida ANTES do conteúdo: uma escrita no meio só faz a
+            # próxima requisição receber a página de novo, nunca um 304 velho
+            estado = versoes_tabelas.le(*tabelas)
+            if estado is None:
+                # Sem a versão não há como validar: responde sem ETag
+                return func(*args, **kwargs)
+
+            extra = request.full_path
+            if versao_extra is not None:
+                extra += f"|{versao_extra()}"
+            etag = versoes_tabelas.etag(estado, extra=extra)
+            if request.if_none_match.contains(etag):
+                return _aplica_validadores(make_response('', 304), etag, estado)
+
+            response = make_response(func(*args, **kwargs))
+            # Respostas de erro (ou que geraram flash) não podem ser reaproveitadas
+            if response.status_code == 200 and not session.get('_flashes'):
+                _aplica_validadores(response, etag, estado)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,22 @@
+import time
+from flask import session
+from src.config.database import connection_pool, read_pool, DB_LEITURA_CONFIG
+
+
+def registra_escrita():
+    """Marca na sessão que o usuário acabou de gravar algo no primário"""
+    if DB_LEITURA_CONFIG['leitura_apos_escrita'] > 0 and read_pool is not connection_pool:
+        session['ultima_escrita'] = time.time()
+
+
+def pool_de_leitura():
+    """
+    Pool para as leituras da requisição atual
+
+    Logo depois de uma escrita, a mesma sessão lê do primário (as réplicas
+    podem ainda não ter recebido a alteração); fora disso, das réplicas.
+    """
+    ultima_escrita = session.get('ultima_escrita')
+    if ultima_escrita and time.time() - ultima_escrita < DB_LEITURA_CONFIG['leitura_apos_escrita']:
+        return connection_pool
+    return read_pool
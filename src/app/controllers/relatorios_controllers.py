@@ -0,0 +1,125 @@
+# chamando a classe VistoriasDAO
+from datetime import date
+from src.app.BD.vistorias_dao import Vistorias_dao, RISCOS
+from src.app.utils.agendador_relatorios import agendador_relatorios
+from src.config.database import connection_pool
+from src.app.controllers.leitura import pool_de_leitura
+from flask import request, jsonify
+
+# Limites dos relatórios (quantidade de linhas devolvidas)
+LIMITE_PADRAO_RELATORIO = 500
+LIMITE_MAXIMO_RELATORIO = 5000
+DIRECOES_RISCO = ('piora', 'melhora', 'todas')
+JANELA_PADRAO_DIAS = 60
+JANELA_MAXIMA_DIAS = 3650
+RISCOS_REINCIDENCIA_PADRAO = ('alto', 'medio')
+
+
+def _limite_relatorio():
+    return max(1, min(request.args.get('limite', LIMITE_PADRAO_RELATORIO, type=int), LIMITE_MAXIMO_RELATORIO))
+
+
+def _data(nome):
+    """Lê uma data opcional (AAAA-MM-DD) da query string; levanta ValueError se inválida"""
+    valor = request.args.get(nome, '').strip()
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"Informe o parâmetro '{nome}' no formato AAAA-MM-DD.")
+
+
+class RelatoriosControllers:
+    """Relatórios analíticos em JSON (db/scripts/consultas.sql)"""
+
+    def escalada_risco(self):
+        def view():
+            direcao = request.args.get('direcao', 'piora')
+            if direcao not in DIRECOES_RISCO:
+                return jsonify({'erro': f"Informe 'direcao' como {', '.join(DIRECOES_RISCO)}."}), 400
+            risco_minimo = request.args.get('risco_minimo') or None
+            if risco_minimo and risco_minimo not in RISCOS:
+                return jsonify({'erro': f"Informe 'risco_minimo' como {', '.join(RISCOS)}."}), 400
+            try:
+                desde = _data('desde')
+            except ValueError as erro:
+                return jsonify({'erro': str(erro)}), 400
+
+            vistoria_dao = Vistorias_dao(connection_pool, db_pool_leitura=pool_de_leitura())
+            erro, mudancas = vistoria_dao.select_escalada_risco(direcao, risco_minimo, desde, _limite_relatorio())
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify(mudancas)
+        return view
+
+    def escaladas(self):
+        def view():
+            risco_minimo = request.args.get('risco_minimo') or None
+            if risco_minimo and risco_minimo not in RISCOS:
+                return jsonify({'erro': f"Informe 'risco_minimo' como {', '.join(RISCOS)}."}), 400
+            try:
+                desde = _data('desde')
+            except ValueError as erro:
+                return jsonify({'erro': str(erro)}), 400
+
+            vistoria_dao = Vistorias_dao(connection_pool, db_pool_leitura=pool_de_leitura())
+            erro, escaladas = vistoria_dao.select_escaladas_desde(desde, risco_minimo, _limite_relatorio())
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify(escaladas)
+        return view
+
+    def manutencoes_ineficazes(self):
+        def view():
+            janela = request.args.get('janela', JANELA_PADRAO_DIAS, type=int)
+            if not (1 <= janela <= JANELA_MAXIMA_DIAS):
+                return jsonify({'erro': f"Informe 'janela' em dias, entre 1 e {JANELA_MAXIMA_DIAS}."}), 400
+            riscos = request.args.get('riscos')
+            riscos = tuple(r.strip() for r in riscos.split(',') if r.strip()) if riscos else RISCOS_REINCIDENCIA_PADRAO
+            if not riscos or any(risco not in RISCOS for risco in riscos):
+                return jsonify({'erro': f"Informe 'riscos' separados por vírgula, entre {', '.join(RISCOS)}."}), 400
+
+            # Com os parâmetros padrão, o resultado pré-calculado (reincidencia-empresas) serve
+            if janela == JANELA_PADRAO_DIAS and set(riscos) == set(RISCOS_REINCIDENCIA_PADRAO):
+                erro, snapshot = agendador_relatorios.dao_leitura.select_snapshot('reincidencia-empresas')
+                if not erro and snapshot is not None:
+                    return jsonify({**snapshot['dados'], 'atualizado_em': snapshot['atualizado_em']})
+
+            vistoria_dao = Vistorias_dao(connection_pool, db_pool_leitura=pool_de_leitura())
+            erro, empresas = vistoria_dao.select_reincidencia_empresas(janela, riscos)
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify({'janela': janela, 'riscos': list(riscos), 'empresas': empresas, 'atualizado_em': None})
+        return view
+
+    def lista_relatorios(self):
+        def view():
+            erro, relatorios = agendador_relatorios.lista()
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            return jsonify(relatorios)
+        return view
+
+    def snapshot(self, nome):
+        def view():
+            relatorio = agendador_relatorios.relatorios.get(nome)
+            if relatorio is None:
+                return jsonify({'erro': f"Relatório '{nome}' não encontrado."}), 404
+            erro, snapshot = agendador_relatorios.dao_leitura.select_snapshot(nome)
+            if erro:
+                return jsonify({'erro': str(erro)}), 500
+            if snapshot is None:
+                resposta = jsonify({'erro': 'O relatório ainda não foi calculado. Tente novamente em alguns minutos.'})
+                resposta.headers['Retry-After'] = '60'
+                return resposta, 503
+            return jsonify({
+                'nome': nome,
+                'titulo': relatorio['titulo'],
+                'consulta': relatorio['consulta'],
+                'atualizado_em': snapshot['atualizado_em'],
+                'duracao_ms': snapshot['duracao_ms'],
+                'linhas': snapshot['linhas'],
+                'dados': snapshot['dados'],
+            })
+        return view
@@ -0,0 +1,31 @@
+from src.config.database import connection_pool, situacao_aquecimento
+from flask import jsonify
+
+
+class SaudeControllers:
+    """Rotas de saúde para o orquestrador (docker, balanceador de carga)"""
+
+    def vivo(self):
+        def view():
+            # O processo responde: não depende do banco
+            return jsonify({'status': 'vivo'})
+        return view
+
+    def pronto(self):
+        def view():
+            # Pronto = consegue falar com o banco agora
+            conectado, erro = connection_pool.verifica(timeout=1)
+            estatisticas = connection_pool.estatisticas()
+            resposta = {
+                'status': 'pronto' if conectado else 'indisponivel',
+                'banco': {
+                    'conectado': conectado,
+                    'erro': erro,
+                    'aquecimento': dict(situacao_aquecimento),
+                    'conexoes_em_uso': estatisticas['em_uso'],
+                    'conexoes_ociosas': estatisticas['ociosas'],
+                    'aguardando': estatisticas['aguardando'],
+                },
+            }
+            return jsonify(resposta), 200 if conectado else 503
+        return view
@@ -1,21 +1,33 @@
 # chamando a classe UsuariosDAO
 from src.app.BD.usuarios_dao import Usuarios_dao
-from src.app.utils.security import SecurityManager
+from src.app.utils.security import HashSobrecarregado
+from src.config.seguranca import security
 from src.config.database import connection_pool
-from src.config.app import aplicacao
-from flask import redirect, request, session, make_response
+from src.app.controllers.leitura import pool_de_leitura
+from src.app.utils.limite_login import limitador_login
+from flask import redirect, request, session, make_response, jsonify
 
 
 class UsuariosControllers:
     def __init__(self):
         """Inicializa o controller com gerenciador de segurança"""
-        self.security = SecurityManager(aplicacao.config['SECRET_KEY'])
+        self.security = security
     
     def valida_acesso_usuario(self):
         def view():
-            usuario_dao = Usuarios_dao(connection_pool)
+            login = request.form.get("login")
+
+            # Tentativas demais do mesmo IP ou para o mesmo email: recusa antes
+            # de consultar o banco e de calcular o bcrypt
+            espera = limitador_login.verifica(request.remote_addr, login)
+            if espera:
+                print(f"LOGIN RECUSADO: limite de tentativas ({request.remote_addr})")
+                response = make_response("Muitas tentativas de acesso. Tente novamente em alguns instantes.", 429)
+                response.headers['Retry-After'] = str(int(espera) + 1)
+                return response
+
+            usuario_dao = Usuarios_dao(connection_pool, db_pool_leitura=pool_de_leitura())
             try:
-                login = request.form.get("login")
                 senha = request.form.get("senha")
                 
                 # Valida credenciais (agora com hash)
@@ -46,8 +58,19 @@ class UsuariosControllers:
                     
                     return response
 
+            except HashSobrecarregado:
+                # Muitos logins ao mesmo tempo: recusa logo em vez de prender a thread na fila
+                print("LOGIN RECUSADO: fila de verificação de senha cheia")
+                response = make_response("Muitos acessos ao mesmo tempo. Tente novamente em alguns segundos.", 503)
+                response.headers['Retry-After'] = '2'
+                return response
             except Exception as erro:
                 print(f"ERRO NA AUTENTICAÇÃO: {erro}")
                 return redirect("/")
 
         return view
+
+    def estatisticas_login(self):
+        def view():
+            return jsonify(limitador_login.estatisticas())
+        return view
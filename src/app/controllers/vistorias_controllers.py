@@ -0,0 +1,20 @@
+# chamando a classe VistoriasDAO
+from src.app.BD.vistorias_dao import Vistorias_dao
+from src.config.database import connection_pool
+from src.app.controllers.leitura import registra_escrita
+from flask import request, jsonify
+
+
+class VistoriasControllers:
+
+    def insere_vistoria(self):
+        def view():
+            # Aceita JSON ou formulário
+            dados = request.get_json(silent=True) or request.form
+            vistoria_dao = Vistorias_dao(connection_pool)
+            erro, vistoria = vistoria_dao.inclui_vistoria(dados)
+            if erro:
+                return jsonify({'erro': str(erro)}), 400
+            registra_escrita()
+            return jsonify(vistoria), 201
+        return view
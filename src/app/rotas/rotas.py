@@ -1,12 +1,21 @@
 # chamando a classe usuarios_controller
 from src.app.controllers.usuarios_controllers import UsuariosControllers
 from src.app.controllers.arvores_controllers import ArvoresControllers
+from src.app.controllers.saude_controllers import SaudeControllers
+from src.app.controllers.relatorios_controllers import RelatoriosControllers
+from src.app.controllers.vistorias_controllers import VistoriasControllers
 from src.app.controllers.auth import login_required
+from src.config.seguranca import security
+from src.app.controllers.cache_http import condicional
+from src.app.utils.indice_especies import indice_especies
 from flask import render_template, session, redirect, request
 
 
 usuario_cont = UsuariosControllers()
 arvore_cont = ArvoresControllers()
+saude_cont = SaudeControllers()
+relatorio_cont = RelatoriosControllers()
+vistoria_cont = VistoriasControllers()
 
 def rotas(aplicacao):
     # Evitar problema com o CORS
@@ -23,11 +32,27 @@ def rotas(aplicacao):
         print('Acessou a pagina de ACESSO a aplicacao...')
         return render_template('login.html')
 
+    # Saúde do processo (sem login): vivo = processo no ar, pronto = banco acessível
+    @aplicacao.route('/saude/vivo', methods=['GET'])
+    def saude_vivo():
+        return saude_cont.vivo()()
+
+    @aplicacao.route('/saude/pronto', methods=['GET'])
+    def saude_pronto():
+        return saude_cont.pronto()()
+
     @aplicacao.route('/arvores')
     @login_required
+    @condicional('arvore')
     def arvores():
         return arvore_cont.lista_arvore()()
 
+    @aplicacao.route('/arvores/completa')
+    @login_required
+    @condicional('arvore')
+    def arvores_completa():
+        return arvore_cont.lista_arvore_completa()()
+
     @aplicacao.route('/inclusaoArvores')
     @login_required
     def inclusao_arvores():
@@ -35,6 +60,7 @@ def rotas(aplicacao):
     
     @aplicacao.route('/consulta')
     @login_required
+    @condicional('arvore')
     def consulta():
         return arvore_cont.select_arvores_por_status()()
 
@@ -59,12 +85,88 @@ def rotas(aplicacao):
 
     @aplicacao.route('/api/especies', methods=['GET'])
     @login_required
+    @condicional('especie', versao_extra=lambda: f"indice={indice_especies.versao}")
     def busca_especies():
         return arvore_cont.busca_especies()()
 
+    @aplicacao.route('/api/arvores/export', methods=['GET'])
+    @login_required
+    def exporta_arvores():
+        return arvore_cont.exporta_arvores()()
+
+    @aplicacao.route('/api/arvores/bbox', methods=['GET'])
+    @login_required
+    def busca_arvores_area():
+        return arvore_cont.busca_por_area()()
+
+    @aplicacao.route('/api/arvores/near', methods=['GET'])
+    @login_required
+    def busca_arvores_proximas():
+        return arvore_cont.busca_proximas()()
+
+    @aplicacao.route('/api/arvores/resumo', methods=['GET'])
+    @login_required
+    @condicional('arvore')
+    def resumo_arvores():
+        return arvore_cont.resumo_arvores()()
+
+    @aplicacao.route('/api/arvores/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+    @login_required
+    def tile_arvores(z, x, y):
+        return arvore_cont.tile_arvores()(z, x, y)
+
+    @aplicacao.route('/api/relatorios', methods=['GET'])
+    @login_required
+    def lista_relatorios():
+        return relatorio_cont.lista_relatorios()()
+
+    # Resultados pré-calculados (src/app/utils/agendador_relatorios.py); as rotas
+    # fixas abaixo têm precedência sobre <nome>
+    @aplicacao.route('/api/relatorios/<nome>', methods=['GET'])
+    @login_required
+    def relatorio_snapshot(nome):
+        return relatorio_cont.snapshot(nome)()
+
+    @aplicacao.route('/api/relatorios/escalada-risco', methods=['GET'])
+    @login_required
+    def relatorio_escalada_risco():
+        return relatorio_cont.escalada_risco()()
+
+    @aplicacao.route('/api/relatorios/escaladas', methods=['GET'])
+    @login_required
+    def relatorio_escaladas():
+        return relatorio_cont.escaladas()()
+
+    @aplicacao.route('/api/relatorios/manutencoes-ineficazes', methods=['GET'])
+    @login_required
+    def relatorio_manutencoes_ineficazes():
+        return relatorio_cont.manutencoes_ineficazes()()
+
+    @aplicacao.route('/api/vistorias', methods=['POST'])
+    @login_required
+    def insere_vistoria():
+        return vistoria_cont.insere_vistoria()()
+
+    @aplicacao.route('/api/estatisticas/cache', methods=['GET'])
+    @login_required
+    def estatisticas_cache():
+        return arvore_cont.estatisticas_cache()()
+
+    @aplicacao.route('/api/estatisticas/pool', methods=['GET'])
+    @login_required
+    def estatisticas_pool():
+        return arvore_cont.estatisticas_pool()()
+
+    @aplicacao.route('/api/estatisticas/login', methods=['GET'])
+    @login_required
+    def estatisticas_login():
+        return usuario_cont.estatisticas_login()()
+
     @aplicacao.route('/logout')
     def logout():
         """Faz logout do usuário, limpando sessão e cookie"""
+        # Revoga o token: mesmo guardado em outro lugar, deixa de valer
+        security.revoke_token(request.cookies.get('auth_token'))
         session.clear()
         response = redirect("/")
         # Remove o cookie de autenticação
@@ -0,0 +1,19 @@
+# Rotas da API JSON no servidor assíncrono (server_async.py)
+from src.app.controllers.api_async_controllers import ApiAsyncControllers, login_required_async
+
+
+api_cont = ApiAsyncControllers()
+
+def rotas_async(aplicacao_async):
+    rotas = aplicacao_async.router
+
+    # Saúde do processo (sem login): vivo = processo no ar, pronto = banco acessível
+    rotas.add_get('/saude/vivo', api_cont.vivo())
+    rotas.add_get('/saude/pronto', api_cont.pronto())
+
+    # Mesmas URLs e respostas da aplicação Flask, mais a listagem de árvores em JSON
+    rotas.add_get('/api/especies', login_required_async(api_cont.busca_especies()))
+    rotas.add_get('/api/arvores', login_required_async(api_cont.lista_arvores()))
+    rotas.add_get('/api/arvores/bbox', login_required_async(api_cont.busca_por_area()))
+    rotas.add_get('/api/arvores/near', login_required_async(api_cont.busca_proximas()))
+    rotas.add_get('/api/arvores/resumo', login_required_async(api_cont.resumo_arvores()))
@@ -0,0 +1,303 @@
+"""
+Relatórios analíticos pré-calculados (db/scripts/consultas.sql)
+
+As cinco consultas são registradas aqui e recalculadas por uma thread em
+segundo plano a cada RELATORIOS_INTERVALO segundos. O resultado vai para a
+tabela relatorio_snapshot (db/init/10_relatorio_snapshot.sql), de onde as
+rotas /api/relatorios/<nome> leem, com a data do cálculo.
+
+- Os cálculos leem do pool de leitura (réplicas, se houver) e gravam no primário
+- Com vários workers, um advisory lock faz só um deles calcular por vez; os
+  outros veem a data nova na tabela e não repetem o cálculo
+- Relatórios com cálculo incremental (mudancas-risco) leem só o que mudou
+  desde a última marca; o cálculo completo é refeito a cada
+  RELATORIOS_COMPLETO_A_CADA intervalos, ou antes, quando o incremental
+  percebe que os dados abaixo da marca mudaram (recalcula_risco_atual(),
+  transações confirmadas fora da ordem dos ids)
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import psycopg2
+from src.config.database import connection_pool, read_pool
+from src.app.BD.relatorios_dao import Relatorios_dao, carrega_consultas
+from src.app.BD.vistorias_dao import Vistorias_dao
+
+RELATORIOS_CONFIG = {
+    # Segundos entre os cálculos de cada relatório (0 = não calcula em segundo plano)
+    'intervalo': float(os.getenv('RELATORIOS_INTERVALO', '900')),
+    # A cada quantos intervalos o cálculo incremental é refeito por completo
+    'completo_a_cada': int(os.getenv('RELATORIOS_COMPLETO_A_CADA', '24')),
+    # Segundos até desistir de uma consulta (statement_timeout)
+    'tempo_maximo': float(os.getenv('RELATORIOS_TEMPO_MAXIMO', '300')),
+    # Mudanças de risco mais recentes guardadas em mudancas-risco
+    'recentes': int(os.getenv('RELATORIOS_RECENTES', '500')),
+}
+
+# Chave do advisory lock que escolhe o worker que calcula
+CHAVE_TRAVA = 'relatorio_snapshot'
+
+
+class AgendadorRelatorios:
+    """
+    Registro dos relatórios e thread que mantém os resultados atualizados
+
+    Cada relatório tem uma função de cálculo completo, calcula() -> (dados,
+    linhas, marca), e opcionalmente uma incremental, incremental(anterior) ->
+    (dados, linhas, marca), que recebe o resultado guardado (com 'dados' e 'marca')
+    e retorna None quando o resultado guardado não serve de base (refaz completo).
+    """
+
+    def __init__(self, db_pool, db_pool_leitura=None, intervalo=900, completo_a_cada=24):
+        # Resultado guardado lido sempre do primário: o incremental parte dele
+        self.dao = Relatorios_dao(db_pool)
+        self.dao_leitura = Relatorios_dao(db_pool, db_pool_leitura=db_pool_leitura)
+        self._db_pool = db_pool
+        self.intervalo = intervalo
+        self.completo_a_cada = completo_a_cada
+        self.relatorios = {}
+        self._erros = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def registra(self, nome, titulo, calcula, incremental=None, consulta=None):
+        self.relatorios[nome] = {
+            'titulo': titulo,
+            'consulta': consulta,
+            'calcula': calcula,
+            'incremental': incremental,
+        }
+
+    def atualiza(self, nome, anterior=None, completo=True):
+        """
+        Calcula um relatório e grava o resultado
+
+        Returns:
+            Mensagem de erro, ou None se deu certo
+        """
+        relatorio = self.relatorios[nome]
+        inicio = time.perf_counter()
+        try:
+            resultado = None
+            if not completo and relatorio['incremental'] and anterior is not None:
+                resultado = relatorio['incremental'](anterior)
+                completo = resultado is None
+            if resultado is not None:
+                dados, linhas, marca = resultado
+            else:
+                dados, linhas, marca = relatorio['calcula']()
+                if relatorio['incremental']:
+                    dados['completo_em'] = datetime.now(timezone.utc).isoformat()
+        except Exception as erro:
+            print(f"Erro ao calcular o relatório {nome}: {erro}")
+            self._erros[nome] = str(erro)
+            return str(erro)
+
+        duracao_ms = int((time.perf_counter() - inicio) * 1000)
+        erro = self.dao.grava_snapshot(nome, dados, duracao_ms, linhas, marca)
+        self._erros[nome] = erro
+        if not erro:
+            print(f"Relatório {nome} atualizado ({linhas} linhas, {duracao_ms} ms, "
+                  f"{'completo' if completo or anterior is None else 'incremental'})")
+        return erro
+
+    def _vencidos(self):
+        """Relatórios cujo resultado é mais velho que o intervalo (ou ainda não existe)"""
+        erro, snapshots = self.dao.select_snapshots()
+        if erro:
+            raise RuntimeError(erro)
+        agora = datetime.now(timezone.utc)
+        vencidos = []
+        for nome in self.relatorios:
+            snapshot = snapshots.get(nome)
+            if snapshot is None or agora - datetime.fromisoformat(snapshot['atualizado_em']) >= timedelta(seconds=self.intervalo):
+                vencidos.append(nome)
+        return vencidos
+
+    def executa_ciclo(self):
+        """Atualiza os relatórios vencidos, se nenhum outro worker estiver calculando"""
+        conn = None
+        travado = False
+        try:
+            conn = self._db_pool.getconn()
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(hashtextextended(%s, 0))", (CHAVE_TRAVA,))
+            travado = cursor.fetchone()[0]
+            if not travado:
+                return
+
+            for nome in self._vencidos():
+                relatorio = self.relatorios[nome]
+                anterior, completo = None, True
+                if relatorio['incremental']:
+                    erro, anterior = self.dao.select_snapshot(nome)
+                    if anterior is not None:
+                        completo_em = anterior['dados'].get('completo_em')
+                        limite = timedelta(seconds=self.intervalo * self.completo_a_cada)
+                        completo = (completo_em is None
+                                    or datetime.now(timezone.utc) - datetime.fromisoformat(completo_em) >= limite)
+                self.atualiza(nome, anterior, completo)
+        except (Exception, psycopg2.Error) as erro:
+            print(f"Erro no cálculo dos relatórios: {erro}")
+        finally:
+            if conn:
+                descartar = bool(conn.closed)
+                if not descartar:
+                    try:
+                        if travado:
+                            cursor.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", (CHAVE_TRAVA,))
+                        conn.autocommit = False
+                    except Exception:
+                        # Conexão caiu no meio do ciclo: o lock de sessão some com ela
+                        descartar = True
+                self._db_pool.putconn(conn, close=descartar)
+
+    def inicia(self):
+        """Sobe a thread de cálculo (uma por processo; não faz nada com intervalo 0)"""
+        with self._lock:
+            if self.intervalo <= 0 or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executa, name='agendador-relatorios', daemon=True)
+            self._thread.start()
+
+    def _executa(self):
+        # Verifica com frequência (barato) e só calcula o que venceu
+        espera = min(self.intervalo, 60)
+        while True:
+            try:
+                self.executa_ciclo()
+            except Exception as erro:
+                # Um ciclo com falha (banco fora do ar, pool esgotado) não encerra o agendador
+                print(f"Erro no ciclo dos relatórios: {erro}")
+            time.sleep(espera)
+
+    def lista(self):
+        """Relatórios registrados, com a data do último resultado guardado"""
+        erro, snapshots = self.dao_leitura.select_snapshots()
+        if erro:
+            return erro, []
+        return None, [
+            {
+                'nome': nome,
+                'titulo': relatorio['titulo'],
+                'consulta': relatorio['consulta'],
+                'incremental': relatorio['incremental'] is not None,
+                **(snapshots.get(nome) or {'atualizado_em': None, 'duracao_ms': None, 'linhas': None}),
+                'erro': self._erros.get(nome),
+            }
+            for nome, relatorio in self.relatorios.items()
+        ]
+
+
+def _consulta_do_arquivo(dao, sql, tempo_maximo):
+    """Cálculo de uma consulta de consultas.sql, executada como está no arquivo"""
+    def calcula():
+        erro, linhas = dao.executa_consulta(sql, tempo_maximo)
+        if erro:
+            raise RuntimeError(erro)
+        return {'linhas': linhas}, len(linhas), None
+    return calcula
+
+
+def _junta_mudancas(transicoes, recentes, anteriores=None, recentes_anteriores=()):
+    """Soma as transições por (risco anterior, risco novo) e mantém as mudanças mais recentes"""
+    contagem = {}
+    for transicao in (anteriores or []) + transicoes:
+        chave = (transicao['risco_anterior'], transicao['risco_novo'])
+        if chave not in contagem:
+            contagem[chave] = {
+                'risco_anterior': transicao['risco_anterior'],
+                'risco_novo': transicao['risco_novo'],
+                'escalada': transicao['escalada'],
+                'quantidade': 0,
+            }
+        contagem[chave]['quantidade'] += transicao['quantidade']
+    mudancas = sorted(
+        list(recentes) + list(recentes_anteriores),
+        key=lambda e: (e['data_vistoria'], e['hora_vistoria'] or '', e['id']),
+        reverse=True,
+    )[:RELATORIOS_CONFIG['recentes']]
+    return sorted(contagem.values(), key=lambda t: -t['quantidade']), mudancas
+
+
+def _mudancas_risco(dao):
+    """
+    Consulta 1 a partir de risco_evento (mantida por trigger, db/init/09_risco_atual.sql):
+    quantidade de mudanças por transição e as mudanças mais recentes
+    """
+    def calcula():
+        erro, transicoes, recentes = dao.select_eventos_risco(0, RELATORIOS_CONFIG['recentes'])
+        if erro:
+            raise RuntimeError(erro)
+        marca = max((t['ultimo_id'] for t in transicoes), default=0)
+        transicoes, recentes = _junta_mudancas(transicoes, recentes)
+        total = sum(t['quantidade'] for t in transicoes)
+        # total_eventos = eventos com id <= marca, conferido pelo incremental
+        return {'transicoes': transicoes, 'recentes': recentes, 'total_eventos': total}, total, marca
+
+    def incremental(anterior):
+        marca = anterior['marca'] or 0
+        dados = anterior['dados']
+        erro, transicoes, recentes = dao.select_eventos_risco(marca, RELATORIOS_CONFIG['recentes'])
+        if erro:
+            raise RuntimeError(erro)
+        # Contado depois da leitura: se recalcula_risco_atual() regravou os
+        # eventos com ids novos (acima da marca), os de id <= marca sumiram e a
+        # contagem não bate; somar os "novos" contaria as mudanças duas vezes
+        erro, ate_marca = dao.conta_eventos_risco(marca)
+        if erro:
+            raise RuntimeError(erro)
+        if ate_marca != dados.get('total_eventos'):
+            print(f"mudancas-risco: {ate_marca} eventos até a marca {marca}, "
+                  f"{dados.get('total_eventos')} no resultado guardado; refazendo completo")
+            return None
+        marca = max([marca] + [t['ultimo_id'] for t in transicoes])
+        transicoes, recentes = _junta_mudancas(transicoes, recentes, dados['transicoes'], dados['recentes'])
+        total = sum(t['quantidade'] for t in transicoes)
+        return {
+            'transicoes': transicoes,
+            'recentes': recentes,
+            'total_eventos': total,
+            'completo_em': dados.get('completo_em'),
+        }, total, marca
+
+    return calcula, incremental
+
+
+def _reincidencia_empresas(vistoria_dao):
+    """Consulta 5 pela varredura de calcula_reincidencia (60 dias, risco alto ou medio)"""
+    def calcula():
+        erro, empresas = vistoria_dao.select_reincidencia_empresas()
+        if erro:
+            raise RuntimeError(erro)
+        return {'janela': 60, 'riscos': ['alto', 'medio'], 'empresas': empresas}, len(empresas), None
+    return calcula
+
+
+def registra_relatorios(agendador, tempo_maximo):
+    """Registra as cinco consultas de db/scripts/consultas.sql"""
+    consultas = carrega_consultas()
+    dao = agendador.dao_leitura
+
+    calcula, incremental = _mudancas_risco(dao)
+    agendador.registra('mudancas-risco', consultas[1][0], calcula, incremental, consulta=1)
+    for nome, numero in (('solicitacoes-sem-manutencao', 2),
+                         ('empresas-especies-nativas', 3),
+                         ('manutencoes-por-risco', 4)):
+        titulo, sql = consultas[numero]
+        agendador.registra(nome, titulo, _consulta_do_arquivo(dao, sql, tempo_maximo), consulta=numero)
+    agendador.registra(
+        'reincidencia-empresas', consultas[5][0],
+        _reincidencia_empresas(Vistorias_dao(connection_pool, db_pool_leitura=read_pool)), consulta=5
+    )
+
+
+# Instância global: a thread é iniciada pelo server.py
+agendador_relatorios = AgendadorRelatorios(
+    connection_pool, read_pool,
+    RELATORIOS_CONFIG['intervalo'],
+    RELATORIOS_CONFIG['completo_a_cada'],
+)
+registra_relatorios(agendador_relatorios, RELATORIOS_CONFIG['tempo_maximo'])
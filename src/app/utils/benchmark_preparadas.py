@@ -0,0 +1,200 @@
+"""
+Benchmark das consultas preparadas (PREPARE / EXECUTE) contra SQL enviado a cada vez
+
+Mede, para as consultas mais frequentes dos DAOs (login, busca da localização
+no cadastro, listagem por status e busca de espécies):
+1. Tempo de planejamento por execução, lido do EXPLAIN (ANALYZE) de cada forma
+2. Vazão e latência com várias threads executando as consultas ao mesmo tempo
+
+Uso:
+    python src/app/utils/benchmark_preparadas.py
+    python src/app/utils/benchmark_preparadas.py --threads 16 --requisicoes 5000
+"""
+import sys
+import os
+import time
+import random
+import argparse
+import threading
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+from src.config.database import connection_pool
+from src.app.BD.arvores_dao import monta_paginacao
+from src.app.BD.consultas_preparadas import RegistroPreparadas, consultas_preparadas
+
+SQL_LISTAGEM = """
+    SELECT
+        "id",
+        "latitude",
+        "longitude",
+        "status",
+        "tipo",
+        "altura",
+        "dap",
+        "ultima_vistoria",
+        "nome_cientifico"
+    FROM arvore
+"""
+
+
+def monta_consultas(cursor):
+    """Mesmas consultas dos DAOs, com parâmetros tirados do próprio banco"""
+    cursor.execute("SELECT email FROM usuario")
+    emails = [linha[0] for linha in cursor.fetchall()] or ['admin@sistema.com']
+    cursor.execute("SELECT latitude::TEXT, longitude::TEXT FROM arvore ORDER BY random() LIMIT 200")
+    pontos = cursor.fetchall() or [('-23.5505', '-46.6333')]
+    cursor.execute("SELECT MAX(id) FROM arvore")
+    maior_id = cursor.fetchone()[0] or 1
+
+    trecho_status, _, _ = monta_paginacao(['"status" = %s'], ['x'], apos_id=1, limite=51)
+    status = ['saudavel', 'doente', 'em risco', 'corte programado', 'cortada']
+    termos = ['ip', 'tipu', 'fic', 'eucal', 'ro']
+
+    return {
+        'login': (
+            """
+            SELECT cpf, nome, email, senha, papel
+            FROM usuario
+            WHERE "email" = %s
+            """,
+            lambda: (random.choice(emails),),
+        ),
+        'localizacao_cadastro': (
+            """
+                SELECT contador, status 
+                FROM arvore
+                WHERE latitude = %s AND longitude = %s
+                ORDER BY contador ASC
+            """,
+            lambda: random.choice(pontos),
+        ),
+        'listagem_status': (
+            SQL_LISTAGEM + trecho_status,
+            lambda: (random.choice(status), random.randint(0, maior_id), 51),
+        ),
+        'busca_especies': (
+            """
+            SELECT
+                nome_cientifico,
+                nome_popular,
+                nativa
+            FROM especie
+         WHERE nome_cientifico ILIKE %s OR nome_popular ILIKE %s ORDER BY nome_cientifico""",
+            lambda: (lambda t: (t, t))(f"%{random.choice(termos)}%"),
+        ),
+    }
+
+
+def tempo_planejamento(cursor, registro, sql, gera_params, repeticoes):
+    """
+    Média do "Planning Time" do EXPLAIN ANALYZE, com e sem consulta preparada
+
+    Returns:
+        Tupla (ms_sem_preparar, ms_preparada)
+    """
+    def planejamento(comando, params):
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + comando, params)
+        return cursor.fetchone()[0][0]['Planning Time']
+
+    sem_preparar = [planejamento(sql, gera_params()) for _ in range(repeticoes)]
+
+    nome, _, quantidade = registro._registra(sql)
+    registro.executa(cursor, sql, gera_params())
+    cursor.fetchall()
+    marcadores = ', '.join(['%s'] * quantidade)
+    preparada = [planejamento(f"EXECUTE {nome} ({marcadores})", gera_params()) for _ in range(repeticoes)]
+    cursor.connection.rollback()
+
+    return sum(sem_preparar) / repeticoes, sum(preparada) / repeticoes
+
+
+def carga(consultas, registro, threads, requisicoes):
+    """
+    Executa a mistura de consultas em várias threads
+
+    Returns:
+        Tupla (requisições por segundo, latência p50 ms, latência p95 ms)
+    """
+    latencias = []
+    trava = threading.Lock()
+    por_thread = requisicoes // threads
+    lista = list(consultas.values())
+
+    def trabalhador():
+        conn = connection_pool.getconn()
+        medidas = []
+        try:
+            cursor = conn.cursor()
+            for _ in range(por_thread):
+                sql, gera_params = random.choice(lista)
+                inicio = time.perf_counter()
+                registro.executa(cursor, sql, gera_params())
+                cursor.fetchall()
+                conn.rollback()
+                medidas.append(time.perf_counter() - inicio)
+            cursor.close()
+        finally:
+            connection_pool.putconn(conn)
+        with trava:
+            latencias.extend(medidas)
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for trabalhador_thread in trabalhadores:
+        trabalhador_thread.start()
+    for trabalhador_thread in trabalhadores:
+        trabalhador_thread.join()
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return (
+        len(latencias) / duracao,
+        latencias[len(latencias) // 2] * 1000,
+        latencias[int(len(latencias) * 0.95)] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das consultas preparadas")
+    parser.add_argument('--threads', type=int, default=8, help="Threads simultâneas (padrão: 8)")
+    parser.add_argument('--requisicoes', type=int, default=4000, help="Total de consultas por rodada (padrão: 4000)")
+    parser.add_argument('--repeticoes', type=int, default=50, help="Execuções do EXPLAIN por consulta (padrão: 50)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK DE CONSULTAS PREPARADAS - Green Check")
+    print("=" * 60)
+    print()
+
+    connection_pool.maximo = max(connection_pool.maximo, args.threads)
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        consultas = monta_consultas(cursor)
+        conn.rollback()
+
+        print("Tempo de planejamento por execução (média do EXPLAIN ANALYZE):")
+        for nome, (sql, gera_params) in consultas.items():
+            sem_preparar, preparada = tempo_planejamento(cursor, consultas_preparadas, sql, gera_params, args.repeticoes)
+            print(f"  {nome:<22} sem preparar: {sem_preparar:.3f} ms | preparada: {preparada:.3f} ms "
+                  f"| economia: {sem_preparar - preparada:.3f} ms")
+        cursor.close()
+    finally:
+        connection_pool.putconn(conn)
+
+    print()
+    print(f"Carga: {args.requisicoes} consultas em {args.threads} threads")
+    # O registro global é o mesmo dos DAOs: ele sabe o que já foi preparado em cada conexão do pool
+    for descricao, registro in (("sem preparar", RegistroPreparadas(habilitado=False)),
+                                ("preparadas", consultas_preparadas)):
+        # Uma rodada curta antes, para a medição não incluir a abertura das conexões
+        carga(consultas, registro, args.threads, args.threads * 10)
+        vazao, p50, p95 = carga(consultas, registro, args.threads, args.requisicoes)
+        print(f"  {descricao:<13} {vazao:8.0f} consultas/s | p50 {p50:.3f} ms | p95 {p95:.3f} ms")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,421 @@
+"""
+Benchmark dos relatórios sobre um histórico sintético de vistorias
+
+Gera, dentro de uma transação que é desfeita no final, um histórico de
+vistorias para árvores sorteadas do cadastro (várias vistorias por árvore,
+com risco sorteado) e algumas manutenções. Depois compara a Consulta 1 de
+db/scripts/consultas.sql (subconsulta correlacionada) com o relatório de
+escalada de risco (uma passada com LAG), conferindo que as duas retornam
+as mesmas vistorias, e as escaladas recentes calculadas com LAG com as
+lidas de risco_evento (mantida pelo trigger de db/init/09_risco_atual.sql),
+e a Consulta 5 (manutenções ineficazes, auto-join) com a varredura de
+calcula_reincidencia. Nada fica gravado no banco.
+
+Com --explain, compara o plano e o tempo (EXPLAIN ANALYZE) das cinco
+consultas antes de db/init/11_chave_arvore_vistoria.sql (junções pela chave
+composta, sem os índices novos) e depois (junções por arvore_id, com os
+índices).
+
+Uso:
+    python src/app/utils/benchmark_relatorios.py
+    python src/app/utils/benchmark_relatorios.py --arvores 50000 --vistorias 6
+    python src/app/utils/benchmark_relatorios.py --arvores 1000 --vistorias 300 --intervalo 3
+    python src/app/utils/benchmark_relatorios.py --sem-indice --tempo-maximo 120
+    python src/app/utils/benchmark_relatorios.py --explain --arvores 60000
+"""
+import sys
+import os
+import time
+import json
+import argparse
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+import psycopg2
+from src.config.database import connection_pool
+from src.app.BD.vistorias_dao import monta_escalada_risco, monta_escaladas, SQL_VISTORIAS_COM_MANUTENCAO
+from src.app.BD.relatorios_dao import carrega_consultas
+from src.app.utils.reincidencia import calcula_reincidencia
+
+# Uma linha por vistoria sintética: cada árvore sorteada recebe N vistorias em
+# datas crescentes (uma a cada `intervalo` dias, com folga para não empatar)
+SQL_GERA_HISTORICO = """
+    CREATE TEMP TABLE benchmark_vistoria ON COMMIT DROP AS
+    SELECT
+        nextval('solicitacao_codigo_seq')::INTEGER AS codigo,
+        a.latitude,
+        a.longitude,
+        a.contador,
+        DATE '2020-01-01' + (n.ordem - 1) * %(intervalo)s + floor(random() * %(intervalo)s * 0.75)::INTEGER AS data,
+        TIME '07:00' + (random() * 600)::INTEGER * INTERVAL '1 minute' AS hora,
+        (ARRAY['baixo', 'medio', 'alto', 'critico'])[1 + floor(random() * 4)::INTEGER] AS risco
+    FROM (
+        -- Só árvores ainda sem vistoria: o histórico sintético é o histórico inteiro delas
+        SELECT latitude, longitude, contador
+        FROM arvore a
+        WHERE NOT EXISTS (SELECT 1 FROM vistoria_inicial v WHERE v.arvore_id = a.id)
+        ORDER BY random()
+        LIMIT %(arvores)s
+    ) a
+    CROSS JOIN generate_series(1, %(vistorias)s) AS n(ordem)
+"""
+
+SQL_INSERE_SOLICITACOES = """
+    INSERT INTO solicitacao (codigo, descricao, bairro, data, hora, status)
+    SELECT codigo, 'benchmark', 'Bairro ' || (codigo % 50), data, hora,
+           CASE WHEN random() < 0.2 THEN 'invalida' ELSE 'valida' END
+    FROM benchmark_vistoria
+"""
+
+SQL_INSERE_VISTORIAS = """
+    INSERT INTO vistoria_inicial (data, hora, risco, status, cod_solicitacao, latitude, longitude, contador)
+    SELECT data, hora, risco, 'ok', codigo, latitude, longitude, contador
+    FROM benchmark_vistoria
+"""
+
+# Uma parte das vistorias recebe manutenção, de uma empresa sorteada
+SQL_INSERE_MANUTENCOES = """
+    INSERT INTO manutencao (tipo, cod_solicitacao, laudo, cnpj)
+    SELECT
+        (ARRAY['poda', 'remocao', 'tratamento'])[1 + floor(random() * 3)::INTEGER],
+        b.codigo,
+        'benchmark',
+        (SELECT cnpj FROM empresa_terceirizada ORDER BY random() + b.codigo * 0 LIMIT 1)
+    FROM benchmark_vistoria b
+    WHERE random() < %s
+"""
+
+# Índices de db/init/11_chave_arvore_vistoria.sql, removidos no "antes" do --explain
+INDICES_CHAVE_ARVORE = ('idx_vistoria_arvore_id_data', 'idx_manutencao_cnpj', 'idx_solicitacao_status_bairro')
+
+# Consulta 1 de db/scripts/consultas.sql antes de arvore_id (chave composta)
+SQL_CONSULTA_1 = """
+    SELECT *
+    FROM (
+        SELECT
+            v_atual.cod_solicitacao,
+            v_atual.latitude,
+            v_atual.longitude,
+            v_atual.contador,
+            v_atual.data AS data_vistoria,
+            v_atual.risco AS risco_atual,
+            (
+                SELECT v_prev.risco
+                FROM vistoria_inicial v_prev
+                WHERE v_prev.latitude = v_atual.latitude
+                  AND v_prev.longitude = v_atual.longitude
+                  AND v_prev.contador = v_atual.contador
+                  AND (v_prev.data < v_atual.data
+                       OR (v_prev.data = v_atual.data AND v_prev.hora < v_atual.hora))
+                ORDER BY v_prev.data DESC, v_prev.hora DESC
+                LIMIT 1
+            ) AS risco_previo
+        FROM vistoria_inicial v_atual
+    ) AS t
+    WHERE risco_previo IS NOT NULL
+      AND risco_atual IS NOT NULL
+      AND risco_previo <> risco_atual
+    ORDER BY data_vistoria DESC
+"""
+
+# Consulta 3 de db/scripts/consultas.sql antes de arvore_id (chave composta)
+SQL_CONSULTA_3 = """
+    SELECT
+        e.cnpj,
+        COUNT(DISTINCT a.nome_cientifico) AS especies_criticas_atendidas
+    FROM empresa_terceirizada e
+    JOIN manutencao m ON m.cnpj = e.cnpj
+    JOIN vistoria_inicial v ON v.cod_solicitacao = m.cod_solicitacao
+    JOIN arvore a
+        ON v.latitude = a.latitude
+        AND v.longitude = a.longitude
+        AND v.contador = a.contador
+    JOIN especie esp ON esp.nome_cientifico = a.nome_cientifico
+    WHERE m.tipo = 'remocao'
+      AND esp.nativa = TRUE
+    GROUP BY e.cnpj
+    HAVING COUNT(DISTINCT a.nome_cientifico) = (
+        SELECT COUNT(DISTINCT a_alvo.nome_cientifico)
+        FROM arvore a_alvo
+        JOIN especie esp_alvo ON esp_alvo.nome_cientifico = a_alvo.nome_cientifico
+        JOIN vistoria_inicial v_alvo
+            ON v_alvo.latitude = a_alvo.latitude
+            AND v_alvo.longitude = a_alvo.longitude
+            AND v_alvo.contador = a_alvo.contador
+        WHERE esp_alvo.nativa = TRUE
+          AND v_alvo.risco = 'alto'
+    )
+"""
+
+# Consulta 5 de db/scripts/consultas.sql antes de arvore_id (chave composta)
+SQL_CONSULTA_5 = """
+    SELECT
+        e.cnpj AS empresa_responsavel,
+        m.tipo AS servico_executado,
+        a.nome_cientifico,
+        v_origem.data AS data_servico,
+        v_nova.data AS data_novo_problema,
+        v_nova.risco AS risco_reincidente,
+        (v_nova.data - v_origem.data) AS dias_apos_servico
+    FROM manutencao m
+    JOIN vistoria_inicial v_origem ON m.cod_solicitacao = v_origem.cod_solicitacao
+    JOIN empresa_terceirizada e ON m.cnpj = e.cnpj
+    JOIN arvore a
+        ON v_origem.latitude = a.latitude
+        AND v_origem.longitude = a.longitude
+        AND v_origem.contador = a.contador
+    JOIN vistoria_inicial v_nova
+        ON v_nova.latitude = a.latitude
+        AND v_nova.longitude = a.longitude
+        AND v_nova.contador = a.contador
+    WHERE
+        v_nova.data > v_origem.data
+        AND v_nova.data <= (v_origem.data + 60)
+        AND v_nova.risco IN ('alto', 'medio')
+    ORDER BY dias_apos_servico ASC
+"""
+
+# Mesmas junções da Consulta 5, contando as manutenções reincidentes por empresa
+SQL_CONFERE_CONSULTA_5 = """
+    SELECT m.cnpj, COUNT(DISTINCT (m.cod_solicitacao, m.tipo))
+    FROM manutencao m
+    JOIN vistoria_inicial v_origem ON m.cod_solicitacao = v_origem.cod_solicitacao
+    JOIN vistoria_inicial v_nova ON v_nova.arvore_id = v_origem.arvore_id
+    WHERE
+        v_nova.data > v_origem.data
+        AND v_nova.data <= (v_origem.data + 60)
+        AND v_nova.risco IN ('alto', 'medio')
+    GROUP BY m.cnpj
+"""
+
+
+def gera_historico(cursor, arvores, vistorias, intervalo, fracao_manutencao):
+    """
+    Insere o histórico sintético na transação aberta
+
+    Returns:
+        Tupla (vistorias inseridas, manutenções inseridas)
+    """
+    cursor.execute(SQL_GERA_HISTORICO, {'arvores': arvores, 'vistorias': vistorias, 'intervalo': intervalo})
+    cursor.execute(SQL_INSERE_SOLICITACOES)
+    cursor.execute(SQL_INSERE_VISTORIAS)
+    inseridas = cursor.rowcount
+    cursor.execute(SQL_INSERE_MANUTENCOES, (fracao_manutencao,))
+    manutencoes = cursor.rowcount
+    # Estatísticas atualizadas para o planejador enxergar o volume novo
+    cursor.execute("ANALYZE solicitacao")
+    cursor.execute("ANALYZE vistoria_inicial")
+    cursor.execute("ANALYZE manutencao")
+    return inseridas, manutencoes
+
+
+def mede(cursor, sql, params, repeticoes):
+    """
+    Executa a consulta algumas vezes dentro de um savepoint
+
+    Returns:
+        Tupla (melhor tempo em segundos ou None se excedeu o tempo máximo, linhas)
+    """
+    melhor, linhas = None, []
+    for _ in range(repeticoes):
+        cursor.execute("SAVEPOINT medicao")
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(sql, params)
+            linhas = cursor.fetchall()
+        except psycopg2.errors.QueryCanceled:
+            cursor.execute("ROLLBACK TO SAVEPOINT medicao")
+            return None, []
+        duracao = time.perf_counter() - inicio
+        cursor.execute("RELEASE SAVEPOINT medicao")
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor, linhas
+
+
+def explica(cursor, sql, repeticoes):
+    """
+    EXPLAIN ANALYZE da consulta algumas vezes dentro de um savepoint
+
+    Returns:
+        Tupla (melhor tempo de execução em ms ou None se excedeu o tempo
+        máximo, índices usados no plano)
+    """
+    melhor, indices = None, set()
+    for _ in range(repeticoes):
+        cursor.execute("SAVEPOINT explicacao")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql)
+            plano = cursor.fetchone()[0]
+        except psycopg2.errors.QueryCanceled:
+            cursor.execute("ROLLBACK TO SAVEPOINT explicacao")
+            return None, set()
+        cursor.execute("RELEASE SAVEPOINT explicacao")
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        duracao = plano[0]['Execution Time']
+        melhor = duracao if melhor is None else min(melhor, duracao)
+
+        # Índices de todos os nós do plano
+        nos = [plano[0]['Plan']]
+        while nos:
+            no = nos.pop()
+            if 'Index Name' in no:
+                indices.add(no['Index Name'])
+            nos.extend(no.get('Plans', []))
+    return melhor, indices
+
+
+def compara_planos(cursor, consultas, repeticoes, tempo_maximo):
+    """
+    Antes e depois de db/init/11_chave_arvore_vistoria.sql para as cinco consultas
+
+    Antes: consultas com junção pela chave composta, sem os índices novos
+    (removidos em um savepoint desfeito em seguida). Depois: consultas de
+    db/scripts/consultas.sql, por arvore_id, com os índices.
+    """
+    originais = {1: SQL_CONSULTA_1, 3: SQL_CONSULTA_3, 5: SQL_CONSULTA_5}
+
+    antes = {}
+    cursor.execute("SAVEPOINT sem_indices")
+    for indice in INDICES_CHAVE_ARVORE:
+        cursor.execute(f"DROP INDEX IF EXISTS {indice}")
+    for numero in sorted(consultas):
+        antes[numero] = explica(cursor, originais.get(numero, consultas[numero][1]), repeticoes)
+    cursor.execute("ROLLBACK TO SAVEPOINT sem_indices")
+
+    depois = {numero: explica(cursor, consultas[numero][1], repeticoes) for numero in sorted(consultas)}
+
+    def tempo(duracao):
+        return f"excedeu {tempo_maximo}s" if duracao is None else f"{duracao:.1f} ms"
+
+    print("EXPLAIN ANALYZE (melhor de", repeticoes, "execuções):")
+    for numero in sorted(consultas):
+        (tempo_antes, indices_antes), (tempo_depois, indices_depois) = antes[numero], depois[numero]
+        ganho = f" | {tempo_antes / tempo_depois:.1f}x" if tempo_antes and tempo_depois else ""
+        print(f"  Consulta {numero}: {consultas[numero][0]}")
+        print(f"    antes:  {tempo(tempo_antes):>16} | índices: {', '.join(sorted(indices_antes)) or 'nenhum'}")
+        print(f"    depois: {tempo(tempo_depois):>16} | índices: {', '.join(sorted(indices_depois)) or 'nenhum'}{ganho}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos relatórios com histórico sintético de vistorias")
+    parser.add_argument('--arvores', type=int, default=20000, help="Árvores com histórico (padrão: 20000)")
+    parser.add_argument('--vistorias', type=int, default=5, help="Vistorias por árvore (padrão: 5)")
+    parser.add_argument('--intervalo', type=int, default=120,
+                        help="Dias entre vistorias seguidas da mesma árvore (padrão: 120)")
+    parser.add_argument('--manutencoes', type=float, default=0.3,
+                        help="Fração das vistorias com manutenção (padrão: 0.3)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções de cada consulta (padrão: 3)")
+    parser.add_argument('--tempo-maximo', type=int, default=300,
+                        help="Segundos até desistir de uma consulta (padrão: 300)")
+    parser.add_argument('--sem-indice', action='store_true',
+                        help="Remove os índices do histórico de vistorias durante o teste (desfeito no final)")
+    parser.add_argument('--explain', action='store_true',
+                        help="Compara o EXPLAIN ANALYZE das cinco consultas antes e depois de arvore_id e dos índices")
+    args = parser.parse_args()
+    consultas = carrega_consultas()
+
+    print("=" * 60)
+    print("BENCHMARK DOS RELATÓRIOS - Green Check")
+    print("=" * 60)
+    print()
+
+    conn = connection_pool.getconn()
+    try:
+        cursor = conn.cursor()
+        inicio = time.time()
+        inseridas, manutencoes = gera_historico(cursor, args.arvores, args.vistorias, args.intervalo, args.manutencoes)
+        cursor.execute("SELECT COUNT(*) FROM vistoria_inicial")
+        total = cursor.fetchone()[0]
+        print(f"Histórico sintético: {inseridas} vistorias e {manutencoes} manutenções "
+              f"({total} vistorias no total) em {time.time() - inicio:.1f}s")
+
+        if args.sem_indice:
+            cursor.execute("DROP INDEX IF EXISTS idx_vistoria_arvore_data")
+            cursor.execute("DROP INDEX IF EXISTS idx_vistoria_arvore_id_data")
+            print("Índices idx_vistoria_arvore_data e idx_vistoria_arvore_id_data removidos para o teste")
+        cursor.execute("SET LOCAL statement_timeout = %s", (args.tempo_maximo * 1000,))
+        print()
+
+        if args.explain:
+            compara_planos(cursor, consultas, args.repeticoes, args.tempo_maximo)
+            cursor.close()
+            return
+
+        sql_lag, params_lag = monta_escalada_risco('todas')
+        comparadas = (
+            ("Consulta 1 (subconsulta correlacionada)", consultas[1][1], None),
+            ("Escalada de risco (LAG)", sql_lag, params_lag),
+        )
+        resultados = []
+        for descricao, sql, params in comparadas:
+            duracao, linhas = mede(cursor, sql, params, args.repeticoes)
+            resultados.append((duracao, linhas))
+            if duracao is None:
+                print(f"  {descricao:<42} excedeu {args.tempo_maximo}s")
+            else:
+                print(f"  {descricao:<42} {duracao * 1000:10.1f} ms | {len(linhas)} mudanças de risco")
+
+        (tempo_original, linhas_original), (tempo_lag, linhas_lag) = resultados
+        print()
+        if tempo_original is not None:
+            iguais = {linha[0] for linha in linhas_original} == {linha[0] for linha in linhas_lag}
+            print(f"Mesmas vistorias nas duas consultas: {'sim' if iguais else 'NÃO'}")
+            if tempo_lag:
+                print(f"Ganho: {tempo_original / tempo_lag:.1f}x")
+
+        # Escaladas nos últimos 10% do período sintético
+        cursor.execute("SELECT percentile_disc(0.9) WITHIN GROUP (ORDER BY data) FROM benchmark_vistoria")
+        desde = cursor.fetchone()[0]
+        print()
+        print(f"Escaladas desde {desde}:")
+        sql_lag, params_lag = monta_escalada_risco('piora', desde=desde)
+        sql_eventos, params_eventos = monta_escaladas(desde)
+        tempo_lag, linhas_lag = mede(cursor, sql_lag, params_lag, args.repeticoes)
+        tempo_eventos, linhas_eventos = mede(cursor, sql_eventos, params_eventos, args.repeticoes)
+        for descricao, duracao, linhas in (("Histórico (LAG)", tempo_lag, linhas_lag),
+                                           ("risco_evento (índice parcial)", tempo_eventos, linhas_eventos)):
+            if duracao is None:
+                print(f"  {descricao:<42} excedeu {args.tempo_maximo}s")
+            else:
+                print(f"  {descricao:<42} {duracao * 1000:10.1f} ms | {len(linhas)} escaladas")
+        # cod_solicitacao é a 1ª coluna do relatório e a 7ª de risco_evento
+        iguais = {linha[0] for linha in linhas_lag} == {linha[6] for linha in linhas_eventos}
+        print(f"Mesmas vistorias nas duas consultas: {'sim' if iguais else 'NÃO'}")
+
+        print()
+        print("Manutenções ineficazes (60 dias, risco alto ou medio):")
+        tempo_consulta_5, linhas_consulta_5 = mede(cursor, consultas[5][1], None, args.repeticoes)
+        if tempo_consulta_5 is None:
+            print(f"  {'Consulta 5 (auto-join)':<42} excedeu {args.tempo_maximo}s")
+        else:
+            print(f"  {'Consulta 5 (auto-join)':<42} {tempo_consulta_5 * 1000:10.1f} ms | {len(linhas_consulta_5)} pares")
+        tempo_varredura = None
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            # Cursor no servidor dentro da mesma transação, que enxerga o histórico sintético
+            varredura = conn.cursor(name="benchmark_reincidencia")
+            varredura.itersize = 5000
+            varredura.execute(SQL_VISTORIAS_COM_MANUTENCAO)
+            totais = calcula_reincidencia(varredura, 60, ('alto', 'medio'))
+            varredura.close()
+            duracao = time.perf_counter() - inicio
+            tempo_varredura = duracao if tempo_varredura is None else min(tempo_varredura, duracao)
+        reincidentes = sum(total['reincidentes'] for total in totais.values())
+        print(f"  {'Varredura (calcula_reincidencia)':<42} {tempo_varredura * 1000:10.1f} ms | "
+              f"{reincidentes} manutenções reincidentes")
+        cursor.execute(SQL_CONFERE_CONSULTA_5)
+        esperado = dict(cursor.fetchall())
+        obtido = {cnpj: total['reincidentes'] for cnpj, total in totais.items() if total['reincidentes']}
+        print(f"Mesmas reincidências por empresa: {'sim' if esperado == obtido else 'NÃO'}")
+        cursor.close()
+    finally:
+        # Desfaz o histórico sintético (e a remoção do índice)
+        conn.rollback()
+        connection_pool.putconn(conn)
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Cache em memória dos resultados de leitura dos DAOs
+- LRU com quantidade máxima de itens e validade máxima (TTL)
+- Cada resultado guarda a versão das tabelas lidas (em memória, mantida
+  pelo LISTEN de versoes.py); um acerto não usa o pool nem o banco
+- Quando chega o aviso de alteração de uma tabela, feita por este worker
+  ou não, os resultados que dependem dela são removidos; as escritas deste
+  worker também removem na hora, sem esperar o aviso
+- Desligado por padrão: habilitar com CACHE_RESULTADOS_MAX > 0
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from src.app.utils.versoes import versoes_tabelas
+from src.config.database import DB_LEITURA_CONFIG
+
+
+class CacheResultados:
+    """Cache LRU + TTL de resultados, invalidado pelas versões das tabelas"""
+
+    def __init__(self, max_itens=0, ttl_segundos=300):
+        """
+        Args:
+            max_itens: Quantidade máxima de resultados guardados (0 desliga o cache)
+            ttl_segundos: Tempo máximo de vida de um resultado
+        """
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._remocoes = 0
+        self._invalidacoes = 0
+        self._expirados = 0
+
+    @property
+    def habilitado(self):
+        return self.max_itens > 0
+
+    def obtem(self, chave, versoes):
+        """
+        Busca um resultado guardado
+
+        Args:
+            chave: Identificação da leitura (método e parâmetros)
+            versoes: Versões atuais das tabelas de que o resultado depende
+
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._falhas += 1
+                return False, None
+            guardado_em, _, versoes_guardadas, valor = item
+            if time.monotonic() - guardado_em > self.ttl_segundos:
+                del self._itens[chave]
+                self._expirados += 1
+                self._falhas += 1
+                return False, None
+            if versoes_guardadas != versoes:
+                # Houve escrita depois que o resultado foi lido do banco
+                del self._itens[chave]
+                self._invalidacoes += 1
+                self._falhas += 1
+                return False, None
+            self._itens.move_to_end(chave)
+            self._acertos += 1
+            return True, valor
+
+    def guarda(self, chave, tabelas, versoes, valor):
+        """
+        Guarda um resultado
+
+        Args:
+            chave: Identificação da leitura (método e parâmetros)
+            tabelas: Tabelas de que o resultado depende
+            versoes: Versões dessas tabelas lidas ANTES da consulta ao banco,
+                assim uma escrita concorrente nunca fica escondida no cache
+            valor: Resultado da consulta
+        """
+        with self._lock:
+            self._itens[chave] = (time.monotonic(), tabelas, versoes, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._remocoes += 1
+
+    def invalida(self, tabela):
+        """Remove os resultados que dependem da tabela (chamado depois do commit)"""
+        with self._lock:
+            chaves = [chave for chave, item in self._itens.items() if tabela in item[1]]
+            for chave in chaves:
+                del self._itens[chave]
+            self._invalidacoes += len(chaves)
+
+    def limpa(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        """Contadores para dimensionar o cache"""
+        with self._lock:
+            consultas = self._acertos + self._falhas
+            return {
+                'habilitado': self.habilitado,
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl_segundos': self.ttl_segundos,
+                'acertos': self._acertos,
+                'falhas': self._falhas,
+                'taxa_acerto': round(self._acertos / consultas, 4) if consultas else None,
+                'remocoes_lru': self._remocoes,
+                'invalidacoes': self._invalidacoes,
+                'expirados': self._expirados,
+            }
+
+
+def cacheado(*tabelas):
+    """
+    Decorator dos métodos de leitura dos DAOs que retornam (erro, lista)
+
+    Usa o cache do DAO (self._cache), com chave formada pelo nome do método
+    e pelos parâmetros. Resultados com erro não são guardados, e quem chama
+    recebe uma cópia da lista, para poder reordenar ou fatiar à vontade.
+    Leituras feitas em réplica logo depois de uma escrita também não são
+    guardadas: a réplica pode ainda não ter a alteração.
+    """
+    def decorator(metodo):
+        @wraps(metodo)
+        def wrapper(self, *args, **kwargs):
+            cache = self._cache
+            if cache is None or not cache.habilitado:
+                return metodo(self, *args, **kwargs)
+
+            # Versões da memória: None enquanto o LISTEN não está conectado
+            estado = versoes_tabelas.le(*tabelas)
+            if estado is None:
+                return metodo(self, *args, **kwargs)
+            versoes = tuple(estado[tabela][0] for tabela in tabelas)
+
+            chave = (metodo.__name__, args, tuple(sorted(kwargs.items())))
+            encontrado, valor = cache.obtem(chave, versoes)
+            if encontrado:
+                return None, list(valor)
+
+            # As versões foram lidas antes da consulta: uma escrita concorrente
+            # deixa o resultado guardado já vencido, nunca escondido
+            erro, valor = metodo(self, *args, **kwargs)
+            lida_em_replica = self._db_pool_leitura is not self._db_pool
+            if erro is None:
+                if not (lida_em_replica and versoes_tabelas.alterada_recentemente(
+                        estado, DB_LEITURA_CONFIG['atraso_maximo'])):
+                    cache.guarda(chave, tabelas, versoes, valor)
+                valor = list(valor)
+            return erro, valor
+        return wrapper
+    return decorator
+
+
+# Instância global usada pelos DAOs
+cache_resultados = CacheResultados(
+    max_itens=int(os.getenv('CACHE_RESULTADOS_MAX', '0')),
+    ttl_segundos=int(os.getenv('CACHE_RESULTADOS_TTL', '300'))
+)
+
+# Alterações avisadas pelo banco (outros workers, carga de censo, SQL manual)
+for _tabela in versoes_tabelas.tabelas:
+    versoes_tabelas.ao_alterar(_tabela, lambda area, tabela=_tabela: cache_resultados.invalida(tabela))
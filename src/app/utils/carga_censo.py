@@ -0,0 +1,277 @@
+"""
+Script de carga de censos arbóreos a partir de arquivo CSV
+Carrega dezenas de milhares (ou milhões) de árvores de uma vez, usando COPY
+para a tabela de preparação e comandos em conjunto (set-based) para validar,
+calcular o contador e inserir, em vez de uma ida ao banco por árvore.
+
+Formato do CSV (com cabeçalho, mesmos nomes do formulário de cadastro):
+    latitude,longitude,status,tipo,altura_m,dap_cm,nome_cientifico,codigo_tag
+
+Uso:
+    python src/app/utils/carga_censo.py censo.csv
+    python src/app/utils/carga_censo.py censo.csv --rejeitadas rejeitadas.csv --simular
+"""
+import sys
+import os
+import csv
+import time
+import argparse
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+from src.config.database import connection_pool
+
+COLUNAS_CSV = ['latitude', 'longitude', 'status', 'tipo', 'altura_m', 'dap_cm', 'nome_cientifico', 'codigo_tag']
+
+# Tabela temporária que recebe o CSV bruto (tudo como texto)
+SQL_CRIA_PREPARACAO = """
+    CREATE TEMP TABLE carga_bruta (
+        linha BIGSERIAL,
+        latitude TEXT,
+        longitude TEXT,
+        status TEXT,
+        tipo TEXT,
+        altura_m TEXT,
+        dap_cm TEXT,
+        nome_cientifico TEXT,
+        codigo_tag TEXT
+    ) ON COMMIT DROP
+"""
+
+# Mesmas regras do Arvores_dao.inclui_clientes, aplicadas a todas as linhas de uma vez.
+# A tabela é criada com CREATE TABLE AS (uma única passada) em vez de vários UPDATEs.
+SQL_VALIDA_CAMPOS = r"""
+    CREATE TEMP TABLE carga_censo ON COMMIT DROP AS
+    SELECT v.*,
+           CASE WHEN v.motivo IS NULL THEN v.latitude::NUMERIC END AS lat,
+           CASE WHEN v.motivo IS NULL THEN v.longitude::NUMERIC END AS lng
+    FROM (
+        SELECT t.*,
+            CASE
+                WHEN latitude IS NULL THEN 'Latitude não informada'
+                WHEN latitude !~ '^[-+]?(\d+(\.\d*)?|\.\d+)$' THEN 'Latitude não é um número válido'
+                WHEN latitude::NUMERIC < -90 OR latitude::NUMERIC > 90 THEN 'Latitude fora do intervalo de -90 a 90'
+                WHEN LENGTH(REGEXP_REPLACE(latitude, '\D', '', 'g')) > 8 THEN 'Latitude com mais de 8 dígitos'
+                WHEN longitude IS NULL THEN 'Longitude não informada'
+                WHEN longitude !~ '^[-+]?(\d+(\.\d*)?|\.\d+)$' THEN 'Longitude não é um número válido'
+                WHEN longitude::NUMERIC < -180 OR longitude::NUMERIC > 180 THEN 'Longitude fora do intervalo de -180 a 180'
+                WHEN LENGTH(REGEXP_REPLACE(longitude, '\D', '', 'g')) > 8 THEN 'Longitude com mais de 8 dígitos'
+                WHEN status IS NOT NULL AND status NOT IN ('saudavel', 'doente', 'em risco', 'corte programado', 'cortada')
+                    THEN 'Status inválido'
+                WHEN tipo IS NOT NULL AND tipo NOT IN ('publico', 'privado') THEN 'Tipo inválido'
+                WHEN altura_m IS NOT NULL AND altura_m !~ '^[-+]?(\d+(\.\d*)?|\.\d+)$' THEN 'Altura não é um número válido'
+                WHEN dap_cm IS NOT NULL AND dap_cm !~ '^[-+]?(\d+(\.\d*)?|\.\d+)$' THEN 'DAP não é um número válido'
+                WHEN t.nome_cientifico IS NOT NULL AND e.nome_cientifico IS NULL THEN 'Espécie não cadastrada'
+            END AS motivo
+        FROM (
+            SELECT linha,
+                   NULLIF(BTRIM(latitude), '') AS latitude,
+                   NULLIF(BTRIM(longitude), '') AS longitude,
+                   NULLIF(BTRIM(status), '') AS status,
+                   NULLIF(BTRIM(tipo), '') AS tipo,
+                   NULLIF(BTRIM(altura_m), '') AS altura_m,
+                   NULLIF(BTRIM(dap_cm), '') AS dap_cm,
+                   NULLIF(BTRIM(nome_cientifico), '') AS nome_cientifico,
+                   NULLIF(BTRIM(codigo_tag), '') AS codigo_tag
+            FROM carga_bruta
+        ) t
+        LEFT JOIN especie e ON e.nome_cientifico = t.nome_cientifico
+    ) v
+"""
+
+# TAG só pode estar em uma árvore: repetidas no arquivo ou já usadas são rejeitadas
+SQL_VALIDA_TAGS = """
+    WITH repetidas AS (
+        SELECT linha,
+               ROW_NUMBER() OVER (PARTITION BY codigo_tag ORDER BY linha) AS ordem
+        FROM carga_censo
+        WHERE motivo IS NULL AND codigo_tag IS NOT NULL
+    )
+    UPDATE carga_censo c SET motivo = CASE
+        WHEN r.ordem > 1 THEN 'TAG repetida no arquivo'
+        ELSE 'TAG já associada a outra árvore'
+    END
+    FROM repetidas r
+    WHERE c.linha = r.linha
+      AND (r.ordem > 1 OR EXISTS (SELECT 1 FROM arvore a WHERE a.codigo_nfc = c.codigo_tag))
+"""
+
+# Cálculo do contador de todas as linhas em um único passo.
+# Equivale a aplicar inclui_clientes linha a linha, na ordem do arquivo:
+# - sem árvores no ponto: contador 1
+# - só árvores cortadas no ponto: maior contador + 1 (cortadas não bloqueiam)
+# - árvore ativa no ponto: só entra com contador 1 se ainda não existir contador 1
+# Linhas do próprio arquivo contam como existentes para as linhas seguintes.
+# Contador NULL significa que a localização já está ocupada (linha rejeitada).
+SQL_CALCULA_CONTADOR = """
+    CREATE TEMP TABLE carga_contador ON COMMIT DROP AS
+    WITH validas AS (
+        SELECT linha, lat, lng,
+               ROW_NUMBER() OVER local AS ordem,
+               COUNT(*) FILTER (WHERE status IS DISTINCT FROM 'cortada') OVER (
+                   local ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+               ) AS ativas_antes
+        FROM carga_censo
+        WHERE motivo IS NULL
+        WINDOW local AS (PARTITION BY lat, lng ORDER BY linha)
+    ),
+    existentes AS (
+        SELECT a.latitude, a.longitude,
+               MAX(a.contador) AS maior_contador,
+               BOOL_OR(a.status IS DISTINCT FROM 'cortada') AS tem_ativa,
+               BOOL_OR(a.contador = 1) AS tem_contador_1
+        FROM arvore a
+        JOIN (SELECT DISTINCT lat, lng FROM validas) p
+          ON a.latitude = p.lat AND a.longitude = p.lng
+        GROUP BY a.latitude, a.longitude
+    )
+    SELECT v.linha,
+           CASE
+               WHEN v.ativas_antes > 0 THEN NULL
+               WHEN e.tem_ativa THEN
+                   CASE WHEN v.ordem = 1 AND NOT e.tem_contador_1 THEN 1 END
+               ELSE COALESCE(e.maior_contador, 0) + v.ordem
+           END AS contador
+    FROM validas v
+    LEFT JOIN existentes e ON e.latitude = v.lat AND e.longitude = v.lng
+"""
+
+SQL_INSERE_TAGS = """
+    INSERT INTO tag (codigo_nfc)
+    SELECT c.codigo_tag
+    FROM carga_censo c
+    JOIN carga_contador k ON k.linha = c.linha
+    WHERE k.contador IS NOT NULL AND c.codigo_tag IS NOT NULL
+    ON CONFLICT (codigo_nfc) DO NOTHING
+"""
+
+SQL_INSERE_ARVORES = """
+    INSERT INTO arvore
+        (codigo_nfc, latitude, longitude, contador, nome_cientifico, ultima_vistoria, status, tipo, altura, dap)
+    SELECT c.codigo_tag, c.lat, c.lng, k.contador, c.nome_cientifico, NULL,
+           c.status, c.tipo, c.altura_m::NUMERIC, c.dap_cm::NUMERIC
+    FROM carga_censo c
+    JOIN carga_contador k ON k.linha = c.linha
+    WHERE k.contador IS NOT NULL
+    ORDER BY c.linha
+"""
+
+SQL_EXPORTA_REJEITADAS = """
+    COPY (
+        SELECT c.linha,
+               COALESCE(c.motivo, 'Já existe uma árvore ativa na localização') AS motivo,
+               c.latitude, c.longitude, c.status, c.tipo, c.altura_m, c.dap_cm, c.nome_cientifico, c.codigo_tag
+        FROM carga_censo c
+        LEFT JOIN carga_contador k ON k.linha = c.linha
+        WHERE c.motivo IS NOT NULL OR k.contador IS NULL
+        ORDER BY c.linha
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+
+def carrega_censo(caminho_csv, caminho_rejeitadas, delimitador=',', simular=False):
+    """
+    Carrega o CSV do censo na tabela arvore em uma única transação
+
+    Args:
+        caminho_csv: Arquivo CSV com cabeçalho (ver COLUNAS_CSV)
+        caminho_rejeitadas: Arquivo onde as linhas rejeitadas são gravadas com o motivo
+        delimitador: Separador de campos do CSV
+        simular: Se True, valida e calcula tudo mas desfaz a transação no final
+
+    Returns:
+        Tupla (total_linhas, inseridas, rejeitadas)
+    """
+    conn = None
+    inicio = time.time()
+
+    try:
+        conn = connection_pool.getconn()
+        cursor = conn.cursor()
+
+        # Impede cadastros simultâneos pelo formulário enquanto os contadores são calculados
+        cursor.execute("LOCK TABLE arvore IN SHARE ROW EXCLUSIVE MODE")
+
+        cursor.execute(SQL_CRIA_PREPARACAO)
+        with open(caminho_csv, 'r', encoding='utf-8', newline='') as arquivo:
+            # O cabeçalho define a ordem das colunas; colunas opcionais podem faltar
+            cabecalho = [coluna.strip().lower() for coluna in next(csv.reader([arquivo.readline()], delimiter=delimitador))]
+            desconhecidas = [coluna for coluna in cabecalho if coluna not in COLUNAS_CSV]
+            if desconhecidas or 'latitude' not in cabecalho or 'longitude' not in cabecalho:
+                raise ValueError(
+                    f"Cabeçalho inválido: {cabecalho}. Use as colunas {', '.join(COLUNAS_CSV)} "
+                    "(latitude e longitude são obrigatórias)."
+                )
+            cursor.copy_expert(
+                cursor.mogrify(
+                    "COPY carga_bruta ({}) FROM STDIN WITH (FORMAT csv, DELIMITER %s)".format(", ".join(cabecalho)),
+                    (delimitador,)
+                ).decode('utf-8'),
+                arquivo
+            )
+        cursor.execute("SELECT COUNT(*) FROM carga_bruta")
+        total = cursor.fetchone()[0]
+        print(f"{total} linhas lidas em {time.time() - inicio:.1f}s")
+
+        cursor.execute(SQL_VALIDA_CAMPOS)
+        cursor.execute("ANALYZE carga_censo")
+        cursor.execute(SQL_VALIDA_TAGS)
+        cursor.execute(SQL_CALCULA_CONTADOR)
+        cursor.execute(SQL_INSERE_TAGS)
+        cursor.execute(SQL_INSERE_ARVORES)
+        inseridas = cursor.rowcount
+        print(f"{inseridas} árvores inseridas em {time.time() - inicio:.1f}s")
+
+        with open(caminho_rejeitadas, 'w', encoding='utf-8', newline='') as arquivo:
+            cursor.copy_expert(SQL_EXPORTA_REJEITADAS, arquivo)
+        rejeitadas = total - inseridas
+
+        if simular:
+            conn.rollback()
+            print("Simulação: nenhuma alteração foi gravada no banco.")
+        else:
+            conn.commit()
+        cursor.close()
+
+        return total, inseridas, rejeitadas
+
+    except Exception as erro:
+        if conn:
+            conn.rollback()
+        print(f"Erro na carga do censo: {erro}")
+        raise
+    finally:
+        if conn:
+            connection_pool.putconn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de censo arbóreo a partir de CSV")
+    parser.add_argument('arquivo', help="CSV com as colunas: " + ",".join(COLUNAS_CSV))
+    parser.add_argument('--rejeitadas', help="CSV de saída com as linhas rejeitadas (padrão: <arquivo>.rejeitadas.csv)")
+    parser.add_argument('--delimitador', default=',', help="Separador de campos do CSV (padrão: ,)")
+    parser.add_argument('--simular', action='store_true', help="Valida sem gravar no banco")
+    args = parser.parse_args()
+
+    caminho_rejeitadas = args.rejeitadas or os.path.splitext(args.arquivo)[0] + '.rejeitadas.csv'
+
+    print("=" * 60)
+    print("CARGA DE CENSO ARBÓREO - Green Check")
+    print("=" * 60)
+    print()
+
+    inicio = time.time()
+    total, inseridas, rejeitadas = carrega_censo(args.arquivo, caminho_rejeitadas, args.delimitador, args.simular)
+
+    print()
+    print("=" * 60)
+    print(f"Total de linhas no arquivo: {total}")
+    print(f"Árvores inseridas: {inseridas}")
+    print(f"Linhas rejeitadas: {rejeitadas} (detalhes em {caminho_rejeitadas})")
+    print(f"Tempo total: {time.time() - inicio:.1f}s")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
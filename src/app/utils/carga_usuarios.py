@@ -0,0 +1,296 @@
+"""
+Script de cadastro de usuários em lote a partir de arquivo CSV
+Usado na implantação de um novo município: gera os hashes bcrypt em paralelo,
+em todos os núcleos, e grava os usuários com COPY em uma única transação.
+
+Formato do CSV (com cabeçalho):
+    cpf,nome,telefone,email,senha,papel
+
+Uso:
+    python src/app/utils/carga_usuarios.py usuarios.csv
+    python src/app/utils/carga_usuarios.py usuarios.csv --processos 8 --custo 12 --simular
+"""
+import sys
+import os
+import io
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+import bcrypt
+from src.config.database import connection_pool
+from src.app.utils.security import BCRYPT_CONFIG
+
+COLUNAS_CSV = ['cpf', 'nome', 'telefone', 'email', 'senha', 'papel']
+PAPEIS = ('municipe', 'responsavel tecnico')
+
+# Tamanho mínimo da senha em texto plano (a mesma regra do ck_usuario_senha)
+TAMANHO_MINIMO_SENHA = 9
+
+SQL_CRIA_PREPARACAO = """
+    CREATE TEMP TABLE carga_usuario (
+        linha BIGINT,
+        cpf TEXT,
+        nome TEXT,
+        telefone TEXT,
+        email TEXT,
+        senha TEXT,
+        papel TEXT,
+        motivo TEXT
+    ) ON COMMIT DROP
+"""
+
+# CPF ou email já cadastrados no banco
+SQL_VALIDA_EXISTENTES = """
+    UPDATE carga_usuario c SET motivo = CASE
+        WHEN EXISTS (SELECT 1 FROM usuario u WHERE u.cpf = c.cpf) THEN 'CPF já cadastrado'
+        ELSE 'Email já cadastrado'
+    END
+    WHERE EXISTS (SELECT 1 FROM usuario u WHERE u.cpf = c.cpf)
+       OR EXISTS (SELECT 1 FROM usuario u WHERE LOWER(u.email) = LOWER(c.email))
+"""
+
+# Consulta prévia, antes de gerar os hashes: não gasta bcrypt com quem já está cadastrado
+SQL_BUSCA_EXISTENTES = """
+    SELECT cpf, LOWER(email)
+    FROM usuario
+    WHERE cpf = ANY(%s) OR LOWER(email) = ANY(%s)
+"""
+
+SQL_INSERE_USUARIOS = """
+    INSERT INTO usuario (cpf, nome, telefone, email, senha, papel)
+    SELECT cpf, nome, telefone, email, senha, papel
+    FROM carga_usuario
+    WHERE motivo IS NULL
+    ORDER BY linha
+    ON CONFLICT (cpf) DO NOTHING
+"""
+
+SQL_LISTA_REJEITADAS = """
+    SELECT linha, motivo, cpf, nome, telefone, email, papel
+    FROM carga_usuario
+    WHERE motivo IS NOT NULL
+"""
+
+
+def _gera_hash(args):
+    """Executado nos processos do pool: (senha, custo) -> hash"""
+    senha, custo = args
+    return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=custo)).decode('utf-8')
+
+
+def _valida_linha(campos, cpfs, emails):
+    """Retorna o motivo da rejeição ou None (mesmas regras das restrições da tabela usuario)"""
+    if not campos['cpf'].isdigit() or len(campos['cpf']) != 11:
+        return 'CPF deve ter 11 dígitos'
+    if not campos['nome']:
+        return 'Nome não informado'
+    if campos['telefone'] and (not campos['telefone'].isdigit() or len(campos['telefone']) != 11):
+        return 'Telefone deve ter 11 dígitos'
+    if len(campos['email']) < 6 or '@' not in campos['email']:
+        return 'Email inválido'
+    if len(campos['senha']) < TAMANHO_MINIMO_SENHA:
+        return f'Senha com menos de {TAMANHO_MINIMO_SENHA} caracteres'
+    if campos['papel'] not in PAPEIS:
+        return 'Papel inválido'
+    if campos['cpf'] in cpfs:
+        return 'CPF repetido no arquivo'
+    if campos['email'].lower() in emails:
+        return 'Email repetido no arquivo'
+    return None
+
+
+def le_usuarios(caminho_csv, delimitador=','):
+    """
+    Lê e valida o CSV
+
+    Returns:
+        Tupla (validos, rejeitados): validos é uma lista de (linha, campos) e
+        rejeitados uma lista de (linha, motivo, campos); a senha não vai para os rejeitados
+    """
+    validos = []
+    rejeitados = []
+    cpfs = set()
+    emails = set()
+    with open(caminho_csv, 'r', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.DictReader(arquivo, delimiter=delimitador)
+        cabecalho = [coluna.strip().lower() for coluna in leitor.fieldnames or []]
+        faltando = [coluna for coluna in COLUNAS_CSV if coluna not in cabecalho and coluna != 'telefone']
+        if faltando:
+            raise ValueError(f"Cabeçalho inválido: faltam as colunas {', '.join(faltando)}.")
+        leitor.fieldnames = cabecalho
+
+        for numero, registro in enumerate(leitor, start=1):
+            campos = {coluna: (registro.get(coluna) or '').strip() for coluna in COLUNAS_CSV}
+            campos['papel'] = campos['papel'].lower()
+            motivo = _valida_linha(campos, cpfs, emails)
+            if motivo:
+                campos.pop('senha')
+                rejeitados.append((numero, motivo, campos))
+                continue
+            cpfs.add(campos['cpf'])
+            emails.add(campos['email'].lower())
+            validos.append((numero, campos))
+    return validos, rejeitados
+
+
+def separa_existentes(validos, rejeitados):
+    """Move para os rejeitados as linhas cujo CPF ou email já está no banco"""
+    conn = None
+    try:
+        conn = connection_pool.getconn()
+        cursor = conn.cursor()
+        cursor.execute(SQL_BUSCA_EXISTENTES, (
+            [campos['cpf'] for _, campos in validos],
+            [campos['email'].lower() for _, campos in validos],
+        ))
+        existentes = cursor.fetchall()
+        conn.commit()
+        cursor.close()
+    finally:
+        if conn:
+            connection_pool.putconn(conn)
+
+    cpfs = {cpf for cpf, _ in existentes}
+    emails = {email for _, email in existentes}
+    restantes = []
+    for numero, campos in validos:
+        if campos['cpf'] in cpfs or campos['email'].lower() in emails:
+            motivo = 'CPF já cadastrado' if campos['cpf'] in cpfs else 'Email já cadastrado'
+            campos.pop('senha')
+            rejeitados.append((numero, motivo, campos))
+        else:
+            restantes.append((numero, campos))
+    return restantes
+
+
+def gera_hashes(senhas, processos, custo):
+    """Gera os hashes em paralelo, preservando a ordem das senhas"""
+    if processos <= 1:
+        return [_gera_hash((senha, custo)) for senha in senhas]
+    # Blocos de algumas senhas por tarefa reduzem a troca de mensagens com os processos
+    tamanho_bloco = max(1, len(senhas) // (processos * 8))
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_gera_hash, ((senha, custo) for senha in senhas), chunksize=tamanho_bloco))
+
+
+def carrega_usuarios(caminho_csv, caminho_rejeitadas, processos, custo, delimitador=',', simular=False):
+    """
+    Cadastra os usuários do CSV em uma única transação
+
+    Args:
+        caminho_csv: Arquivo CSV com cabeçalho (ver COLUNAS_CSV)
+        caminho_rejeitadas: Arquivo onde as linhas rejeitadas são gravadas com o motivo (sem a senha)
+        processos: Processos que geram os hashes
+        custo: Custo do bcrypt
+        delimitador: Separador de campos do CSV
+        simular: Se True, valida e gera os hashes mas desfaz a transação no final
+
+    Returns:
+        Tupla (total_linhas, inseridos, rejeitados)
+    """
+    inicio = time.time()
+    validos, rejeitados = le_usuarios(caminho_csv, delimitador)
+    total = len(validos) + len(rejeitados)
+    print(f"{total} linhas lidas, {len(rejeitados)} rejeitadas na validação")
+    validos = separa_existentes(validos, rejeitados)
+
+    hashes = gera_hashes([campos['senha'] for _, campos in validos], processos, custo)
+    print(f"{len(hashes)} hashes gerados em {time.time() - inicio:.1f}s ({processos} processos, custo {custo})")
+
+    # Monta o conteúdo do COPY em memória, já com os hashes no lugar das senhas
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for (numero, campos), senha_hash in zip(validos, hashes):
+        escritor.writerow([numero, campos['cpf'], campos['nome'], campos['telefone'] or None,
+                           campos['email'], senha_hash, campos['papel']])
+    buffer.seek(0)
+
+    conn = None
+    inseridos = 0
+    try:
+        conn = connection_pool.getconn()
+        cursor = conn.cursor()
+
+        cursor.execute(SQL_CRIA_PREPARACAO)
+        cursor.copy_expert(
+            "COPY carga_usuario (linha, cpf, nome, telefone, email, senha, papel) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        # Confere de novo dentro da transação (cadastros feitos enquanto os hashes eram gerados)
+        cursor.execute(SQL_VALIDA_EXISTENTES)
+        cursor.execute(SQL_INSERE_USUARIOS)
+        inseridos = cursor.rowcount
+
+        cursor.execute(SQL_LISTA_REJEITADAS)
+        for numero, motivo, cpf, nome, telefone, email, papel in cursor.fetchall():
+            rejeitados.append((numero, motivo, {'cpf': cpf, 'nome': nome, 'telefone': telefone,
+                                                'email': email, 'papel': papel}))
+        # Linhas ignoradas pelo ON CONFLICT (CPF cadastrado por outra sessão durante a carga)
+        ignorados = len(validos) - inseridos - cursor.rowcount
+        print(f"{inseridos} usuários inseridos em {time.time() - inicio:.1f}s")
+
+        if simular:
+            conn.rollback()
+            print("Simulação: nenhuma alteração foi gravada no banco.")
+        else:
+            conn.commit()
+        cursor.close()
+    except Exception as erro:
+        if conn:
+            conn.rollback()
+        print(f"Erro no cadastro de usuários: {erro}")
+        raise
+    finally:
+        if conn:
+            connection_pool.putconn(conn)
+
+    with open(caminho_rejeitadas, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['linha', 'motivo', 'cpf', 'nome', 'telefone', 'email', 'papel'])
+        for numero, motivo, campos in sorted(rejeitados, key=lambda r: r[0]):
+            escritor.writerow([numero, motivo, campos['cpf'], campos['nome'], campos['telefone'],
+                               campos['email'], campos['papel']])
+
+    return total, inseridos, len(rejeitados) + ignorados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cadastro de usuários em lote a partir de CSV")
+    parser.add_argument('arquivo', help="CSV com as colunas: " + ",".join(COLUNAS_CSV))
+    parser.add_argument('--rejeitadas', help="CSV de saída com as linhas rejeitadas (padrão: <arquivo>.rejeitadas.csv)")
+    parser.add_argument('--delimitador', default=',', help="Separador de campos do CSV (padrão: ,)")
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                        help="Processos que geram os hashes (padrão: número de CPUs)")
+    parser.add_argument('--custo', type=int, default=BCRYPT_CONFIG['custo'],
+                        help=f"Custo do bcrypt (padrão: BCRYPT_CUSTO = {BCRYPT_CONFIG['custo']})")
+    parser.add_argument('--simular', action='store_true', help="Valida sem gravar no banco")
+    args = parser.parse_args()
+
+    caminho_rejeitadas = args.rejeitadas or os.path.splitext(args.arquivo)[0] + '.rejeitadas.csv'
+
+    print("=" * 60)
+    print("CADASTRO DE USUÁRIOS EM LOTE - Green Check")
+    print("=" * 60)
+    print()
+
+    inicio = time.time()
+    total, inseridos, rejeitados = carrega_usuarios(
+        args.arquivo, caminho_rejeitadas, args.processos, args.custo, args.delimitador, args.simular
+    )
+
+    print()
+    print("=" * 60)
+    print(f"Total de linhas no arquivo: {total}")
+    print(f"Usuários inseridos: {inseridos}")
+    print(f"Linhas rejeitadas: {rejeitados} (detalhes em {caminho_rejeitadas})")
+    print(f"Tempo total: {time.time() - inicio:.1f}s")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
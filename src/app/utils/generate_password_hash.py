@@ -9,6 +9,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 import bcrypt
+from src.app.utils.security import BCRYPT_CONFIG
 
 def generate_hash(password: str) -> str:
     """
@@ -20,7 +21,7 @@ def generate_hash(password: str) -> str:
     Returns:
         String com o hash da senha
     """
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=BCRYPT_CONFIG['custo'])
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -0,0 +1,176 @@
+"""
+Índice em memória das espécies para o autocomplete de /api/especies
+- Busca por prefixo e por trecho (substring), sem diferenciar acentos e maiúsculas
+- Construído a partir da tabela especie, atualizado a cada espécie cadastrada
+  neste processo e recarregado a cada alteração de especie avisada pelo banco
+  (outros workers, a API assíncrona, SQL manual)
+"""
+import bisect
+import threading
+import unicodedata
+
+
+def normaliza(texto):
+    """Remove acentos e converte para minúsculas ('Ipê-Roxo' -> 'ipe-roxo')"""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+
+def _ngramas(texto, n):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+
+class IndiceEspecies:
+    """
+    Índice de prefixos e trigramas sobre nome científico e nome popular
+
+    - Prefixo: lista ordenada de (nome normalizado, posição), consultada com bisect
+    - Trecho: mapa n-grama (2 e 3 letras) -> posições. Termos de 2 letras
+      são respondidos direto pelo mapa; nos maiores, a interseção dos
+      trigramas do termo dá os candidatos, confirmados com "in"
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._especies = []
+        self._normalizados = []
+        self._prefixos = []
+        self._ngramas = {}
+        self._ordem = []
+        self.carregado = False
+        # Versão de especie (versoes.py) lida antes da consulta que montou o índice
+        self.versao = None
+        self._recarregando = False
+        self._recarregar_de_novo = False
+        self._lock_recarga = threading.Lock()
+
+    def carrega(self, especies, versao=None):
+        """
+        Reconstrói o índice a partir de uma lista de espécies
+
+        Args:
+            especies: Lista de dicionários com nome_cientifico, nome_popular e nativa
+            versao: Versão de especie lida antes da consulta (entra na ETag de /api/especies)
+        """
+        with self._lock:
+            self.versao = versao
+            self._especies = []
+            self._normalizados = []
+            self._prefixos = []
+            self._ngramas = {}
+            self._ordem = []
+            for especie in especies:
+                self._adiciona(especie)
+            self.carregado = True
+
+    def acompanha(self, versoes, carregar):
+        """
+        Recarrega o índice a cada alteração de especie avisada pelo banco
+
+        Args:
+            versoes: VersoesTabelas do processo
+            carregar: Função sem argumentos que lê as espécies e chama carrega()
+        """
+        versoes.ao_alterar('especie', lambda area: self._agenda_recarga(carregar))
+
+    def _agenda_recarga(self, carregar):
+        # Fora da thread do LISTEN; avisos durante a recarga geram só mais uma
+        with self._lock_recarga:
+            if self._recarregando:
+                self._recarregar_de_novo = True
+                return
+            self._recarregando = True
+        threading.Thread(target=self._recarrega, args=(carregar,), name='recarga-especies', daemon=True).start()
+
+    def _recarrega(self, carregar):
+        while True:
+            try:
+                carregar()
+            except Exception as erro:
+                print(f"Erro ao recarregar o índice de espécies: {erro}")
+            with self._lock_recarga:
+                if not self._recarregar_de_novo:
+                    self._recarregando = False
+                    return
+                self._recarregar_de_novo = False
+
+    def adiciona(self, especie):
+        """Inclui uma espécie recém-cadastrada no índice"""
+        with self._lock:
+            self._adiciona(especie)
+
+    def _adiciona(self, especie):
+        posicao = len(self._especies)
+        nomes = (normaliza(especie.get('nome_cientifico')), normaliza(especie.get('nome_popular')))
+        self._especies.append(dict(especie))
+        self._normalizados.append(nomes)
+        # Posições em ordem de nome científico, para devolver os resultados já ordenados
+        bisect.insort(self._ordem, (especie.get('nome_cientifico') or '', posicao))
+        for nome in nomes:
+            if not nome:
+                continue
+            # Cada palavra do nome também é um prefixo válido ("roxo" encontra "Ipê-roxo")
+            chaves = {nome} | {palavra for palavra in nome.replace('-', ' ').split() if palavra}
+            for chave in chaves:
+                bisect.insort(self._prefixos, (chave, posicao))
+            for ngrama in _ngramas(nome, 2) | _ngramas(nome, 3):
+                self._ngramas.setdefault(ngrama, set()).add(posicao)
+
+    def busca(self, termo=None, limite=20):
+        """
+        Busca espécies pelo termo, em nome científico ou popular
+
+        Args:
+            termo: Texto digitado (None ou vazio retorna o catálogo em ordem)
+            limite: Quantidade máxima de resultados (None = sem limite)
+
+        Returns:
+            Lista de dicionários ordenada por nome científico
+        """
+        termo = normaliza(termo)
+        with self._lock:
+            posicoes = None
+            if termo:
+                posicoes = self._busca_prefixo(termo) | self._busca_trecho(termo)
+            if posicoes is not None and (not limite or len(posicoes) <= 4 * limite):
+                # Poucos candidatos: ordenar só eles sai mais barato que percorrer o catálogo
+                ordenadas = sorted(posicoes, key=lambda p: (self._especies[p].get('nome_cientifico') or '', p))
+                return [self._especies[p] for p in ordenadas[:limite or None]]
+            resultados = []
+            for _, posicao in self._ordem:
+                if posicoes is None or posicao in posicoes:
+                    resultados.append(self._especies[posicao])
+                    if limite and len(resultados) >= limite:
+                        break
+            return resultados
+
+    def _busca_prefixo(self, termo):
+        encontrados = set()
+        indice = bisect.bisect_left(self._prefixos, (termo,))
+        while indice < len(self._prefixos):
+            chave, posicao = self._prefixos[indice]
+            if not chave.startswith(termo):
+                break
+            encontrados.add(posicao)
+            indice += 1
+        return encontrados
+
+    def _busca_trecho(self, termo):
+        if len(termo) < 2:
+            # Uma letra só é tratada como prefixo
+            return set()
+        if len(termo) == 2:
+            return set(self._ngramas.get(termo, ()))
+        candidatos = None
+        for trigrama in _ngramas(termo, 3):
+            posicoes = self._ngramas.get(trigrama)
+            if not posicoes:
+                return set()
+            candidatos = set(posicoes) if candidatos is None else candidatos & posicoes
+        return {p for p in candidatos if any(termo in nome for nome in self._normalizados[p])}
+
+
+# Instância global compartilhada pelo controller (busca) e pelo DAO (atualização)
+indice_especies = IndiceEspecies()
@@ -0,0 +1,184 @@
+"""
+Limite de tentativas de login (token bucket) por IP e por email
+- Cada IP e cada email têm um balde de fichas que se recompõe com o tempo;
+  cada tentativa gasta uma ficha e, com o balde vazio, o login é recusado
+  antes de qualquer consulta ao banco ou cálculo de bcrypt
+- Os baldes ficam em um arquivo SQLite local, compartilhado por todos os
+  workers da mesma máquina
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+LIMITE_LOGIN_CONFIG = {
+    # Tentativas seguidas permitidas por IP e fichas recompostas por minuto (0 = sem limite)
+    'ip_capacidade': float(os.getenv('LOGIN_LIMITE_IP_CAPACIDADE', '30')),
+    'ip_por_minuto': float(os.getenv('LOGIN_LIMITE_IP_POR_MINUTO', '60')),
+    # O mesmo, por email informado no formulário
+    'email_capacidade': float(os.getenv('LOGIN_LIMITE_EMAIL_CAPACIDADE', '5')),
+    'email_por_minuto': float(os.getenv('LOGIN_LIMITE_EMAIL_POR_MINUTO', '6')),
+    # Arquivo dos baldes (o mesmo para todos os workers da máquina)
+    'arquivo': os.getenv('LOGIN_LIMITE_ARQUIVO', os.path.join(tempfile.gettempdir(), 'green_check_limite_login.db')),
+}
+
+# Gasta uma ficha se houver; aceito = 1 quando gastou
+SQL_CONSOME_FICHA = """
+    INSERT INTO balde (chave, fichas, atualizado_em, aceito)
+    VALUES (:chave, :capacidade - 1, :agora, 1)
+    ON CONFLICT (chave) DO UPDATE SET
+        fichas = MIN(:capacidade, fichas + (:agora - atualizado_em) * :por_segundo)
+                 - (MIN(:capacidade, fichas + (:agora - atualizado_em) * :por_segundo) >= 1),
+        aceito = MIN(:capacidade, fichas + (:agora - atualizado_em) * :por_segundo) >= 1,
+        atualizado_em = :agora
+    RETURNING fichas, aceito
+"""
+
+
+class LimitadorLogin:
+    """
+    Token bucket das tentativas de login, com estado em SQLite
+
+    Se o arquivo não puder ser usado, as tentativas são aceitas (o limite
+    protege a CPU, não substitui a senha) e a falha é contada em 'erros'.
+    """
+
+    # Segundos entre as limpezas dos baldes que já se recompuseram por completo
+    INTERVALO_LIMPEZA = 60
+
+    def __init__(self, arquivo, ip_capacidade=30, ip_por_minuto=60,
+                 email_capacidade=5, email_por_minuto=6):
+        self.arquivo = arquivo
+        self.limites = {
+            'ip': (ip_capacidade, ip_por_minuto / 60.0),
+            'email': (email_capacidade, email_por_minuto / 60.0),
+        }
+        self._local = threading.local()
+        self._proxima_limpeza = 0.0
+        self._aceitos = 0
+
+    def _conexao(self):
+        # Uma conexão por thread (sqlite3 não compartilha conexões entre threads)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.arquivo, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Estado descartável: não precisa sobreviver a uma queda da máquina
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS balde (
+                    chave TEXT PRIMARY KEY,
+                    fichas REAL NOT NULL,
+                    atualizado_em REAL NOT NULL,
+                    aceito INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS contador (
+                    nome TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def _consome(self, conn, tipo, valor, agora):
+        """Retorna 0 se a tentativa foi aceita, ou os segundos até a próxima ficha"""
+        capacidade, por_segundo = self.limites[tipo]
+        if capacidade <= 0 or por_segundo <= 0 or not valor:
+            return 0
+        fichas, aceito = conn.execute(SQL_CONSOME_FICHA, {
+            'chave': f"{tipo}:{valor}",
+            'capacidade': capacidade,
+            'por_segundo': por_segundo,
+            'agora': agora,
+        }).fetchone()
+        if aceito:
+            return 0
+        return max((1 - fichas) / por_segundo, 0.001)
+
+    def _conta(self, conn, nome):
+        conn.execute(
+            "INSERT INTO contador (nome, total) VALUES (?, 1) "
+            "ON CONFLICT (nome) DO UPDATE SET total = total + 1",
+            (nome,)
+        )
+
+    def verifica(self, ip, email):
+        """
+        Gasta uma ficha do IP e uma do email
+
+        Args:
+            ip: Endereço do cliente
+            email: Email digitado no formulário
+
+        Returns:
+            0 se o login pode prosseguir, ou os segundos que o cliente deve esperar
+        """
+        email = (email or '').strip().lower()
+        agora = time.time()
+        try:
+            conn = self._conexao()
+            espera = self._consome(conn, 'ip', ip, agora)
+            if espera:
+                self._conta(conn, 'recusados_ip')
+                return espera
+            espera = self._consome(conn, 'email', email, agora)
+            if espera:
+                self._conta(conn, 'recusados_email')
+                return espera
+            self._aceitos += 1
+            self._limpa(conn, agora)
+            return 0
+        except sqlite3.Error as erro:
+            print(f"Erro no limite de login (tentativa aceita): {erro}")
+            try:
+                self._conta(self._conexao(), 'erros')
+            except sqlite3.Error:
+                pass
+            return 0
+
+    def _limpa(self, conn, agora):
+        if agora < self._proxima_limpeza:
+            return
+        self._proxima_limpeza = agora + self.INTERVALO_LIMPEZA
+        # Um balde parado tempo suficiente para encher equivale a não ter balde
+        for tipo, (capacidade, por_segundo) in self.limites.items():
+            if capacidade > 0 and por_segundo > 0:
+                conn.execute(
+                    "DELETE FROM balde WHERE chave LIKE ? AND atualizado_em < ?",
+                    (f"{tipo}:%", agora - capacidade / por_segundo)
+                )
+
+    def estatisticas(self):
+        """Recusas somadas de todos os workers, e tentativas aceitas por este processo"""
+        estatisticas = {
+            'recusados_ip': 0,
+            'recusados_email': 0,
+            'erros': 0,
+            'aceitos_neste_processo': self._aceitos,
+            'baldes': 0,
+            'limites': {
+                tipo: {'capacidade': capacidade, 'por_minuto': por_segundo * 60}
+                for tipo, (capacidade, por_segundo) in self.limites.items()
+            },
+        }
+        try:
+            conn = self._conexao()
+            for nome, total in conn.execute("SELECT nome, total FROM contador"):
+                estatisticas[nome] = total
+            estatisticas['baldes'] = conn.execute("SELECT COUNT(*) FROM balde").fetchone()[0]
+        except sqlite3.Error as erro:
+            estatisticas['erro'] = str(erro)
+        return estatisticas
+
+
+# Instância global usada pelo controller de usuários
+limitador_login = LimitadorLogin(
+    LIMITE_LOGIN_CONFIG['arquivo'],
+    LIMITE_LOGIN_CONFIG['ip_capacidade'],
+    LIMITE_LOGIN_CONFIG['ip_por_minuto'],
+    LIMITE_LOGIN_CONFIG['email_capacidade'],
+    LIMITE_LOGIN_CONFIG['email_por_minuto'],
+)
@@ -0,0 +1,68 @@
+"""
+Reincidência de risco após manutenção (Consulta 5 de db/scripts/consultas.sql)
+
+Uma manutenção é reincidente quando a mesma árvore recebe, depois da data da
+vistoria que originou o serviço e em até `janela` dias, uma vistoria com
+risco em `riscos`.
+
+Em vez de juntar cada manutenção com todas as vistorias da árvore, as
+vistorias são percorridas uma única vez, ordenadas por árvore e data
+(varredura): as manutenções de cada árvore ficam em uma fila por data, e
+cada vistoria nova primeiro descarta as que já saíram da janela e, se o
+risco for preocupante, marca como reincidentes as que ainda estão nela.
+Cada manutenção entra e sai da fila uma vez, então a varredura é linear;
+a memória guarda só a fila da árvore atual e os totais por empresa.
+"""
+from collections import deque
+
+
+def calcula_reincidencia(vistorias, janela, riscos):
+    """
+    Totais de reincidência por empresa
+
+    Args:
+        vistorias: Iterável de (chave_arvore, data, risco, empresas), ordenado por
+                   chave_arvore e data; empresas é a lista de CNPJs das manutenções
+                   originadas na vistoria (vazia se não houve manutenção)
+        janela: Dias após a vistoria de origem em que uma nova vistoria conta
+        riscos: Riscos que caracterizam a reincidência
+
+    Returns:
+        Dicionário cnpj -> {'manutencoes', 'reincidentes', 'dias_ate_reincidencia'}
+        (dias_ate_reincidencia é a soma, para calcular a média)
+    """
+    riscos = set(riscos)
+    totais = {}
+    # Manutenções da árvore atual ainda dentro da janela: (data de origem, cnpj)
+    abertas = deque()
+    arvore_atual = None
+
+    def total(cnpj):
+        if cnpj not in totais:
+            totais[cnpj] = {'manutencoes': 0, 'reincidentes': 0, 'dias_ate_reincidencia': 0}
+        return totais[cnpj]
+
+    for chave, data, risco, empresas in vistorias:
+        if chave != arvore_atual:
+            # Outra árvore: o que ficou na fila não teve reincidência
+            abertas.clear()
+            arvore_atual = chave
+
+        # Saíram da janela sem reincidência (a fila está em ordem de data)
+        while abertas and (data - abertas[0][0]).days > janela:
+            abertas.popleft()
+
+        if risco in riscos:
+            # Reincidência para todas as manutenções anteriores a esta data;
+            # as do mesmo dia estão no fim da fila e continuam esperando
+            while abertas and abertas[0][0] < data:
+                origem, cnpj = abertas.popleft()
+                registro = total(cnpj)
+                registro['reincidentes'] += 1
+                registro['dias_ate_reincidencia'] += (data - origem).days
+
+        for cnpj in empresas or ():
+            total(cnpj)['manutencoes'] += 1
+            abertas.append((data, cnpj))
+
+    return totais
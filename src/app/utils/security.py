@@ -1,28 +1,272 @@
 """
 Módulo de segurança para autenticação
-- Hash de senhas usando bcrypt
+- Hash de senhas usando bcrypt, calculado em processos separados
 - Geração e validação de tokens seguros
 """
 import bcrypt
 import secrets
 import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
+# Configuração do bcrypt
+BCRYPT_CONFIG = {
+    # Custo (log2 das rodadas) dos hashes novos. Hashes com outro custo são
+    # refeitos no próximo login bem-sucedido
+    'custo': int(os.getenv('BCRYPT_CUSTO', '12')),
+    # Processos que calculam os hashes (0 = calcula na própria thread da requisição)
+    'processos': int(os.getenv('BCRYPT_PROCESSOS', str(os.cpu_count() or 1))),
+    # Pedidos aguardando um processo livre além dos que já estão calculando;
+    # acima disso o login é recusado na hora em vez de acumular fila
+    'fila_maxima': int(os.getenv('BCRYPT_FILA_MAXIMA', '32')),
+    # Segundos que a requisição espera pelo resultado do hash
+    'tempo_espera': float(os.getenv('BCRYPT_TEMPO_ESPERA', '10')),
+}
+
+# Tokens de autenticação
+TOKENS_CONFIG = {
+    # Tokens já verificados guardados em memória (0 = sem cache)
+    'cache_max': int(os.getenv('TOKENS_CACHE_MAX', '10000')),
+    # Segundos entre as buscas dos tokens revogados por outros workers
+    'intervalo_sincronizacao': float(os.getenv('TOKENS_INTERVALO_SINCRONIZACAO', '2')),
+}
+
+
+class HashSobrecarregado(Exception):
+    """A fila de cálculo de hash está cheia ou não respondeu a tempo (muitos logins ao mesmo tempo)"""
+
+
+def _calcula_hash(senha, custo):
+    return bcrypt.hashpw(senha, bcrypt.gensalt(rounds=custo))
+
+
+def _confere_hash(senha, senha_hash):
+    return bcrypt.checkpw(senha, senha_hash)
+
+
+class PoolHash:
+    """
+    Executa as funções do bcrypt em um pool limitado de processos
+
+    O bcrypt ocupa a CPU por centenas de milissegundos: fora do processo
+    do servidor, as threads das requisições ficam livres enquanto isso.
+    Com todos os processos ocupados e a fila cheia, executa() levanta
+    HashSobrecarregado em vez de deixar os pedidos se acumularem. A vaga de
+    cada pedido só é liberada quando o cálculo termina (ou é cancelado ainda
+    na fila), mesmo que a requisição tenha desistido de esperar antes.
+    """
+
+    def __init__(self, processos, fila_maxima, tempo_espera=10):
+        self.processos = processos
+        self.tempo_espera = tempo_espera
+        self._vagas = threading.BoundedSemaphore(max(processos, 1) + max(fila_maxima, 0))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.recusados = 0
+
+    def _obtem_executor(self):
+        # Criado no primeiro uso; "spawn" porque o servidor já tem threads
+        # rodando e um fork copiaria locks em estado inconsistente
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def aquece(self):
+        """Inicia os processos sem esperar (evita o custo de criá-los no primeiro login)"""
+        if self.processos <= 0:
+            return
+        executor = self._obtem_executor()
+        for _ in range(self.processos):
+            executor.submit(_confere_hash, b'', bcrypt.hashpw(b'', bcrypt.gensalt(rounds=4)))
+
+    def executa(self, funcao, *args):
+        if self.processos <= 0:
+            return funcao(*args)
+        if not self._vagas.acquire(blocking=False):
+            self.recusados += 1
+            raise HashSobrecarregado("Fila de cálculo de hash cheia")
+        try:
+            futuro = self._obtem_executor().submit(funcao, *args)
+        except BaseException as erro:
+            self._vagas.release()
+            if isinstance(erro, BrokenProcessPool):
+                self.encerra()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+
+        try:
+            return futuro.result(timeout=self.tempo_espera)
+        except TempoEsgotado:
+            # Ainda na fila: sai dela; já calculando: a vaga volta quando terminar
+            futuro.cancel()
+            self.recusados += 1
+            raise HashSobrecarregado("Cálculo de hash não terminou a tempo")
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória): o próximo pedido cria outro pool
+            self.encerra()
+            raise
+
+    def encerra(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Pool único do processo, compartilhado por todas as instâncias do SecurityManager
+pool_hash = PoolHash(
+    BCRYPT_CONFIG['processos'],
+    BCRYPT_CONFIG['fila_maxima'],
+    BCRYPT_CONFIG['tempo_espera']
+)
+
+
+def hash_token(token):
+    """SHA-256 do token: é o que fica guardado na lista de revogados"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class CacheTokens:
+    """
+    Cache LRU dos tokens já verificados
+
+    Cada token fica guardado só até a própria expiração, então um acerto
+    no cache nunca aceita um token vencido.
+    """
+
+    def __init__(self, max_itens=10000):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtem(self, token):
+        """Retorna (payload, hash do token) ou None"""
+        with self._lock:
+            item = self._itens.get(token)
+            if item is None:
+                return None
+            expira_em, payload, token_hash = item
+            if time.time() >= expira_em:
+                del self._itens[token]
+                return None
+            self._itens.move_to_end(token)
+            return payload, token_hash
+
+    def guarda(self, token, payload, token_hash, expira_em):
+        if self.max_itens <= 0:
+            return
+        with self._lock:
+            self._itens[token] = (expira_em, payload, token_hash)
+            self._itens.move_to_end(token)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def remove(self, token):
+        with self._lock:
+            self._itens.pop(token, None)
+
+
+class ListaRevogacao:
+    """
+    Hashes dos tokens revogados no logout, em memória
+
+    Com um DAO (Tokens_dao), as revogações são gravadas no banco e as feitas
+    por outros workers são buscadas a cada intervalo_sincronizacao segundos
+    por uma thread em segundo plano: revogado() só consulta o dicionário,
+    sem ida ao banco na requisição (nem no event loop do servidor assíncrono).
+    Sem DAO, vale só para o processo atual.
+    """
+
+    # Segundos relidos a cada sincronização, para não perder revogações
+    # de transações que terminaram depois da leitura anterior
+    MARGEM_SINCRONIZACAO = 30
+
+    def __init__(self, dao=None, intervalo_sincronizacao=2):
+        self._dao = dao
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        self._revogados = {}                 # hash do token -> expiração (epoch)
+        self._lock = threading.Lock()
+        self._lido_em = None
+        self._thread = None
+
+    def revogado(self, token_hash):
+        if self._thread is None and self._dao is not None:
+            # Processo iniciado sem chamar inicia() (ex.: outro servidor WSGI)
+            self.inicia()
+        expira_em = self._revogados.get(token_hash)
+        return expira_em is not None and time.time() < expira_em
+
+    def revoga(self, token_hash, expira_em):
+        """Revoga na hora neste processo e grava para os demais"""
+        with self._lock:
+            self._revogados[token_hash] = expira_em
+        if self._dao:
+            return self._dao.insere_revogado(token_hash, expira_em)
+        return None
+
+    def inicia(self):
+        """Sobe a thread de sincronização (uma por processo; não faz nada sem DAO)"""
+        with self._lock:
+            if self._dao is None or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executa, name='sincronizacao-revogados', daemon=True)
+            self._thread.start()
+
+    def _executa(self):
+        while True:
+            try:
+                self.sincroniza()
+            except Exception as erro:
+                print(f"Erro ao sincronizar tokens revogados: {erro}")
+            time.sleep(self.intervalo_sincronizacao)
+
+    def sincroniza(self):
+        """Busca no banco as revogações feitas por outros workers"""
+        if self._dao is None:
+            return
+        desde = self._lido_em - self.MARGEM_SINCRONIZACAO if self._lido_em else None
+        erro, linhas, lido_em = self._dao.select_revogados(desde)
+        if erro:
+            return
+        agora = time.time()
+        with self._lock:
+            for linha in linhas:
+                self._revogados[linha['token_hash']] = linha['expira_em']
+            # Tokens vencidos já são recusados pela assinatura: não precisam ficar aqui
+            for token_hash in [h for h, expira_em in self._revogados.items() if expira_em <= agora]:
+                del self._revogados[token_hash]
+        self._lido_em = lido_em
+
 
 class SecurityManager:
     """Gerenciador de segurança para autenticação"""
     
-    def __init__(self, secret_key):
+    def __init__(self, secret_key, revogacao=None):
         """
         Inicializa o gerenciador de segurança
         
         Args:
             secret_key: Chave secreta para assinatura de tokens
+            revogacao: ListaRevogacao dos tokens encerrados no logout
+                (padrão: lista só deste processo)
         """
         self.secret_key = secret_key
         self.serializer = URLSafeTimedSerializer(secret_key)
         self.token_expiration_hours = 24  # Tokens expiram em 24 horas
+        self.custo_bcrypt = BCRYPT_CONFIG['custo']
+        self.cache_tokens = CacheTokens(TOKENS_CONFIG['cache_max'])
+        self.revogacao = revogacao or ListaRevogacao()
     
     def hash_password(self, password: str) -> str:
         """
@@ -33,10 +277,12 @@ class SecurityManager:
             
         Returns:
             String com o hash da senha
+
+        Raises:
+            HashSobrecarregado: se a fila do pool de hash estiver cheia
         """
-        # Gera salt e hash
-        salt = bcrypt.gensalt(rounds=12)
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+        # Gera salt e hash em um processo do pool
+        hashed = pool_hash.executa(_calcula_hash, password.encode('utf-8'), self.custo_bcrypt)
         return hashed.decode('utf-8')
     
     def verify_password(self, password: str, hashed_password: str) -> bool:
@@ -49,15 +295,37 @@ class SecurityManager:
             
         Returns:
             True se a senha corresponde, False caso contrário
+
+        Raises:
+            HashSobrecarregado: se a fila do pool de hash estiver cheia ou o
+                cálculo não terminar dentro do tempo de espera
         """
         try:
-            return bcrypt.checkpw(
+            return pool_hash.executa(
+                _confere_hash,
                 password.encode('utf-8'),
                 hashed_password.encode('utf-8')
             )
+        except HashSobrecarregado:
+            raise
         except Exception as e:
             print(f"Erro ao verificar senha: {e}")
             return False
+
+    def precisa_rehash(self, hashed_password: str) -> bool:
+        """
+        Verifica se o hash foi gerado com um custo diferente do configurado
+
+        Args:
+            hashed_password: Hash armazenado no banco ($2b$<custo>$...)
+
+        Returns:
+            True se o hash deve ser refeito com o custo atual
+        """
+        try:
+            return int(hashed_password.split('$')[2]) != self.custo_bcrypt
+        except (AttributeError, IndexError, ValueError):
+            return False
     
     def generate_token(self, user_email: str) -> str:
         """
@@ -92,13 +360,32 @@ class SecurityManager:
         Returns:
             Dicionário com dados do token se válido, None se inválido
         """
+        if not token:
+            return None
+
+        # Token já verificado: basta conferir se não foi revogado
+        guardado = self.cache_tokens.obtem(token)
+        if guardado is not None:
+            payload, token_hash = guardado
+            if self.revogacao.revogado(token_hash):
+                self.cache_tokens.remove(token)
+                return None
+            return payload
+
         try:
             # Tenta decodificar o token (com expiração)
-            payload = self.serializer.loads(
+            max_age = self.token_expiration_hours * 3600  # Converter horas para segundos
+            payload, assinado_em = self.serializer.loads(
                 token,
                 salt='auth-token',
-                max_age=self.token_expiration_hours * 3600  # Converter horas para segundos
+                max_age=max_age,
+                return_timestamp=True
             )
+            token_hash = hash_token(token)
+            if self.revogacao.revogado(token_hash):
+                print("Token revogado")
+                return None
+            self.cache_tokens.guarda(token, payload, token_hash, assinado_em.timestamp() + max_age)
             return payload
         except SignatureExpired:
             print("Token expirado")
@@ -110,6 +397,26 @@ class SecurityManager:
             print(f"Erro ao verificar token: {e}")
             return None
     
+    def revoke_token(self, token: str) -> None:
+        """
+        Revoga o token (logout): deixa de valer antes de expirar
+
+        Args:
+            token: Token do cookie auth_token
+        """
+        if not token:
+            return
+        try:
+            _, assinado_em = self.serializer.loads(token, salt='auth-token', return_timestamp=True)
+        except Exception:
+            # Assinatura inválida: o token já não é aceito
+            return
+        expira_em = assinado_em.timestamp() + self.token_expiration_hours * 3600
+        self.cache_tokens.remove(token)
+        erro = self.revogacao.revoga(hash_token(token), expira_em)
+        if erro:
+            print(f"Erro ao revogar token: {erro}")
+    
     def generate_csrf_token(self) -> str:
         """
         Gera token CSRF para proteção contra ataques
@@ -0,0 +1,145 @@
+"""
+Utilitários dos tiles do mapa de árvores
+- Conversão entre tiles (z/x/y, padrão Web Mercator) e coordenadas
+- Cache em memória dos tiles já calculados, invalidado pela área alterada:
+  pelo DAO, no cadastro feito neste processo, e pelo aviso de alteração de
+  arvore do banco (versoes.py), nas escritas de outros workers, da carga de
+  censo e de SQL manual
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from src.app.utils.versoes import versoes_tabelas
+
+# A partir deste zoom o tile devolve as árvores individuais em vez de agrupamentos
+ZOOM_ARVORES_INDIVIDUAIS = int(os.getenv('TILES_ZOOM_ARVORES', '17'))
+# Cada tile agrupado é dividido em DIVISOES x DIVISOES células
+DIVISOES = int(os.getenv('TILES_DIVISOES', '8'))
+ZOOM_MAXIMO = 22
+
+
+def tile_valido(z, x, y):
+    """Verifica se z/x/y representa um tile existente"""
+    if z < 0 or z > ZOOM_MAXIMO:
+        return False
+    n = 2 ** z
+    return 0 <= x < n and 0 <= y < n
+
+
+def limites_tile(z, x, y):
+    """
+    Calcula os limites geográficos de um tile
+
+    Returns:
+        Tupla (min_lat, min_lng, max_lat, max_lng)
+    """
+    n = 2 ** z
+    min_lng = x / n * 360.0 - 180.0
+    max_lng = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def tile_do_ponto(lat, lng, z):
+    """Retorna (x, y) do tile de zoom z que contém o ponto"""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class CacheTiles:
+    """Cache LRU dos tiles calculados, com validade máxima (TTL)"""
+
+    def __init__(self, max_itens=5000, ttl_segundos=600, versoes=None):
+        """
+        Args:
+            max_itens: Quantidade máxima de tiles guardados
+            ttl_segundos: Tempo máximo de vida de um tile
+            versoes: VersoesTabelas do processo; sem a versão de arvore (LISTEN
+                desconectado), nenhum tile é reaproveitado
+        """
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._versoes = versoes
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        # Aumenta a cada invalidação: um tile calculado enquanto isso não é guardado
+        self.geracao = 0
+
+    def _sem_avisos(self):
+        return self._versoes is not None and self._versoes.le('arvore') is None
+
+    def obtem(self, z, x, y):
+        """Retorna o tile guardado ou None"""
+        if self._sem_avisos():
+            return None
+        with self._lock:
+            item = self._itens.get((z, x, y))
+            if item is None:
+                return None
+            guardado_em, dados = item
+            if time.monotonic() - guardado_em > self.ttl_segundos:
+                del self._itens[(z, x, y)]
+                return None
+            self._itens.move_to_end((z, x, y))
+            return dados
+
+    def guarda(self, z, x, y, dados, geracao=None):
+        """
+        Args:
+            geracao: Valor de self.geracao lido antes de calcular o tile; se houve
+                invalidação desde então, o tile pode já estar velho e não é guardado
+        """
+        if self._sem_avisos():
+            return
+        with self._lock:
+            if geracao is not None and geracao != self.geracao:
+                return
+            self._itens[(z, x, y)] = (time.monotonic(), dados)
+            self._itens.move_to_end((z, x, y))
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalida_ponto(self, lat, lng):
+        """Remove, em todos os zooms, apenas os tiles que contêm o ponto"""
+        with self._lock:
+            self.geracao += 1
+            for z in range(ZOOM_MAXIMO + 1):
+                x, y = tile_do_ponto(lat, lng, z)
+                self._itens.pop((z, x, y), None)
+
+    def invalida_area(self, min_lat, min_lng, max_lat, max_lng):
+        """Remove os tiles guardados que se sobrepõem à área (inclusive as bordas)"""
+        with self._lock:
+            self.geracao += 1
+            for chave in list(self._itens):
+                t_min_lat, t_min_lng, t_max_lat, t_max_lng = limites_tile(*chave)
+                if (t_min_lat <= max_lat and min_lat <= t_max_lat
+                        and t_min_lng <= max_lng and min_lng <= t_max_lng):
+                    del self._itens[chave]
+
+    def alterada(self, area):
+        """Trata o aviso de alteração de arvore (área None = desconhecida, limpa tudo)"""
+        if area is None:
+            self.limpa()
+        else:
+            self.invalida_area(*area)
+
+    def limpa(self):
+        with self._lock:
+            self.geracao += 1
+            self._itens.clear()
+
+
+# Instância global usada pelo controller (leitura) e pelo DAO (invalidação)
+cache_tiles = CacheTiles(
+    max_itens=int(os.getenv('TILES_CACHE_MAX', '5000')),
+    ttl_segundos=int(os.getenv('TILES_CACHE_TTL', '600')),
+    versoes=versoes_tabelas,
+)
+versoes_tabelas.ao_alterar('arvore', cache_tiles.alterada)
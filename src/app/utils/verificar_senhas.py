@@ -1,74 +1,213 @@
 """
-Script de verificação de senhas no banco de dados
-Verifica se todas as senhas estão com hash bcrypt (não em texto plano)
+Script de auditoria das senhas no banco de dados
+Verifica se todas as senhas estão com hash bcrypt (não em texto plano),
+se os hashes usam o custo configurado (BCRYPT_CUSTO) e, opcionalmente,
+se alguma senha é uma das senhas fracas de uma lista.
+
+Os usuários são lidos aos poucos por um cursor no servidor, então a memória
+não cresce com o tamanho da tabela. Os problemas vão para um relatório CSV.
+
+Uso:
+    python src/app/utils/verificar_senhas.py
+    python src/app/utils/verificar_senhas.py --relatorio auditoria.csv --fracas
+    python src/app/utils/verificar_senhas.py --fracas minha_lista.txt --processos 8
 """
 import sys
 import os
+import csv
+import re
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Adiciona o diretório raiz ao path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
+import bcrypt
 from src.config.database import connection_pool
+from src.app.utils.security import BCRYPT_CONFIG
+
+PREFIXOS_BCRYPT = ('$2a$', '$2b$', '$2y$')
+
+# Hash bcrypt completo: versão, custo com dois dígitos e 53 caracteres de sal + hash.
+# Um hash truncado faz bcrypt.checkpw abortar (PanicException, que não é Exception)
+FORMATO_BCRYPT = re.compile(r'^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$')
+
+# Senhas fracas testadas com --fracas (sem arquivo): as mais comuns que
+# passam na regra de tamanho mínimo
+SENHAS_FRACAS_PADRAO = [
+    '123456789', '1234567890', '12345678910', 'senha1234', 'senha12345',
+    'password1', 'qwerty123', '111111111', '000000000', 'greencheck',
+]
+
+# Usuários buscados no servidor a cada ida ao banco
+TAMANHO_LOTE = 2000
+
+
+def _testa_fracas(args):
+    """Executado nos processos do pool: retorna a senha fraca que corresponde ao hash, ou None"""
+    senha_hash, fracas = args
+    if not FORMATO_BCRYPT.match(senha_hash):
+        return None
+    hash_bytes = senha_hash.encode('utf-8')
+    for senha in fracas:
+        if bcrypt.checkpw(senha.encode('utf-8'), hash_bytes):
+            return senha
+    return None
+
 
-def verificar_senhas():
+def classifica_senha(senha_atual, custo_atual):
     """
-    Verifica se todas as senhas no banco de dados estão com hash bcrypt
+    Classifica a senha guardada
+
+    Returns:
+        Tupla (problema, custo): problema é None, 'sem_hash', 'hash_invalido'
+        ou 'custo_desatualizado'; custo só vem preenchido para hashes válidos
+    """
+    if not senha_atual or not senha_atual.startswith(PREFIXOS_BCRYPT):
+        return 'sem_hash', None
+    if not FORMATO_BCRYPT.match(senha_atual):
+        # Começa como bcrypt mas está incompleto ou corrompido: nenhum login passa
+        return 'hash_invalido', None
+    custo = int(senha_atual.split('$')[2])
+    if custo != custo_atual:
+        return 'custo_desatualizado', custo
+    return None, custo
+
+
+def verificar_senhas(caminho_relatorio='auditoria_senhas.csv', fracas=None, processos=1):
+    """
+    Audita as senhas de todos os usuários
+
+    Args:
+        caminho_relatorio: CSV com um problema por linha (email, problema, detalhe)
+        fracas: Lista de senhas fracas a testar contra cada hash (None = não testa)
+        processos: Processos usados no teste das senhas fracas
+
+    Returns:
+        True se nenhuma senha tem problema, False caso contrário
     """
     conn = None
-    
+    inicio = time.time()
+    custo_atual = BCRYPT_CONFIG['custo']
+    contagem = {'total': 0, 'ok': 0, 'sem_hash': 0, 'hash_invalido': 0, 'custo_desatualizado': 0, 'fraca': 0}
+    custos = {}
+    executor = ProcessPoolExecutor(max_workers=processos) if fracas and processos > 1 else None
+
     try:
         conn = connection_pool.getconn()
-        cursor = conn.cursor()
-        
-        # Busca todos os usuários
-        cursor.execute("SELECT cpf, email, senha FROM usuario")
-        usuarios = cursor.fetchall()
-        
-        print(f"Verificando {len(usuarios)} usuários...")
-        print()
-        
-        senhas_ok = 0
-        senhas_problema = []
-        
-        for cpf, email, senha_atual in usuarios:
-            # Verifica se a senha está em hash (bcrypt começa com $2b$ ou $2a$)
-            if senha_atual.startswith('$2b$') or senha_atual.startswith('$2a$'):
-                senhas_ok += 1
-                print(f"✓ Usuário {email}: senha com hash válido")
-            else:
-                senhas_problema.append((email, senha_atual))
-                print(f"✗ Usuário {email}: senha NÃO está com hash (possível texto plano)")
-        
+        # Cursor no servidor: busca TAMANHO_LOTE usuários por vez em vez de todos
+        cursor = conn.cursor(name='auditoria_senhas')
+        cursor.itersize = TAMANHO_LOTE
+        cursor.execute("SELECT email, senha FROM usuario ORDER BY email")
+
+        with open(caminho_relatorio, 'w', encoding='utf-8', newline='') as arquivo:
+            relatorio = csv.writer(arquivo)
+            relatorio.writerow(['email', 'problema', 'detalhe'])
+
+            while True:
+                lote = cursor.fetchmany(TAMANHO_LOTE)
+                if not lote:
+                    break
+
+                com_hash = []
+                com_problema = set()
+                for email, senha_atual in lote:
+                    contagem['total'] += 1
+                    problema, custo = classifica_senha(senha_atual, custo_atual)
+                    if custo is not None:
+                        custos[custo] = custos.get(custo, 0) + 1
+                        com_hash.append((email, senha_atual))
+                    if problema:
+                        com_problema.add(email)
+                    if problema == 'sem_hash':
+                        contagem['sem_hash'] += 1
+                        relatorio.writerow([email, 'sem_hash', 'senha possivelmente em texto plano'])
+                    elif problema == 'hash_invalido':
+                        contagem['hash_invalido'] += 1
+                        relatorio.writerow([email, 'hash_invalido', 'hash bcrypt incompleto ou corrompido'])
+                    elif problema == 'custo_desatualizado':
+                        contagem['custo_desatualizado'] += 1
+                        relatorio.writerow([email, 'custo_desatualizado', f'custo {custo}, configurado {custo_atual}'])
+
+                if fracas and com_hash:
+                    tarefas = [(senha_hash, fracas) for _, senha_hash in com_hash]
+                    if executor:
+                        resultados = executor.map(_testa_fracas, tarefas, chunksize=max(1, len(tarefas) // (processos * 4)))
+                    else:
+                        resultados = map(_testa_fracas, tarefas)
+                    for (email, _), senha_fraca in zip(com_hash, resultados):
+                        if senha_fraca is not None:
+                            com_problema.add(email)
+                            contagem['fraca'] += 1
+                            relatorio.writerow([email, 'fraca', 'senha está na lista de senhas fracas'])
+
+                contagem['ok'] += len(lote) - len(com_problema)
+                print(f"{contagem['total']} usuários verificados ({time.time() - inicio:.1f}s)")
+
         cursor.close()
-        
-        print()
-        print("=" * 60)
-        print(f"Total de usuários verificados: {len(usuarios)}")
-        print(f"Senhas com hash válido: {senhas_ok}")
-        print(f"Senhas com problema: {len(senhas_problema)}")
-        print("=" * 60)
-        
-        if senhas_problema:
-            print("\n⚠️  ATENÇÃO: Encontradas senhas que não estão com hash!")
-            print("Todas as senhas devem estar com hash bcrypt.")
-            print("\nPara corrigir, use o script generate_password_hash.py para gerar")
-            print("os hashes e atualize manualmente no banco de dados.")
-            return False
-        else:
-            print("\n✅ Todas as senhas estão com hash válido!")
-            return True
-        
+        conn.commit()
     except Exception as erro:
         print(f"Erro na verificação: {erro}")
         raise
     finally:
+        if executor:
+            executor.shutdown()
         if conn:
             connection_pool.putconn(conn)
 
-if __name__ == '__main__':
+    print()
     print("=" * 60)
-    print("VERIFICAÇÃO DE SENHAS NO BANCO DE DADOS")
+    print(f"Total de usuários verificados: {contagem['total']}")
+    print(f"Senhas sem problema: {contagem['ok']}")
+    print(f"Senhas sem hash (possível texto plano): {contagem['sem_hash']}")
+    print(f"Hashes bcrypt inválidos (incompletos ou corrompidos): {contagem['hash_invalido']}")
+    print(f"Hashes com custo diferente de {custo_atual}: {contagem['custo_desatualizado']}")
+    if fracas:
+        print(f"Senhas fracas ({len(fracas)} testadas): {contagem['fraca']}")
+    print(f"Usuários por custo do bcrypt: {dict(sorted(custos.items()))}")
+    print(f"Relatório: {caminho_relatorio}")
+    print(f"Tempo total: {time.time() - inicio:.1f}s")
+    print("=" * 60)
+
+    if contagem['sem_hash'] or contagem['hash_invalido'] or contagem['fraca']:
+        print("\n⚠️  ATENÇÃO: Encontradas senhas sem hash, com hash inválido ou fracas!")
+        print("Todas as senhas devem estar com hash bcrypt e fora da lista de senhas fracas.")
+        print("\nPara corrigir, use o script generate_password_hash.py para gerar")
+        print("os hashes e atualize manualmente no banco de dados.")
+        return False
+    if contagem['custo_desatualizado']:
+        print("\nHashes com custo desatualizado são refeitos no próximo login de cada usuário.")
+        return False
+    print("\n✅ Todas as senhas estão com hash válido!")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoria das senhas dos usuários")
+    parser.add_argument('--relatorio', default='auditoria_senhas.csv',
+                        help="CSV de saída com os problemas encontrados (padrão: auditoria_senhas.csv)")
+    parser.add_argument('--fracas', nargs='?', const='', default=None,
+                        help="Testa cada hash contra senhas fracas: sem valor usa a lista padrão, "
+                             "ou informe um arquivo com uma senha por linha")
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                        help="Processos usados no teste das senhas fracas (padrão: número de CPUs)")
+    args = parser.parse_args()
+
+    fracas = None
+    if args.fracas == '':
+        fracas = SENHAS_FRACAS_PADRAO
+    elif args.fracas:
+        with open(args.fracas, 'r', encoding='utf-8') as arquivo:
+            fracas = [linha.strip() for linha in arquivo if linha.strip()]
+
+    print("=" * 60)
+    print("AUDITORIA DE SENHAS NO BANCO DE DADOS")
     print("=" * 60)
     print()
-    verificar_senhas()
+    sucesso = verificar_senhas(args.relatorio, fracas, args.processos)
+    sys.exit(0 if sucesso else 1)
 
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Versões das tabelas para validação de cache HTTP (ETag / Last-Modified),
+o cache de resultados, os tiles do mapa e o índice de espécies
+
+Os triggers de db/init/12_versao_tabela.sql avisam cada comando que altera
+arvore ou especie com NOTIFY no canal versao_tabela, entregue só no COMMIT.
+Uma thread por processo fica em LISTEN numa conexão própria com o primário e
+guarda a versão de cada tabela em memória: conferir a versão não usa o pool
+nem consulta o banco. Escritas de outros workers, da carga de censo e de SQL
+manual chegam pelo mesmo aviso, em milissegundos.
+
+Enquanto a thread não está conectada (subida do servidor, banco fora do ar),
+le() retorna None e ninguém reaproveita conteúdo guardado.
+"""
+import hashlib
+import os
+import select
+import threading
+import time
+from datetime import datetime, timezone
+import psycopg2
+from src.config.database import DB_CONFIG
+
+# Canal do NOTIFY e sequência das versões (db/init/12_versao_tabela.sql)
+CANAL_VERSOES = 'versao_tabela'
+
+VERSOES_CONFIG = {
+    # Segundos sem aviso até conferir se a conexão do LISTEN continua viva
+    'intervalo_verificacao': float(os.getenv('VERSOES_INTERVALO_VERIFICACAO', '30')),
+    # Segundos entre as tentativas de reconectar o LISTEN
+    'espera_reconexao': float(os.getenv('VERSOES_ESPERA_RECONEXAO', '5')),
+    # Segundos sem cache depois de uma escrita deste processo, se o aviso não chegar antes
+    'espera_aviso': float(os.getenv('VERSOES_ESPERA_AVISO', '5')),
+}
+
+
+class VersoesTabelas:
+    """Versão e data da última alteração por tabela, mantidas pelo LISTEN"""
+
+    def __init__(self, parametros_conexao, tabelas=('arvore', 'especie'),
+                 intervalo_verificacao=30, espera_reconexao=5, espera_aviso=5):
+        # Sempre o primário: réplicas não repassam NOTIFY
+        self._parametros_conexao = parametros_conexao
+        self.tabelas = tabelas
+        self.intervalo_verificacao = intervalo_verificacao
+        self.espera_reconexao = espera_reconexao
+        self.espera_aviso = espera_aviso
+        self._versoes = {}      # tabela -> (versao, alterada_em, recebida_em monotônico)
+        self._pendentes = {}    # tabela -> momento (monotônico) até quando esperar o aviso
+        self._observadores = {}
+        self._conectado = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def inicia(self):
+        """Sobe a thread do LISTEN (uma por processo)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._executa, name='versoes-tabelas', daemon=True)
+            self._thread.start()
+
+    def ao_alterar(self, tabela, funcao):
+        """
+        Registra uma função chamada (na thread do LISTEN) a cada alteração da tabela
+
+        A função recebe a área alterada, (min_lat, min_lng, max_lat, max_lng),
+        ou None quando a área não é conhecida (TRUNCATE, outra tabela, ou
+        reconexão, em que avisos podem ter sido perdidos): trate como tudo.
+        """
+        with self._lock:
+            self._observadores.setdefault(tabela, []).append(funcao)
+
+    def marca_alteracao(self, tabela):
+        """
+        Chamado pelos DAOs depois do commit de uma escrita deste processo
+
+        Até o aviso do banco chegar, a tabela fica sem versão (le() retorna
+        None): a página carregada logo em seguida não recebe um 304 velho.
+        """
+        with self._lock:
+            self._pendentes[tabela] = time.monotonic() + self.espera_aviso
+
+    def le(self, *tabelas):
+        """
+        Versão atual das tabelas informadas, da memória
+
+        Returns:
+            Dicionário tabela -> (versao, alterada_em, segundos desde a alteração),
+            ou None se o LISTEN não está conectado ou uma escrita deste
+            processo ainda não foi avisada
+        """
+        if self._thread is None:
+            self.inicia()
+        agora = time.monotonic()
+        with self._lock:
+            if not self._conectado:
+                return None
+            estado = {}
+            for tabela in tabelas:
+                if self._pendentes.get(tabela, 0) > agora or tabela not in self._versoes:
+                    return None
+                versao, alterada_em, recebida_em = self._versoes[tabela]
+                estado[tabela] = (versao, alterada_em, agora - recebida_em)
+            return estado
+
+    def _executa(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**self._parametros_conexao)
+                conn.autocommit = True
+                cursor = conn.cursor()
+                # LISTEN antes de ler a sequência: nada confirmado depois da
+                # leitura fica sem aviso
+                cursor.execute(f"LISTEN {CANAL_VERSOES}")
+                cursor.execute("SELECT last_value FROM versao_tabela_seq")
+                inicial = cursor.fetchone()[0]
+                agora = time.monotonic()
+                with self._lock:
+                    # Prefixo diferente do dos avisos: a versão sempre muda quando o
+                    # primeiro aviso chega, mesmo que traga o mesmo número da sequência.
+                    # Sem data conhecida, é contada como recente (réplicas atrasadas)
+                    self._versoes = {tabela: (f"s{inicial}", None, agora) for tabela in self.tabelas}
+                    self._conectado = True
+                print(f"Versões das tabelas: LISTEN {CANAL_VERSOES} conectado")
+                # Avisos podem ter se perdido enquanto estava desconectado
+                for tabela in self.tabelas:
+                    self._avisa(tabela, None)
+
+                while True:
+                    if select.select([conn], [], [], self.intervalo_verificacao) == ([], [], []):
+                        # Sem avisos: confirma que a conexão continua viva
+                        cursor.execute("SELECT 1")
+                    else:
+                        conn.poll()
+                    while conn.notifies:
+                        self._recebe(conn.notifies.pop(0).payload)
+            except Exception as erro:
+                print(f"Erro no LISTEN das versões das tabelas: {erro}")
+            finally:
+                with self._lock:
+                    self._conectado = False
+                if conn is not None and not conn.closed:
+                    conn.close()
+            time.sleep(self.espera_reconexao)
+
+    def _recebe(self, aviso):
+        """Trata um aviso "tabela:versao[:min_lat,min_lng,max_lat,max_lng]" """
+        partes = aviso.split(':')
+        tabela, versao = partes[0], partes[1]
+        area = None
+        if len(partes) > 2 and partes[2]:
+            area = tuple(float(valor) for valor in partes[2].split(','))
+        with self._lock:
+            self._versoes[tabela] = (f"n{versao}", datetime.now(timezone.utc), time.monotonic())
+            self._pendentes.pop(tabela, None)
+        self._avisa(tabela, area)
+
+    def _avisa(self, tabela, area):
+        with self._lock:
+            observadores = list(self._observadores.get(tabela, ()))
+        for funcao in observadores:
+            try:
+                funcao(area)
+            except Exception as erro:
+                print(f"Erro ao tratar a alteração de {tabela}: {erro}")
+
+    @staticmethod
+    def alterada_recentemente(estado, segundos):
+        """Indica se alguma das tabelas lidas foi alterada nos últimos segundos"""
+        return any(desde < segundos for _, _, desde in estado.values())
+
+    @staticmethod
+    def modificado_em(estado):
+        """Data da alteração mais recente entre as tabelas lidas (None se nenhuma tem data)"""
+        datas = [alterada_em for _, alterada_em, _ in estado.values() if alterada_em is not None]
+        return max(datas).replace(microsecond=0) if datas else None
+
+    @staticmethod
+    def etag(estado, extra=''):
+        """
+        Gera a ETag do conteúdo que depende das tabelas lidas
+
+        Args:
+            estado: Resultado de le() com as tabelas lidas para montar o conteúdo
+            extra: Texto que diferencia respostas da mesma tabela (ex.: URL com filtros)
+        """
+        # Só a versão entra: a data é a do recebimento, que varia entre workers
+        partes = [extra] + [f"{tabela}={versao}" for tabela, (versao, _, _) in sorted(estado.items())]
+        return hashlib.sha1("|".join(partes).encode('utf-8')).hexdigest()
+
+
+# Instância global: rotas com cache HTTP, cache de resultados, tiles e índice de espécies
+versoes_tabelas = VersoesTabelas(
+    {chave: valor for chave, valor in DB_CONFIG.items() if chave != 'replicas'},
+    intervalo_verificacao=VERSOES_CONFIG['intervalo_verificacao'],
+    espera_reconexao=VERSOES_CONFIG['espera_reconexao'],
+    espera_aviso=VERSOES_CONFIG['espera_aviso'],
+)
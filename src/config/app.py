@@ -1,6 +1,7 @@
 import os
 from flask import Flask
 from flask_cors import CORS
+from src.config.seguranca import CHAVE_SECRETA
 
 # Obter o diretório base do projeto
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,7 +18,11 @@ aplicacao = Flask(
 CORS(aplicacao)
 
 # Configuração para processar dados de formulários
-aplicacao.config['SECRET_KEY'] = 'sua-chave-secreta-aqui'
+aplicacao.config['SECRET_KEY'] = CHAVE_SECRETA
+
+# Paginação das listagens de árvores (quantidade de linhas por página)
+aplicacao.config['TAMANHO_PAGINA'] = int(os.getenv('TAMANHO_PAGINA', '50'))
+aplicacao.config['TAMANHO_PAGINA_MAXIMO'] = int(os.getenv('TAMANHO_PAGINA_MAXIMO', '500'))
 
 # Importar rotas - precisa ser feito depois de criar a aplicação
 from src.app.rotas import rotas
@@ -0,0 +1,22 @@
+from aiohttp import web
+# A aplicação Flask vem primeiro: a API reaproveita a configuração dela
+# (tamanho de página) e os controllers importam as rotas
+from src.config.app import aplicacao
+from src.config.database_async import abre_pool_async, fecha_pool_async
+
+# Criando a aplicação assíncrona (aiohttp) da API JSON
+aplicacao_async = web.Application()
+
+# O pool assíncrono abre e fecha junto com o event loop do servidor
+aplicacao_async.on_startup.append(abre_pool_async)
+aplicacao_async.on_cleanup.append(fecha_pool_async)
+
+# Importar rotas - precisa ser feito depois de criar a aplicação
+from src.app.rotas.rotas_async import rotas_async
+rotas_async(aplicacao_async)
+
+# Lista de tokens revogados e versões das tabelas (índice de espécies)
+# acompanhadas em threads, nunca na requisição
+from src.app.controllers.api_async_controllers import inicia_revogacao, inicia_versoes
+aplicacao_async.on_startup.append(inicia_revogacao)
+aplicacao_async.on_startup.append(inicia_versoes)
@@ -1,6 +1,9 @@
 import psycopg2
 from psycopg2 import pool
+from psycopg2 import extensions
+import itertools
 import os
+import threading
 import time
 
 # Configuração de conexão com PostgreSQL
@@ -10,37 +13,497 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', '5432')),  # Porta interna do container
     'user': os.getenv('DB_USER', 'arvore_user'),
     'password': os.getenv('DB_PASSWORD', 'arvore_pass'),
-    'database': os.getenv('DB_NAME', 'arvore_urbana')
+    'database': os.getenv('DB_NAME', 'arvore_urbana'),
+    # Segundos para desistir de abrir uma conexão (banco fora do ar não trava a requisição)
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+    # Réplicas de leitura, opcionais: "host:porta,host:porta" (mesmo usuário, senha e banco)
+    'replicas': [
+        {'host': endereco.rsplit(':', 1)[0], 'port': int(endereco.rsplit(':', 1)[1]) if ':' in endereco else 5432}
+        for endereco in (item.strip() for item in os.getenv('DB_REPLICAS', '').split(','))
+        if endereco
+    ]
 }
 
-# Criar pool de conexões com retry
-connection_pool = None
-max_retries = 30
-retry_delay = 2
-
-for attempt in range(max_retries):
-    try:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(
-            1, 20,
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            database=DB_CONFIG['database']
-        )
-        
-        if connection_pool:
-            print('Conexão com PostgreSQL realizada com SUCESSO!')
-            break
-        else:
-            print('Erro ao criar pool de conexões')
-    except (Exception, psycopg2.Error) as error:
-        if attempt < max_retries - 1:
-            print(f'Tentativa {attempt + 1}/{max_retries}: Aguardando PostgreSQL... ({error})')
-            time.sleep(retry_delay)
-        else:
-            print(f'Erro na conexão com PostgreSQL após {max_retries} tentativas: {error}')
+# Roteamento das leituras entre as réplicas
+DB_LEITURA_CONFIG = {
+    # Segundos que uma réplica com falha fica fora do rodízio
+    'pausa_falha': float(os.getenv('DB_REPLICA_PAUSA_FALHA', '30')),
+    # Atraso máximo de replicação (segundos) para uma réplica receber leituras
+    'atraso_maximo': float(os.getenv('DB_REPLICA_ATRASO_MAXIMO', '10')),
+    # Intervalo (segundos) entre as verificações de atraso de cada réplica
+    'intervalo_verificacao': float(os.getenv('DB_REPLICA_INTERVALO_VERIFICACAO', '5')),
+    # Depois de uma escrita, as leituras da mesma sessão vão ao primário por
+    # este tempo (segundos), para o usuário ver o que acabou de gravar (0 = desliga)
+    'leitura_apos_escrita': float(os.getenv('DB_LEITURA_APOS_ESCRITA', '5')),
+}
+
+# Tamanho e comportamento do pool, POR PROCESSO (cada worker tem o seu pool):
+# o PostgreSQL precisa aceitar workers x DB_POOL_MAX conexões
+DB_POOL_CONFIG = {
+    'minimo': int(os.getenv('DB_POOL_MIN', '1')),
+    'maximo': int(os.getenv('DB_POOL_MAX', '20')),
+    # Segundos que getconn() espera por uma conexão livre antes de desistir
+    'tempo_espera': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    # Conexões mais velhas que isso são fechadas ao voltar para o pool (0 = nunca)
+    'idade_maxima': float(os.getenv('DB_POOL_IDADE_MAXIMA', '1800')),
+    # Conexões paradas há mais tempo que isso são fechadas em vez de reaproveitadas
+    'ocioso_maximo': float(os.getenv('DB_POOL_OCIOSO_MAXIMO', '600')),
+    # Conexões paradas há mais tempo que isso são testadas (SELECT 1) antes do uso
+    'verificar_apos': float(os.getenv('DB_POOL_VERIFICAR_APOS', '10')),
+}
+
+# Limites (em milissegundos) das faixas do histograma de tempo de espera
+FAIXAS_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolEsgotado(pool.PoolError):
+    """Nenhuma conexão ficou livre dentro do tempo de espera"""
+
+
+class PoolConexoes:
+    """
+    Pool de conexões seguro para uso entre threads
+
+    Mesma interface do SimpleConnectionPool (getconn, putconn, closeall), mas:
+    - nenhuma conexão é aberta na criação: a primeira é aberta no primeiro
+      getconn() (ou em aquece()), então importar este módulo não depende do banco
+    - quando todas as conexões estão em uso, getconn() espera até
+      tempo_espera segundos em vez de falhar na hora
+    - conexões fechadas, quebradas, velhas ou ociosas demais são descartadas
+      e substituídas por novas
+    - estatisticas() informa conexões em uso, ociosas, threads aguardando e
+      o histograma do tempo de espera
+    """
+
+    def __init__(self, minimo, maximo, tempo_espera=10, idade_maxima=1800,
+                 ocioso_maximo=600, verificar_apos=10, **parametros_conexao):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.tempo_espera = tempo_espera
+        self.idade_maxima = idade_maxima
+        self.ocioso_maximo = ocioso_maximo
+        self.verificar_apos = verificar_apos
+        self._parametros_conexao = parametros_conexao
+        self.descricao = f"{parametros_conexao.get('host')}:{parametros_conexao.get('port')}"
+
+        self._condicao = threading.Condition()
+        self._ociosas = []      # (conexão, devolvida_em), a última devolvida no fim
+        self._em_uso = {}       # id(conexão) -> conexão entregue
+        self._criadas_em = {}   # id(conexão) -> momento da criação
+        self._total = 0         # conexões abertas ou sendo abertas
+        self._aguardando = 0
+        self._fechado = False
+
+        self._conexoes_criadas = 0
+        self._conexoes_descartadas = 0
+        self._esgotamentos = 0
+        self._retiradas = 0
+        self._histograma = [0] * (len(FAIXAS_ESPERA_MS) + 1)
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+
+        # Situação do banco vista pelo pool, para as rotas de saúde
+        self.ultimo_erro = None
+        self.conectado_em = None
+
+    def _abre_conexao(self):
+        """Abre uma conexão nova (a vaga em _total já deve estar reservada)"""
+        try:
+            conn = psycopg2.connect(**self._parametros_conexao)
+        except Exception as erro:
+            with self._condicao:
+                self._total -= 1
+                self.ultimo_erro = str(erro).strip()
+                self._condicao.notify()
             raise
+        with self._condicao:
+            self._criadas_em[id(conn)] = time.monotonic()
+            self._conexoes_criadas += 1
+            self.ultimo_erro = None
+            if self.conectado_em is None:
+                self.conectado_em = time.time()
+        return conn
+
+    def aquece(self):
+        """Abre as conexões mínimas do pool (usado no aquecimento em segundo plano)"""
+        while True:
+            with self._condicao:
+                if self._total >= self.minimo or self._total >= self.maximo:
+                    break
+                self._total += 1
+            conn = self._abre_conexao()
+            with self._condicao:
+                self._ociosas.append((conn, time.monotonic()))
+                self._condicao.notify()
+        # Confirma que o banco responde, mesmo que as conexões já existissem
+        ok, erro = self.verifica(timeout=self.tempo_espera)
+        if not ok:
+            raise psycopg2.OperationalError(erro)
+
+    def verifica(self, timeout=1):
+        """
+        Testa o banco com SELECT 1 usando uma conexão do pool
+
+        Returns:
+            Tupla (ok, erro)
+        """
+        conn = None
+        try:
+            conn = self.getconn(timeout=timeout)
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True, None
+        except Exception as erro:
+            return False, str(erro).strip()
+        finally:
+            if conn:
+                self.putconn(conn)
+
+    def _descarta(self, conn):
+        """Fecha a conexão e libera a vaga (chamar com a condição travada)"""
+        self._criadas_em.pop(id(conn), None)
+        self._total -= 1
+        self._conexoes_descartadas += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._condicao.notify()
+
+    def _conexao_viva(self, conn, ociosa_ha):
+        """Teste de vida feito fora da trava, antes de entregar a conexão"""
+        if conn.closed:
+            return False
+        if ociosa_ha < self.verificar_apos:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _registra_espera(self, espera):
+        self._retiradas += 1
+        self._espera_total += espera
+        self._espera_maxima = max(self._espera_maxima, espera)
+        espera_ms = espera * 1000
+        for posicao, limite in enumerate(FAIXAS_ESPERA_MS):
+            if espera_ms <= limite:
+                self._histograma[posicao] += 1
+                return
+        self._histograma[-1] += 1
+
+    def getconn(self, timeout=None):
+        """
+        Retira uma conexão do pool
+
+        Args:
+            timeout: Segundos de espera por uma conexão livre (padrão: tempo_espera)
+
+        Raises:
+            PoolEsgotado: Nenhuma conexão ficou livre dentro do tempo de espera
+        """
+        inicio = time.monotonic()
+        limite = inicio + (self.tempo_espera if timeout is None else timeout)
+        while True:
+            conn = None
+            abrir_nova = False
+            with self._condicao:
+                while True:
+                    if self._fechado:
+                        raise pool.PoolError("connection pool is closed")
+                    agora = time.monotonic()
+                    # Descarta as ociosas há tempo demais (as mais antigas ficam no começo)
+                    while self._ociosas and self.ocioso_maximo and agora - self._ociosas[0][1] > self.ocioso_maximo:
+                        antiga, _ = self._ociosas.pop(0)
+                        self._descarta(antiga)
+                    if self._ociosas:
+                        conn, devolvida_em = self._ociosas.pop()
+                        self._em_uso[id(conn)] = conn
+                        break
+                    if self._total < self.maximo:
+                        self._total += 1
+                        abrir_nova = True
+                        break
+                    restante = limite - agora
+                    if restante <= 0:
+                        self._esgotamentos += 1
+                        raise PoolEsgotado(
+                            f"Nenhuma conexão livre após {agora - inicio:.1f}s "
+                            f"({self.maximo} em uso)"
+                        )
+                    self._aguardando += 1
+                    try:
+                        self._condicao.wait(restante)
+                    finally:
+                        self._aguardando -= 1
+
+            if abrir_nova:
+                conn = self._abre_conexao()
+                with self._condicao:
+                    self._em_uso[id(conn)] = conn
+                    self._registra_espera(time.monotonic() - inicio)
+                return conn
+
+            if self._conexao_viva(conn, time.monotonic() - devolvida_em):
+                with self._condicao:
+                    self._registra_espera(time.monotonic() - inicio)
+                return conn
+
+            # Conexão morta (ex.: banco reiniciado): descarta e tenta de novo
+            print("Pool: conexão inválida descartada")
+            with self._condicao:
+                self._em_uso.pop(id(conn), None)
+                self._descarta(conn)
+
+    def putconn(self, conn, close=False):
+        """Devolve a conexão; desfaz transações abertas e recicla as quebradas ou velhas"""
+        descartar = close or conn.closed
+        if not descartar:
+            try:
+                estado = conn.info.transaction_status
+                if estado == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    descartar = True
+                elif estado != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                descartar = True
+
+        with self._condicao:
+            if id(conn) not in self._em_uso:
+                raise pool.PoolError("trying to put unkeyed connection")
+            del self._em_uso[id(conn)]
+            criada_em = self._criadas_em.get(id(conn), 0)
+            velha = self.idade_maxima and time.monotonic() - criada_em > self.idade_maxima
+            if descartar or velha or self._fechado:
+                self._descarta(conn)
+            else:
+                self._ociosas.append((conn, time.monotonic()))
+                self._condicao.notify()
+
+    def closeall(self):
+        """Fecha as conexões ociosas; as em uso são fechadas ao serem devolvidas"""
+        with self._condicao:
+            self._fechado = True
+            while self._ociosas:
+                conn, _ = self._ociosas.pop()
+                self._descarta(conn)
+            self._condicao.notify_all()
+
+    def estatisticas(self):
+        """Situação atual do pool e histograma do tempo de espera em getconn()"""
+        with self._condicao:
+            faixas = [f"<={limite}ms" for limite in FAIXAS_ESPERA_MS] + [f">{FAIXAS_ESPERA_MS[-1]}ms"]
+            return {
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'em_uso': len(self._em_uso),
+                'ociosas': len(self._ociosas),
+                'abertas': self._total,
+                'aguardando': self._aguardando,
+                'conexoes_criadas': self._conexoes_criadas,
+                'conexoes_descartadas': self._conexoes_descartadas,
+                'esgotamentos': self._esgotamentos,
+                'retiradas': self._retiradas,
+                'espera_media_ms': round(self._espera_total / self._retiradas * 1000, 3) if self._retiradas else None,
+                'espera_maxima_ms': round(self._espera_maxima * 1000, 3),
+                'histograma_espera': dict(zip(faixas, self._histograma)),
+            }
+
+
+class RoteadorLeitura:
+    """
+    Distribui as leituras entre as réplicas, com volta ao primário
+
+    Tem a mesma interface de um pool (getconn, putconn, estatisticas), então
+    pode ser passado para os DAOs no lugar do pool de leitura.
+    - Rodízio (round-robin) entre as réplicas disponíveis
+    - Réplica que falha ao conectar, ou está atrasada demais na replicação,
+      sai do rodízio por pausa_falha segundos
+    - Sem réplica disponível, a leitura vai para o primário
+    """
+
+    def __init__(self, replicas, primario, pausa_falha=30, atraso_maximo=10, intervalo_verificacao=5):
+        self._replicas = replicas
+        self._primario = primario
+        self.pausa_falha = pausa_falha
+        self.atraso_maximo = atraso_maximo
+        self.intervalo_verificacao = intervalo_verificacao
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+        self._origem = {}                                        # id(conexão) -> pool de onde saiu
+        self._fora_ate = {id(replica): 0.0 for replica in replicas}
+        self._verificada_em = {id(replica): 0.0 for replica in replicas}
+        self._leituras = {id(replica): 0 for replica in replicas}
+        self._leituras_primario = 0
+        self._falhas = 0
+
+    def _tira_do_rodizio(self, replica, motivo):
+        print(f"Réplica {replica.descricao} fora do rodízio por {self.pausa_falha:.0f}s: {motivo}")
+        with self._lock:
+            self._fora_ate[id(replica)] = time.monotonic() + self.pausa_falha
+            self._falhas += 1
+
+    def _replica_em_dia(self, replica, conn):
+        """Confere o atraso de replicação, no máximo a cada intervalo_verificacao segundos"""
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._verificada_em[id(replica)] < self.intervalo_verificacao:
+                return True
+            self._verificada_em[id(replica)] = agora
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        """)
+        atraso = float(cursor.fetchone()[0])
+        cursor.close()
+        conn.rollback()
+        if atraso > self.atraso_maximo:
+            self._tira_do_rodizio(replica, f"atraso de replicação de {atraso:.1f}s")
+            return False
+        return True
+
+    def getconn(self, timeout=None):
+        quantidade = len(self._replicas)
+        inicio = next(self._rodizio)
+        for passo in range(quantidade):
+            replica = self._replicas[(inicio + passo) % quantidade]
+            with self._lock:
+                if time.monotonic() < self._fora_ate[id(replica)]:
+                    continue
+            try:
+                # Réplica ocupada não deve segurar a leitura: tenta a próxima na hora
+                conn = replica.getconn(timeout=0)
+            except PoolEsgotado:
+                continue
+            except Exception as erro:
+                self._tira_do_rodizio(replica, erro)
+                continue
+            try:
+                em_dia = self._replica_em_dia(replica, conn)
+            except Exception as erro:
+                replica.putconn(conn, close=True)
+                self._tira_do_rodizio(replica, erro)
+                continue
+            if not em_dia:
+                replica.putconn(conn)
+                continue
+            with self._lock:
+                self._origem[id(conn)] = replica
+                self._leituras[id(replica)] += 1
+            return conn
+
+        conn = self._primario.getconn(timeout=timeout)
+        with self._lock:
+            self._origem[id(conn)] = self._primario
+            self._leituras_primario += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            origem = self._origem.pop(id(conn), self._primario)
+        # Conexão que caiu durante a leitura: a réplica provavelmente saiu do ar
+        if conn.closed and origem is not self._primario:
+            self._tira_do_rodizio(origem, "conexão perdida durante a leitura")
+        origem.putconn(conn, close=close)
+
+    def estatisticas(self):
+        agora = time.monotonic()
+        with self._lock:
+            replicas = [
+                {
+                    'replica': replica.descricao,
+                    'disponivel': agora >= self._fora_ate[id(replica)],
+                    'leituras': self._leituras[id(replica)],
+                    'pool': replica.estatisticas(),
+                }
+                for replica in self._replicas
+            ]
+            return {
+                'replicas': replicas,
+                'leituras_primario': self._leituras_primario,
+                'falhas': self._falhas,
+            }
+
+
+# Pool criado sem conectar: a primeira conexão é aberta no primeiro uso
+connection_pool = PoolConexoes(
+    host=DB_CONFIG['host'],
+    port=DB_CONFIG['port'],
+    user=DB_CONFIG['user'],
+    password=DB_CONFIG['password'],
+    database=DB_CONFIG['database'],
+    connect_timeout=DB_CONFIG['connect_timeout'],
+    **DB_POOL_CONFIG
+)
+
+# Leituras (listagens, espécies, login): vão para as réplicas quando houver
+replica_pools = [
+    PoolConexoes(
+        host=replica['host'],
+        port=replica['port'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        database=DB_CONFIG['database'],
+        connect_timeout=DB_CONFIG['connect_timeout'],
+        **DB_POOL_CONFIG
+    )
+    for replica in DB_CONFIG['replicas']
+]
+read_pool = connection_pool
+if replica_pools:
+    read_pool = RoteadorLeitura(
+        replica_pools, connection_pool,
+        pausa_falha=DB_LEITURA_CONFIG['pausa_falha'],
+        atraso_maximo=DB_LEITURA_CONFIG['atraso_maximo'],
+        intervalo_verificacao=DB_LEITURA_CONFIG['intervalo_verificacao'],
+    )
+
+# Situação do aquecimento: 'aguardando', 'conectando', 'pronto' ou 'falhou'
+situacao_aquecimento = {'estado': 'aguardando', 'tentativas': 0}
+
+
+def aquece_em_segundo_plano(apos_conectar=None, max_retries=30, retry_delay=2):
+    """
+    Abre as conexões do pool em uma thread, sem atrasar a subida do servidor
+
+    Enquanto o PostgreSQL não responde, tenta de novo a cada retry_delay
+    segundos (útil no docker compose, quando o banco sobe junto).
+
+    Args:
+        apos_conectar: Função chamada depois da primeira conexão (ex.: carregar caches)
+    """
+    def aquece():
+        situacao_aquecimento['estado'] = 'conectando'
+        for attempt in range(max_retries):
+            situacao_aquecimento['tentativas'] = attempt + 1
+            try:
+                connection_pool.aquece()
+                print('Conexão com PostgreSQL realizada com SUCESSO!')
+                break
+            except (Exception, psycopg2.Error) as error:
+                if attempt < max_retries - 1:
+                    print(f'Tentativa {attempt + 1}/{max_retries}: Aguardando PostgreSQL... ({error})')
+                    time.sleep(retry_delay)
+                else:
+                    print(f'Erro na conexão com PostgreSQL após {max_retries} tentativas: {error}')
+                    situacao_aquecimento['estado'] = 'falhou'
+                    return
+        if apos_conectar:
+            apos_conectar()
+        situacao_aquecimento['estado'] = 'pronto'
+
+    thread = threading.Thread(target=aquece, name='aquecimento-banco', daemon=True)
+    thread.start()
+    return thread
 
 def get_connection():
     """Retorna uma conexão do pool"""
@@ -49,4 +512,3 @@ def get_connection():
 def return_connection(connection):
     """Retorna uma conexão para o pool"""
     connection_pool.putconn(connection)
-
@@ -0,0 +1,53 @@
+"""
+Pool assíncrono de conexões (psycopg 3) usado pelo servidor da API JSON (server_async.py)
+- Mesmo banco e credenciais de DB_CONFIG
+- Cada requisição só ocupa uma conexão enquanto a consulta roda; enquanto
+  espera o banco, o event loop atende as outras requisições
+"""
+import os
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from src.config.database import DB_CONFIG
+
+# Tamanho do pool assíncrono, POR PROCESSO: é o número máximo de consultas
+# em andamento ao mesmo tempo (as demais esperam na fila do pool)
+DB_ASYNC_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_ASYNC_POOL_MIN', '2')),
+    'max_size': int(os.getenv('DB_ASYNC_POOL_MAX', '50')),
+    # Segundos que uma requisição espera por uma conexão livre antes de desistir
+    'timeout': float(os.getenv('DB_ASYNC_POOL_TIMEOUT', os.getenv('DB_POOL_TIMEOUT', '10'))),
+}
+
+
+def _conninfo():
+    return make_conninfo(
+        host=DB_CONFIG['host'],
+        port=DB_CONFIG['port'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        dbname=DB_CONFIG['database'],
+        connect_timeout=DB_CONFIG['connect_timeout'],
+    )
+
+
+# Criado fechado: é aberto no início do servidor assíncrono (abre_pool_async),
+# dentro do event loop, sem esperar o banco responder
+async_pool = AsyncConnectionPool(
+    _conninfo(),
+    open=False,
+    kwargs={'row_factory': dict_row},
+    name='api_async',
+    **DB_ASYNC_POOL_CONFIG
+)
+
+
+async def abre_pool_async(_aplicacao=None):
+    """Abre o pool em segundo plano (as conexões mínimas são abertas pelo próprio pool)"""
+    await async_pool.open(wait=False)
+    print(f"Pool assíncrono aberto para {DB_CONFIG['host']}:{DB_CONFIG['port']} "
+          f"(min={DB_ASYNC_POOL_CONFIG['min_size']}, max={DB_ASYNC_POOL_CONFIG['max_size']})")
+
+
+async def fecha_pool_async(_aplicacao=None):
+    await async_pool.close()
@@ -0,0 +1,15 @@
+from src.app.utils.security import SecurityManager, ListaRevogacao, TOKENS_CONFIG
+from src.app.BD.tokens_dao import Tokens_dao
+from src.config.database import connection_pool
+
+# Chave que assina os tokens de autenticação e a sessão do Flask (src/config/app.py)
+CHAVE_SECRETA = 'sua-chave-secreta-aqui'
+
+# Instância global do gerenciador de segurança, compartilhada pelo login,
+# pelo DAO de usuários, pelo login_required e pela API assíncrona (mesmo
+# cache de tokens). Os tokens revogados no logout ficam no banco para valer
+# em todos os workers
+security = SecurityManager(
+    CHAVE_SECRETA,
+    revogacao=ListaRevogacao(Tokens_dao(connection_pool), TOKENS_CONFIG['intervalo_sincronizacao'])
+)